@@ -0,0 +1,115 @@
+#------------------------------------------
+# Name:     dialogs
+# Purpose:  Time the menu's startup and how long its dialogs take to open
+#
+# Author:   Robin Siebler
+# Created:  10/18/26
+#------------------------------------------
+__author__ = 'Robin Siebler'
+__date__ = '10/18/26'
+
+# python benchmarks/dialogs.py
+#
+# Runs menu.py with the stand-in ui module (see standin_ui.py), so the times are those
+# of parsing the .pyui files and building the views in Python; on the iPad, building the
+# UIKit views adds to both columns of the dialog table alike.
+
+import os, subprocess, sys, time
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(BENCHMARKS, '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCHMARKS)
+import standin_ui
+sys.modules['ui'] = standin_ui
+
+REPEAT = 20
+IMPORT_REPEAT = 5
+EAGER = 'journal, query, sqlstore'  # the modules menu.py used to import up front
+IMPORT_SCRIPT = """
+import sys, time
+sys.path[:0] = [{root!r}, {benchmarks!r}]
+import standin_ui
+sys.modules['ui'] = standin_ui
+start = time.perf_counter()
+import menu
+{extra}
+print(time.perf_counter() - start)
+"""
+# (Menu method, its arguments, the attribute that holds the dialog it opens)
+PROMPTS = (('display_message', ('Hello',), 'message_dialog'),
+           ('prompt_search', (None,), 'search_dialog'),
+           ('prompt_add', (None,), 'add_dialog'),
+           ('prompt_load', (None,), 'load_dialog'),
+           ('prompt_save', (None,), 'save_dialog'),
+           ('prompt_delete_task', (None,), 'delete_dialog'),
+           ('prompt_modify_task_number', (None,), 'modify_dialog'),
+           ('prompt_speak', (None,), 'prompt_dialog'),
+           ('prompt_delete_file', (None,), 'delete_dialog'))
+
+
+def import_time(extra=''):
+    """Return the best time to import menu in a new interpreter."""
+
+    script = IMPORT_SCRIPT.format(root=ROOT, benchmarks=BENCHMARKS, extra=extra)
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)  # time loading the .pyc files, not compiling
+    return min(float(subprocess.check_output([sys.executable, '-c', script], cwd=ROOT, env=env))
+               for _ in range(IMPORT_REPEAT))
+
+
+def new_menu(pool_size):
+    import menu, views
+    standin_ui.cancel_delays()
+    m = menu.Menu()
+    m.views = views.ViewCache({'self': m}, pool_size)
+    start = time.perf_counter()
+    m.run()
+    run_time = time.perf_counter() - start
+    standin_ui.cancel_delays()  # no autosave or prewarming unless asked for
+    return m, run_time
+
+
+def open_dialog(m, method, args, attribute):
+    start = time.perf_counter()
+    getattr(m, method)(*args)
+    seconds = time.perf_counter() - start
+    getattr(m, attribute).close()
+    return seconds
+
+
+def dialog_times(pool_size, prewarm=False):
+    """Return {method: (first open, mean of the later opens)}."""
+
+    m, _ = new_menu(pool_size)
+    if prewarm:
+        m.warm_up()
+        standin_ui.run_pending()
+    times = {}
+    for method, args, attribute in PROMPTS:
+        first = open_dialog(m, method, args, attribute)
+        later = [open_dialog(m, method, args, attribute) for _ in range(REPEAT)]
+        times[method] = (first, sum(later) / len(later))
+    return times
+
+
+def main():
+    os.chdir(ROOT)  # menu.py loads its views relative to the current directory
+    deferred = import_time()
+    eager = import_time('import ' + EAGER)
+    print('import menu: {:.1f} ms (importing {} too: {:.1f} ms)'.format(
+        deferred * 1e3, EAGER, eager * 1e3))
+    _, run_time = new_menu(0)
+    print('Menu().run(): {:.1f} ms\n'.format(run_time * 1e3))
+    uncached = dialog_times(0)
+    cached = dialog_times(1)
+    prewarmed = dialog_times(1, prewarm=True)
+    print('| Dialog | load_view (ms) | cached, first (ms) | cached, again (ms) | prewarmed, first (ms) |')
+    print('|--------|------:|------:|------:|------:|')
+    for method, _, _ in PROMPTS:
+        print('| {} | {:.3f} | {:.3f} | {:.3f} | {:.3f} |'.format(
+            method, uncached[method][1] * 1e3, cached[method][0] * 1e3,
+            cached[method][1] * 1e3, prewarmed[method][0] * 1e3))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+#------------------------------------------
+# Name:     generate
+# Purpose:  Generate synthetic task lists for benchmarks
+#
+# Author:   Robin Siebler
+# Created:  10/18/26
+#------------------------------------------
+__author__ = 'Robin Siebler'
+__date__ = '10/18/26'
+
+import argparse, datetime, os, random, sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import tasklist, util
+
+VERBS = ('call email review fix deploy back up update plan write read test release '
+         'schedule order pay renew clean cancel book prepare check replace install').split()
+OBJECTS = ('server printer invoice budget meeting report disk network customer '
+           'dentist car insurance taxes garden roof laptop router slides contract '
+           'database backup kitchen passport groceries firewall certificate').split()
+DETAILS = ('before friday asap for the team with Sam at noon next week by eod '
+           'on the second floor if it rains again after lunch for Q3').split()
+TAGS = ('work home ops urgent finance personal errands health travel family '
+        'infra security admin school someday waiting').split()
+
+
+def notes(count, seed=0):
+    """Yield count (note, priority, tags) tuples that look like real tasks."""
+
+    rand = random.Random(seed)
+    for _ in range(count):
+        words = [rand.choice(VERBS), 'the', rand.choice(OBJECTS)]
+        for _ in range(rand.randint(0, 4)):
+            words.append(rand.choice(DETAILS))
+        priority = rand.choice(tasklist.PRIORITIES)
+        tags = ' '.join(rand.sample(TAGS, rand.choice((0, 1, 1, 2, 2, 3))))
+        yield ' '.join(words).capitalize(), priority, tags
+
+
+def tasks(count, seed=0, days=365):
+    """Return a list of count tasks with ids 1..count, created over the last `days` days."""
+
+    rand = random.Random(seed)
+    today = datetime.date.today().toordinal()
+    result = []
+    tasklist.Task.last_id = 0
+    for note, priority, tags in notes(count, seed):
+        task = tasklist.Task(note, priority, tags)
+        task.created = today - rand.randrange(days)
+        result.append(task)
+    return result
+
+
+def make_tasklist(count, seed=0, **kwargs):
+    """Return a TaskList holding count synthetic tasks."""
+
+    task_list = tasklist.TaskList(**kwargs)
+    task_list.tasks = tasks(count, seed)
+    return task_list
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write a synthetic task file.')
+    parser.add_argument('count', type=int, help='number of tasks')
+    parser.add_argument('filename', help='the task file to create')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    util.save(tasks(args.count, args.seed), args.filename)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+#------------------------------------------
+# Name:     memory
+# Purpose:  Compare the memory used per task by the task representations
+#
+# Author:   Robin Siebler
+# Created:  10/18/26
+#------------------------------------------
+__author__ = 'Robin Siebler'
+__date__ = '10/18/26'
+
+import argparse, datetime, gc, os, sys, tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import tasklist
+from columnar import ColumnStore
+from generate import notes
+
+class DictTask:
+    """The dict-backed Task class used before Task got __slots__."""
+
+    def __init__(self, note, priority, tags=''):
+        self.note = note
+        self.priority = priority
+        self.tags = tags
+        self.creation_date = datetime.date.today().strftime("%m/%d/%Y")
+        self.id = 0
+
+
+def measure(build, count):
+    """Return the bytes per task retained by build(); the input strings are allocated up
+    front, so the note text itself isn't counted."""
+
+    data = list(notes(count))
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build(data)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return (after - before) / float(count)
+
+
+def build_dict_tasks(data):
+    return [DictTask(note, priority, tags) for note, priority, tags in data]
+
+
+def build_tasks(data):
+    return [tasklist.Task(note, priority, tags) for note, priority, tags in data]
+
+
+def build_columns(data):
+    return ColumnStore(build_tasks(data))
+
+
+def main(count=100000):
+    print('Bytes per task ({} tasks, excluding the note text):'.format(count))
+    for name, build in (('dict Task', build_dict_tasks),
+                        ('__slots__ Task', build_tasks),
+                        ('ColumnStore', build_columns)):
+        print('  {:<16}{:>8.1f}'.format(name, measure(build, count)))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measure the memory held per task.')
+    parser.add_argument('count', type=int, nargs='?', default=100000,
+                        help='number of tasks (default: %(default)s)')
+    main(parser.parse_args().count)
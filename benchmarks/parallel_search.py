@@ -0,0 +1,53 @@
+#------------------------------------------
+# Name:     parallel_search
+# Purpose:  Time searching a directory of task files with and without worker processes
+#
+# Author:   Robin Siebler
+# Created:  10/18/26
+#------------------------------------------
+__author__ = 'Robin Siebler'
+__date__ = '10/18/26'
+
+# Usage: python benchmarks/parallel_search.py [files] [tasks per file]
+
+import argparse, os, shutil, sys, tempfile, timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import taskfile
+from generate import tasks as make_tasks
+from workspace import Workspace
+
+QUERIES = ('disk', 'the server', 'urgent')
+
+
+def timed(function):
+    start = timeit.default_timer()
+    result = function()
+    return timeit.default_timer() - start, result
+
+
+def main(files=24, size=50000):
+    directory = tempfile.mkdtemp(prefix='tasklist-workspace')
+    try:
+        for number in range(files):
+            taskfile.write(make_tasks(size, seed=number),
+                           os.path.join(directory, 'team{:02}.tsk'.format(number)))
+        for processes in (0, None):
+            with Workspace(directory, processes) as workspace:
+                first, results = timed(lambda: workspace.search(QUERIES[0]))
+                again, _ = timed(lambda: [workspace.search(query) for query in QUERIES])
+                print('{:>2} workers: first search {:.3f}s ({} results), '
+                      'then {:.4f}s per search'.format(
+                          len(workspace._workers) or 1, first, len(results),
+                          again / len(QUERIES)))
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time searching a directory of task files.')
+    parser.add_argument('files', type=int, nargs='?', default=24,
+                        help='number of task files (default: %(default)s)')
+    parser.add_argument('size', type=int, nargs='?', default=50000, metavar='tasks',
+                        help='tasks per file (default: %(default)s)')
+    args = parser.parse_args()
+    main(args.files, args.size)
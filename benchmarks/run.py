@@ -0,0 +1,209 @@
+#------------------------------------------
+# Name:     run
+# Purpose:  Time the TaskList and util operations on synthetic task lists
+#
+# Author:   Robin Siebler
+# Created:  10/18/26
+#------------------------------------------
+__author__ = 'Robin Siebler'
+__date__ = '10/18/26'
+
+# Usage: python benchmarks/run.py [--sizes 1000,10000,...] [--output results.json]
+#                                 [--compare previous.json]
+# Only util and generate (with tasklist) are imported, so this runs headless (no ui or
+# speech modules).
+
+import argparse, datetime, json, os, platform, random, shutil, sys, tempfile, timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import util
+from generate import make_tasklist, notes
+
+SIZES = (1000, 10000, 100000, 1000000)
+QUERIES = ('disk', 'the server', 'urgent', 'asap', 'xyzzy')
+TAGS = ('infra', 'infra admin', 'finance family')  # tags of the generated tasks
+PAGE_SIZE = 100  # same as menu.PAGE_SIZE
+REGRESSION = 1.25  # --compare flags operations that got this much slower
+
+
+def timed(function, repeat=3):
+    """Return the best of `repeat` wall clock timings of function()."""
+
+    return min(timeit.repeat(function, number=1, repeat=repeat))
+
+
+def result(seconds, ops):
+    return {'seconds': seconds, 'ops': ops, 'per_op': seconds / ops if ops else 0.0}
+
+
+def bench_add(size):
+    new_notes = list(notes(1000, seed=size))
+    task_list = make_tasklist(size)
+    start = timeit.default_timer()
+    for note, priority, tags in new_notes:
+        task_list.add_task(note, priority, tags)
+    return result(timeit.default_timer() - start, len(new_notes))
+
+
+def bench_search(task_list):
+    results = {}
+    start = timeit.default_timer()
+    task_list.search(QUERIES[0])  # the first search also builds the index
+    results['search_first'] = result(timeit.default_timer() - start, 1)
+    results['search'] = result(timed(lambda: [task_list.search(q) for q in QUERIES]),
+                               len(QUERIES))
+
+    def type_queries():
+        task_list._prefix_results.clear()
+        for query in QUERIES:
+            for end in range(1, len(query) + 1):
+                task_list.search_prefix(query[:end])
+    keystrokes = sum(len(query) for query in QUERIES)
+    results['search_as_you_type'] = result(timed(type_queries), keystrokes)
+    return results
+
+
+def bench_tags(task_list):
+    """Time finding the tasks with all (and any) of some tags, and the tag facet counts."""
+
+    start = timeit.default_timer()
+    task_list.tag_counts()  # the first call also builds the index
+    results = {'tag_counts_first': result(timeit.default_timer() - start, 1),
+               'tag_counts': result(timed(task_list.tag_counts), 1)}
+    results['tagged_all'] = result(timed(lambda: [task_list.tasks_tagged(tags)
+                                                  for tags in TAGS]), len(TAGS))
+    results['tagged_any'] = result(timed(lambda: [task_list.tasks_tagged(tags, True)
+                                                  for tags in TAGS]), len(TAGS))
+    return results
+
+
+def bench_find(task_list, size):
+    ids = [random.Random(size).randint(1, size) for _ in range(10000)]
+    find = task_list._find_task
+    return result(timed(lambda: [find(task_id) for task_id in ids]), len(ids))
+
+
+def bench_delete(size, stable_ids):
+    deletes = min(100, size)
+    task_list = make_tasklist(size, stable_ids=stable_ids)
+    ids = random.Random(size).sample(range(1, size + 1), deletes)
+    start = timeit.default_timer()
+    for task_id in ids:
+        if stable_ids:
+            task_list.delete_task(task_id)
+        else:
+            # the menu deletes by the number shown, then renumbers
+            task_list.delete_task(min(task_id, len(task_list)))
+            task_list._renumber_tasks()
+    return result(timeit.default_timer() - start, deletes)
+
+
+def bench_undo(task_list):
+    """Time undoing and redoing a modify and a delete (with the indexes built)."""
+
+    task = task_list.tasks[len(task_list) // 2]
+    task_list.search(QUERIES[0])
+    task_list.modify_task(task.id, 'Undo me', 'high', 'undo')
+    task_list.delete_task(task.id)
+
+    def undo_redo():
+        task_list.undo()
+        task_list.undo()
+        task_list.redo()
+        task_list.redo()
+    return result(timed(undo_redo), 4)
+
+
+def bench_render(task_list):
+    def page():
+        return ''.join(task_list.render(number, task)
+                       for number, task in task_list.iter_range(0, PAGE_SIZE))
+
+    def everything():
+        return ''.join(task_list.render(number, task) for number, task in task_list.numbered())
+    task_list._rendered.clear()
+    start = timeit.default_timer()
+    page()
+    results = {'render_page_first': result(timeit.default_timer() - start, 1),
+               'render_page': result(timed(page), 1)}
+    results['render_all'] = result(timed(everything, repeat=1), len(task_list))
+    return results
+
+
+def bench_io(task_list, directory):
+    filename = os.path.join(directory, 'bench.tsk')
+    results = {'save': result(timed(lambda: util.save(task_list.tasks, filename)), len(task_list))}
+    results['load'] = result(timed(lambda: util.load(filename)), len(task_list))
+    results['file_bytes'] = os.path.getsize(filename)
+    return results
+
+
+def run(sizes, log=sys.stderr):
+    directory = tempfile.mkdtemp(prefix='tasklist-bench')
+    results = {}
+    try:
+        for size in sizes:
+            log.write('{} tasks...\n'.format(size))
+            task_list = make_tasklist(size, stable_ids=True)
+            timings = {'add_task': bench_add(size), 'find_task': bench_find(task_list, size)}
+            timings.update(bench_search(task_list))
+            timings.update(bench_tags(task_list))
+            timings['delete_renumber'] = bench_delete(size, False)
+            timings['delete_stable'] = bench_delete(size, True)
+            timings.update(bench_render(task_list))
+            timings['undo_redo'] = bench_undo(task_list)
+            timings.update(bench_io(task_list, directory))
+            results[str(size)] = timings
+    finally:
+        shutil.rmtree(directory)
+    return {'meta': {'date': datetime.datetime.now().isoformat(),
+                     'python': platform.python_version(),
+                     'platform': platform.platform()},
+            'results': results}
+
+
+def compare(old, new, threshold=REGRESSION):
+    """Print the change in per-operation time between two runs.
+
+    :return: the number of operations that got slower by more than threshold
+    """
+
+    regressions = 0
+    for size, timings in sorted(new['results'].items(), key=lambda item: int(item[0])):
+        old_timings = old['results'].get(size, {})
+        for name, timing in sorted(timings.items()):
+            before = old_timings.get(name)
+            if not isinstance(timing, dict) or not before or not before['per_op']:
+                continue
+            ratio = timing['per_op'] / before['per_op']
+            flag = ''
+            if ratio > threshold:
+                flag = '  <-- REGRESSION'
+                regressions += 1
+            print('{:>8} {:<20}{:>12.3g}s{:>12.3g}s{:>8.2f}x{}'.format(
+                size, name, before['per_op'], timing['per_op'], ratio, flag))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark TaskList and util.')
+    parser.add_argument('--sizes', default=','.join(str(size) for size in SIZES),
+                        help='comma separated task list sizes (default: %(default)s)')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='a previous JSON results file to compare with')
+    args = parser.parse_args()
+
+    results = run([int(size) for size in args.sizes.split(',')])
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as fh:
+            fh.write(text + '\n')
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare) as fh:
+            if compare(json.load(fh), results):
+                sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+#------------------------------------------
+# Name:     serializer
+# Purpose:  Compare the binary task file format with pickle
+#
+# Author:   Robin Siebler
+# Created:  10/18/26
+#------------------------------------------
+__author__ = 'Robin Siebler'
+__date__ = '10/18/26'
+
+import argparse, os, pickle, shutil, sys, tempfile, timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import taskfile, util
+from generate import tasks as make_tasks
+
+SIZES = (100000, 500000)
+
+
+def best(function, repeat=3):
+    return min(timeit.repeat(function, number=1, repeat=repeat))
+
+
+def pickle_load(filename):
+    with open(filename, 'rb') as fh:
+        return pickle.load(fh)
+
+
+def compare(size, directory):
+    tasks = make_tasks(size)
+    pickled = os.path.join(directory, 'pickled.tsk')
+    binary = os.path.join(directory, 'binary.tsk')
+    compressed = os.path.join(directory, 'compressed.tsk')
+    rows = []
+    rows.append(('pickle', best(lambda: util.write(tasks, pickled)), None,
+                 best(lambda: pickle_load(pickled)), os.path.getsize(pickled)))
+    for name, filename, compress in (('binary', binary, False),
+                                     ('binary+zlib', compressed, True)):
+        save = best(lambda: taskfile.write(tasks, filename, compress=compress))
+        opened = best(lambda: taskfile.TaskFile(filename))
+        decoded = best(lambda: taskfile.TaskFile(filename).to_tasks())
+        rows.append((name, save, opened, decoded, os.path.getsize(filename)))
+    return rows
+
+
+def main(sizes=SIZES):
+    directory = tempfile.mkdtemp(prefix='tasklist-serializer')
+    try:
+        print('| Tasks | Format | Save (s) | Open (s) | Load all (s) | Size (MB) |')
+        print('|------:|--------|---------:|---------:|-------------:|----------:|')
+        for size in sizes:
+            for name, save, opened, decoded, file_size in compare(size, directory):
+                print('| {} | {} | {:.3f} | {} | {:.3f} | {:.1f} |'.format(
+                    size, name, save, '-' if opened is None else '{:.4f}'.format(opened),
+                    decoded, file_size / 1e6))
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Compare the binary task file format with pickle.')
+    parser.add_argument('sizes', type=int, nargs='*', metavar='tasks',
+                        help='task list sizes (default: {})'.format(
+                            ' '.join(str(size) for size in SIZES)))
+    main(parser.parse_args().sizes or SIZES)
@@ -0,0 +1,145 @@
+#------------------------------------------
+# Name:     shared_readers
+# Purpose:  Compare reader processes that each load a task file with ones attached to a snapshot
+#
+# Author:   Robin Siebler
+# Created:  10/18/26
+#------------------------------------------
+__author__ = 'Robin Siebler'
+__date__ = '10/18/26'
+
+# Usage: python benchmarks/shared_readers.py [tasks] [processes] [generations]
+#
+# Each reader process either loads a pickled task file into a TaskList (as the reports
+# did) or attaches to a snapshot of it, then looks up tasks by id, counts and lists the
+# high priority tasks and searches.  The steps are timed in a reader running on its own;
+# then all the readers run at once and "Memory" is the most Python memory one of them
+# holds afterwards (tracemalloc; the mapped snapshot files are shared and not counted).
+# Last, a writer publishes new generations while the readers refresh, and the script
+# stops with an AssertionError if a reader ever sees a generation that isn't whole.
+
+import argparse, multiprocessing, os, shutil, sys, tempfile, timeit, tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import snapshot, util
+from generate import tasks as make_tasks
+from tasklist import TaskList
+
+QUERIES = ('disk', 'the server', 'urgent')
+LOOKUPS = 1000
+
+
+def timed(function):
+    start = timeit.default_timer()
+    result = function()
+    return timeit.default_timer() - start, result
+
+
+def open_loaded(filename):
+    task_list = TaskList(stable_ids=True)
+    task_list.tasks = util.load(filename)
+    return task_list
+
+
+def read(how, source, size, trace=False):
+    """Open source the given way and run the queries.
+
+    :param trace: measure the Python memory held (which slows everything down)
+    :return: ([seconds of each step], bytes held or None)
+    """
+
+    if trace:
+        tracemalloc.start()
+    rows = []
+    seconds, tasks = timed(lambda: open_loaded(source) if how == 'load'
+                           else snapshot.Snapshot(source))
+    rows.append(seconds)
+    ids = range(1, size, max(size // LOOKUPS, 1))
+    rows.append(timed(lambda: [tasks._find_task(task_id) for task_id in ids])[0])
+    rows.append(timed(lambda: tasks.count_by_priority('high'))[0])
+    rows.append(timed(lambda: tasks.tasks_by_priority('high'))[0])
+    for query in QUERIES:
+        rows.append(timed(lambda: tasks.search(query))[0])
+    if not trace:
+        return rows, None
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return rows, memory
+
+
+def compare(directory, size, processes):
+    filename = os.path.join(directory, 'reports.tsk')
+    task_list = TaskList(stable_ids=True)
+    task_list.tasks = make_tasks(size)
+    util.write(task_list.tasks, filename)  # a pickled task file
+    seconds, _ = timed(lambda: snapshot.publish(task_list, os.path.join(directory, 'snap')))
+    print('{} tasks, {} reader processes; publishing took {:.3f}s\n'.format(
+        size, processes, seconds))
+    names = ['open', 'find {}'.format(len(range(1, size, max(size // LOOKUPS, 1)))),
+             'count high', 'list high'] + ['search "{}"'.format(query) for query in QUERIES]
+    results = []
+    for how, source in (('load', filename), ('snapshot', os.path.join(directory, 'snap'))):
+        with multiprocessing.Pool(1) as pool:
+            rows = pool.apply(read, (how, source, size))[0]
+        with multiprocessing.Pool(processes) as pool:
+            runs = pool.starmap(read, [(how, source, size, True)] * processes)
+        results.append((rows, max(memory for _, memory in runs)))
+    print('| Step | load (s) | snapshot (s) |')
+    print('|------|------:|------:|')
+    for i, name in enumerate(names):
+        print('| {} | {:.4f} | {:.4f} |'.format(name, results[0][0][i], results[1][0][i]))
+    print('| Memory per process (MB) | {:.2f} | {:.2f} |'.format(
+        results[0][1] / 1e6, results[1][1] / 1e6))
+
+
+def follow(directory, generations, size):
+    """Refresh until the last generation is seen; check each one that is attached to."""
+
+    seen = 0
+    with snapshot.Snapshot(directory) as tasks:
+        while tasks.generation < generations:
+            if tasks.refresh():
+                seen += 1
+            # generation g holds size + g tasks and its newest task's note names g
+            assert len(tasks) == size + tasks.generation, 'torn generation'
+            assert len(tasks.search('generation {} '.format(tasks.generation))) == \
+                min(tasks.generation, 1), 'torn generation'
+    return seen
+
+
+def generations_check(directory, size, processes, generations):
+    directory = os.path.join(directory, 'generations')
+    task_list = TaskList(stable_ids=True)
+    task_list.tasks = make_tasks(size)
+    snapshot.publish(task_list, directory)
+    with multiprocessing.Pool(processes) as pool:
+        readers = pool.starmap_async(follow, [(directory, generations, size)] * processes)
+        start = timeit.default_timer()
+        for generation in range(1, generations + 1):
+            task_list.add_task('generation {} marker'.format(generation), 'low', '')
+            snapshot.publish(task_list, directory)
+        seconds = timeit.default_timer() - start
+        seen = readers.get()
+    print('\n{} generations published ({:.0f} ms each) while {} readers refreshed: '
+          '{} generations attached to in all, none torn'.format(
+              generations, 1000 * seconds / generations, processes, sum(seen)))
+
+
+def main(size=200000, processes=4, generations=20):
+    directory = tempfile.mkdtemp(prefix='tasklist-snapshot')
+    try:
+        compare(directory, size, processes)
+        generations_check(directory, size // 10, processes, generations)
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare loading readers with snapshot readers.')
+    parser.add_argument('size', type=int, nargs='?', default=200000, metavar='tasks',
+                        help='tasks in the list (default: %(default)s)')
+    parser.add_argument('processes', type=int, nargs='?', default=4,
+                        help='reader processes (default: %(default)s)')
+    parser.add_argument('generations', type=int, nargs='?', default=20,
+                        help='generations published while they refresh (default: %(default)s)')
+    args = parser.parse_args()
+    main(args.size, args.processes, args.generations)
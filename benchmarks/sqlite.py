@@ -0,0 +1,108 @@
+#------------------------------------------
+# Name:     sqlite
+# Purpose:  Compare the SQLite storage engine with the in-memory TaskList
+#
+# Author:   Robin Siebler
+# Created:  10/18/26
+#------------------------------------------
+__author__ = 'Robin Siebler'
+__date__ = '10/18/26'
+
+# python benchmarks/sqlite.py [tasks ...]
+#
+# "Open" loads a binary task file into a TaskList, or opens the database (nothing is
+# read until a task is asked for); "Memory" is the Python memory retained after opening
+# and running every operation once.
+
+import argparse, gc, os, shutil, sys, tempfile, time, tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import journal, sqlstore, taskfile
+from tasklist import Task, TaskList
+from generate import notes, tasks as make_tasks
+
+SIZES = (100000, 500000)
+ADDED = 1000  # tasks added (one at a time) and deleted
+SEARCHES = ('disk', 'renew the', 'urgent')
+QUERY = 'priority:high tag:ops created:>2026-01-01'
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+
+def operations(tasklist, size):
+    """Run each operation on an open task list; return [(name, seconds)]."""
+
+    rows = []
+    new = list(notes(ADDED, seed=1))
+    rows.append(('add {} (one at a time)'.format(ADDED),
+                 timed(lambda: [tasklist.add_task(*item) for item in new])[0]))
+    ids = list(range(1, size, size // ADDED))
+    rows.append(('find {}'.format(len(ids)), timed(lambda: [tasklist._find_task(i) for i in ids])[0]))
+    for search_string in SEARCHES:
+        rows.append(('search "{}" (first)'.format(search_string),
+                     timed(lambda: tasklist.search(search_string))[0]))
+        rows.append(('search "{}" (again)'.format(search_string),
+                     timed(lambda: tasklist.search(search_string))[0]))
+    rows.append(('query', timed(lambda: tasklist.query(QUERY))[0]))
+    rows.append(('high priority (count)', timed(lambda: len(tasklist.tasks_by_priority('high')))[0]))
+    rows.append(('newest 20', timed(lambda: list(tasklist.tasks_by_date(newest_first=True)[:20]))[0]))
+    rows.append(('delete {}'.format(len(ids)), timed(lambda: tasklist.delete_tasks(ids))[0]))
+    return rows
+
+
+def run(name, open_tasklist, size):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    seconds, tasklist = timed(open_tasklist)
+    rows = [('open', seconds)] + operations(tasklist, size)
+    memory = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return name, rows, memory
+
+
+def compare(size, directory):
+    binary = os.path.join(directory, 'binary.tsk')
+    database = os.path.join(directory, 'sqlite.tsk')
+    tasks = make_tasks(size)
+    taskfile.write(tasks, binary)
+    sqlstore.convert(binary, database)
+    del tasks
+
+    def open_memory():
+        tasklist = TaskList(stable_ids=True)
+        tasklist.tasks = journal.load(binary)[0]
+        Task.last_id = size
+        return tasklist
+
+    return [run('memory', open_memory, size),
+            run('sqlite', lambda: sqlstore.SQLiteTaskList(database), size)]
+
+
+def main(sizes=SIZES):
+    directory = tempfile.mkdtemp(prefix='tasklist-sqlite')
+    try:
+        for size in sizes:
+            results = compare(size, directory)
+            print('\n{} tasks'.format(size))
+            print('| Operation | ' + ' | '.join('{} (s)'.format(name) for name, _, _ in results) + ' |')
+            print('|-----------|' + '------:|' * len(results))
+            for i, (operation, _) in enumerate(results[0][1]):
+                print('| {} | {} |'.format(operation, ' | '.join(
+                    '{:.4f}'.format(rows[i][1]) for _, rows, _ in results)))
+            print('| Memory (MB) | {} |'.format(' | '.join(
+                '{:.1f}'.format(memory / 1e6) for _, _, memory in results)))
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Compare the SQLite storage engine with the in-memory TaskList.')
+    parser.add_argument('sizes', type=int, nargs='*', metavar='tasks',
+                        help='task list sizes (default: {})'.format(
+                            ' '.join(str(size) for size in SIZES)))
+    main(parser.parse_args().sizes or SIZES)
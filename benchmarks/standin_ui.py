@@ -0,0 +1,154 @@
+#------------------------------------------
+# Name:     standin_ui
+# Purpose:  A stand-in for Pythonista's ui module, for running the menu off the iPad
+#
+# Author:   Robin Siebler
+# Created:  10/18/26
+#------------------------------------------
+__author__ = 'Robin Siebler'
+__date__ = '10/18/26'
+
+# Only what menu.py uses is here.  load_view() parses a .pyui file and builds a tree of
+# plain Python views the way Pythonista does (so parsing costs what it costs), but
+# nothing is drawn; present() and close() only set on_screen.  delay() queues its
+# callbacks until run_pending() runs them.
+#
+#   import sys, standin_ui
+#   sys.modules['ui'] = standin_ui
+#   import menu
+
+import json, sys
+
+_pending = []  # (function, seconds) queued by delay()
+
+
+class View(object):
+    def __init__(self, **attributes):
+        self.name = None
+        self.text = ''
+        self.title = ''
+        self.enabled = True
+        self.hidden = False
+        self.action = None
+        self.delegate = None
+        self.subviews = []
+        self.superview = None
+        self.on_screen = False
+        for name, value in attributes.items():
+            setattr(self, name, value)
+
+    def __getitem__(self, name):
+        for subview in self.subviews:
+            if subview.name == name:
+                return subview
+        raise KeyError(name)
+
+    def add_subview(self, view):
+        view.superview = self
+        self.subviews.append(view)
+
+    def present(self, style='default', popover_location=None):
+        if self.on_screen:
+            raise ValueError('View is already being presented or animation is in progress')
+        self.on_screen = True
+
+    def close(self):
+        self.on_screen = False
+
+    def begin_editing(self):
+        pass
+
+    def set_needs_display(self):
+        pass
+
+
+class Label(View):
+    pass
+
+
+class Button(View):
+    pass
+
+
+class TextField(View):
+    pass
+
+
+class TextView(View):
+    pass
+
+
+class SegmentedControl(View):
+    def __init__(self, **attributes):
+        self.segments = []
+        self.selected_index = 0
+        View.__init__(self, **attributes)
+        if isinstance(self.segments, str):
+            self.segments = self.segments.split('|')
+
+
+class Slider(View):
+    def __init__(self, **attributes):
+        self.value = 0.0
+        View.__init__(self, **attributes)
+
+
+class TableView(View):
+    def __init__(self, **attributes):
+        self.data_source = None
+        self.selected_row = (0, 0)
+        View.__init__(self, **attributes)
+
+
+class ListDataSource(object):
+    def __init__(self, items):
+        self.items = items
+        self.action = None
+
+
+CLASSES = dict((cls.__name__, cls) for cls in (View, Label, Button, TextField, TextView,
+                                                SegmentedControl, Slider, TableView))
+
+
+def _build(node, bindings):
+    attributes = dict(node.get('attributes', {}))
+    action = attributes.pop('action', None)
+    view = CLASSES[node['class']](**attributes)
+    if action:
+        view.action = eval(action, {}, bindings or {})
+    for child in node.get('nodes', []):
+        view.add_subview(_build(child, bindings))
+    return view
+
+
+def load_view(pyui_path, bindings=None):
+    if bindings is None:  # like Pythonista, look the actions up where load_view was called
+        frame = sys._getframe(1)
+        bindings = dict(frame.f_globals, **frame.f_locals)
+    with open(pyui_path + '.pyui', encoding='utf-8') as fh:
+        return _build(json.load(fh)[0], bindings)
+
+
+def delay(function, seconds):
+    _pending.append((function, seconds))
+
+
+def run_pending(longest=1.0):
+    """Run the callbacks delay() has queued (including those they queue) with a delay
+    of up to longest seconds; the others (e.g. the autosave timer) stay queued.
+
+    :return: how many ran
+    """
+
+    count = 0
+    while True:
+        due = [item for item in _pending if item[1] <= longest]
+        if not due:
+            return count
+        _pending.remove(due[0])
+        due[0][0]()
+        count += 1
+
+
+def cancel_delays():
+    del _pending[:]
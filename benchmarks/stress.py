@@ -0,0 +1,150 @@
+#------------------------------------------
+# Name:     stress
+# Purpose:  Hammer a task list from many threads and a task file from many processes
+#
+# Author:   Robin Siebler
+# Created:  10/18/26
+#------------------------------------------
+__author__ = 'Robin Siebler'
+__date__ = '10/18/26'
+
+# Usage: python benchmarks/stress.py [threads] [processes] [operations]
+#
+# Threads: readers search, look up and page through a ThreadSafeTaskList while writers
+# add tasks and change the tasks they added.  Processes: each one keeps a journal open
+# on the same task file (as the menu does), adds tasks and changes a task of its own,
+# saving after every change, with a small compact_size so snapshots are written under
+# the others' saves too.  Either way every task added and every change made has to be
+# there at the end; the script stops with an AssertionError if one is lost.
+
+import argparse, multiprocessing, os, shutil, sys, tempfile, threading, timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import journal
+from generate import tasks as make_tasks
+from tasklist import TaskList
+from threadsafe import ThreadSafeTaskList
+
+SIZE = 10000  # tasks in the list before the threads start
+QUERIES = ('disk', 'the server', 'urgent')
+COMPACT_SIZE = 8 * 1024  # journal size that makes a process write a snapshot
+
+
+def read(task_list, operations):
+    for number in range(operations):
+        task_list.search(QUERIES[number % len(QUERIES)])
+        task_list._find_task(number % SIZE + 1)
+        for number, task in task_list.iter_range(number % SIZE, 20):
+            task_list.render(number, task)
+
+
+def write(task_list, writer, operations):
+    for number in range(operations):
+        task_list.add_task('writer {} task {}'.format(writer, number), 'low', '')
+        task = task_list.search('writer {} task {}'.format(writer, number))[-1]
+        task_list.update_tasks({task.id: {'tags': 'done'}})
+
+
+def run_threads(task_list, readers, writers, operations):
+    """Run the reader and writer threads to the end; return the seconds they took."""
+
+    threads = [threading.Thread(target=read, args=(task_list, operations))
+               for _ in range(readers)]
+    threads += [threading.Thread(target=write, args=(task_list, writer, operations))
+                for writer in range(writers)]
+    start = timeit.default_timer()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return timeit.default_timer() - start
+
+
+def check_threads(task_list, writers, operations):
+    notes = [task.note for task in task_list if task.note.startswith('writer ')]
+    assert len(notes) == writers * operations == len(set(notes)), 'lost or repeated tasks'
+    assert all(task.tags == 'done' for task in task_list if task.note.startswith('writer '))
+    ids = [task.id for task in task_list]
+    assert len(ids) == len(set(ids)) == len(task_list), 'ids shared'
+
+
+def stress_threads(threads, operations):
+    print('Threads ({} tasks, {} operations per thread):'.format(SIZE, operations))
+    for cls in (TaskList, ThreadSafeTaskList):
+        task_list = cls(stable_ids=True)
+        task_list.tasks = make_tasks(SIZE)
+        task_list.search(QUERIES[0])  # build the index before the clock starts
+        seconds = run_threads(task_list, 1, 0, operations)
+        print('  {}, 1 reader: {:.0f} reads/s'.format(cls.__name__, operations / seconds))
+    for readers, writers in ((threads, 0), (threads, threads // 2 or 1)):
+        task_list = ThreadSafeTaskList(stable_ids=True)
+        task_list.tasks = make_tasks(SIZE)
+        task_list.search(QUERIES[0])
+        seconds = run_threads(task_list, readers, writers, operations)
+        check_threads(task_list, writers, operations)
+        print('  ThreadSafeTaskList, {} readers and {} writers: {:.0f} reads/s, '
+              '{:.0f} writes/s'.format(readers, writers, readers * operations / seconds,
+                                       writers * operations / seconds))
+
+
+def work(filename, process, task_id, operations):
+    """Change the task file from another process; return the seconds it took.
+
+    :param task_id: the id of the task this process changes
+    """
+
+    task_list = TaskList(stable_ids=True)
+    task_journal = journal.Journal.open(task_list, filename, compact_size=COMPACT_SIZE)
+    start = timeit.default_timer()
+    for number in range(operations):
+        task_list.add_task('process {} task {}'.format(process, number), 'low', '')
+        task_journal.save()
+        task_list.update_tasks({task_id: {'note': 'process {} change {}'.format(
+            process, number)}})
+        task_journal.save()
+    task_journal.wait()
+    return timeit.default_timer() - start
+
+
+def stress_processes(processes, operations):
+    directory = tempfile.mkdtemp(prefix='tasklist-stress')
+    try:
+        filename = os.path.join(directory, 'shared.tsk')
+        task_list = TaskList(stable_ids=True)
+        task_list.add_tasks(('task of process {}'.format(process), 'high', '')
+                            for process in range(processes))
+        journal.Journal(task_list, filename).save()
+        with multiprocessing.Pool(processes) as pool:
+            start = timeit.default_timer()
+            pool.starmap(work, [(filename, process, task.id, operations)
+                                for process, task in enumerate(task_list)])
+            seconds = timeit.default_timer() - start
+        tasks = journal.load(filename)[0]
+        notes = [task.note for task in tasks]
+        added = [note for note in notes if ' task ' in note]
+        assert len(added) == processes * operations == len(set(added)), 'lost or repeated tasks'
+        for process in range(processes):
+            assert notes[process] == 'process {} change {}'.format(process, operations - 1), \
+                'lost change: ' + notes[process]
+        assert len(set(task.id for task in tasks)) == len(tasks), 'ids shared'
+        print('Processes: {} processes, {} saves each: {:.0f} saves/s in all, '
+              'nothing lost'.format(processes, operations * 2,
+                                    processes * operations * 2 / seconds))
+    finally:
+        shutil.rmtree(directory)
+
+
+def main(threads=8, processes=8, operations=200):
+    stress_threads(threads, operations)
+    stress_processes(processes, operations)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check that concurrent writers lose nothing.')
+    parser.add_argument('threads', type=int, nargs='?', default=8,
+                        help='writer threads (default: %(default)s)')
+    parser.add_argument('processes', type=int, nargs='?', default=8,
+                        help='writer processes (default: %(default)s)')
+    parser.add_argument('operations', type=int, nargs='?', default=200,
+                        help='changes made by each writer (default: %(default)s)')
+    args = parser.parse_args()
+    main(args.threads, args.processes, args.operations)
@@ -0,0 +1,445 @@
+#------------------------------------------
+# Name:     cli
+# Purpose:  Command line interface for working with task files without the ui
+#
+# Author:   Robin Siebler
+# Created:  10/18/26
+#------------------------------------------
+__author__ = 'Robin Siebler'
+__date__ = '10/18/26'
+
+# Usage:
+#   python cli.py add work.tsk "Renew the certificate" -p high -t ops
+#   python cli.py search work.tsk disk --format csv
+#   python cli.py query work.tsk 'priority:high created:>2026-01-01' --explain
+#   python cli.py delete work.tsk 12 15
+#   python cli.py sort work.tsk --by date --reverse
+#   python cli.py import work.tsk tasks.csv
+#   python cli.py export work.tsk -o tasks.jsonl
+#   python cli.py --timings stats work.tsk
+#
+# Only argparse is imported up front; each command imports what it needs, and nothing
+# imports ui or speech.  The commands that only read (search, sort, export, stats)
+# stream a binary task file (see taskfile.TaskFile) a chunk at a time, so they run in
+# constant memory however many tasks it holds.  Pickled and journaled task files have
+# to be loaded whole; convert them with "python taskfile.py <file>".  A task database
+# (see sqlstore.py; created with --engine sqlite or "python sqlstore.py <file>") is
+# queried in place.
+
+import argparse, contextlib, os, sys
+
+FORMATS = ('text', 'csv', 'jsonl')
+CHUNK_SIZE = 4096  # tasks decoded at a time when sorting a binary task file
+
+
+class CommandError(Exception):
+    pass
+
+
+def _read(filename):
+    """Return the tasks of a task file: a list, or a lazy taskfile.TaskFile."""
+
+    import pickle, journal, util
+    from taskfile import TaskFileError
+    name = util.validate_file(filename)
+    if not name:
+        raise CommandError('"{}" is not a valid task file.'.format(filename))
+    try:
+        return journal.load(name)[0]
+    except (IOError, EOFError, pickle.PickleError, TaskFileError) as e:
+        raise CommandError('"{}" is not a valid task file: {}'.format(name, e))
+
+
+def _open(filename, engine='file'):
+    """Return a TaskList holding a task file and the journal that saves its changes.
+
+    A task file that doesn't exist yet is created when it's saved: in the binary format,
+    or, with engine 'sqlite', as a task database.  A task database is returned as a
+    sqlstore.SQLiteTaskList, which commits each change itself, with no journal.
+    """
+
+    import pickle, journal, sqlite3, sqlstore, util
+    from taskfile import TaskFileError
+    from tasklist import Task, TaskList
+    filename = util.valid_filename(filename)
+    exists = os.path.exists(filename)
+    if (exists and sqlstore.is_sqlite_file(filename)) or (not exists and engine == 'sqlite'):
+        try:
+            return sqlstore.SQLiteTaskList(filename), None
+        except sqlite3.DatabaseError as e:
+            raise CommandError('"{}" is not a valid task file: {}'.format(filename, e))
+    tasklist = TaskList(stable_ids=True)
+    if exists:
+        try:
+            task_journal = journal.Journal.open(tasklist, filename)
+        except (IOError, EOFError, pickle.PickleError, TaskFileError) as e:
+            raise CommandError('"{}" is not a valid task file: {}'.format(filename, e))
+        if len(tasklist):
+            Task.last_id = tasklist.tasks[-1].id
+    else:
+        # if another program creates the file first, the tasks added here are merged in
+        task_journal = journal.Journal(tasklist, filename, binary=True,
+                                       stamp=util.stamp(filename))
+    return tasklist, task_journal
+
+
+def _save(task_journal):
+    """Save the changes recorded by a journal (if there is one) and wait until they are
+    on disk.
+
+    The changes are appended to the journal (or, for a new file, the snapshot is
+    written) in the foreground, so a failure is reported; a compaction the journal
+    starts in the background is only an optimization.  Changes saved by another program
+    in the meantime are merged, not overwritten.
+    """
+
+    if task_journal is None:
+        return  # a task database; its changes are already committed
+    try:
+        task_journal.save()
+    except (IOError, OSError) as e:
+        raise CommandError('"{}" could not be saved: {}'.format(task_journal.filename, e))
+    task_journal.wait()
+
+
+@contextlib.contextmanager
+def _output(filename):
+    """Open filename for writing, or use stdout (which is left open) if there is none."""
+
+    if not filename:
+        yield sys.stdout
+        return
+    with open(filename, 'w', newline='') as fh:
+        yield fh
+
+
+@contextlib.contextmanager
+def _input(filename):
+    """Open filename for reading, or use stdin (which is left open) for '-'."""
+
+    if filename == '-':
+        yield sys.stdin
+        return
+    with open(filename, newline='', encoding='utf-8') as fh:
+        yield fh
+
+
+def _write(tasks, fmt, fh):
+    """Write tasks one at a time in the given format; return the number written."""
+
+    if fmt == 'csv':
+        from transfer import export_csv
+        return export_csv(tasks, fh)
+    if fmt == 'jsonl':
+        from transfer import export_jsonl
+        return export_jsonl(tasks, fh)
+    count = 0
+    for task in tasks:
+        fh.write(str(task))
+        fh.write('\n')
+        count += 1
+    return count
+
+
+def by_priority(tasks, reverse=False):
+    """Yield tasks from the highest priority to the lowest (in id order within one).
+
+    :param tasks: a list of tasks, a taskfile.TaskFile (which is read one chunk at a
+        time, once for each priority) or a sqlstore.SQLiteTaskList
+    :param reverse: lowest priority first
+    """
+
+    from tasklist import PRIORITIES
+    codes = list(range(len(PRIORITIES)))
+    if not reverse:
+        codes.reverse()
+    if hasattr(tasks, 'tasks_by_priority'):  # a task database reads each priority in order
+        for code in codes:
+            for task in tasks.tasks_by_priority(code):
+                yield task
+        return
+    if not hasattr(tasks, 'rows'):
+        sign = 1 if reverse else -1
+        for task in sorted(tasks, key=lambda task: sign * task._priority):
+            yield task
+        return
+    priorities = tasks.priorities
+    for code in codes:
+        for start in range(0, len(tasks), CHUNK_SIZE):
+            rows = [row for row in range(start, min(start + CHUNK_SIZE, len(tasks)))
+                    if priorities[row] == code]
+            for task in tasks.rows(rows):
+                yield task
+
+
+def by_date(tasks, reverse=False):
+    """Yield tasks from the oldest to the newest (in id order within a day).
+
+    :param tasks: a list of tasks, a sqlstore.SQLiteTaskList or a taskfile.TaskFile,
+        which is ordered by a counting sort of its creation date column (4 bytes per
+        task) and then decoded a chunk at a time
+    :param reverse: newest first
+    """
+
+    if hasattr(tasks, 'tasks_by_date'):  # a task database has an index on the date
+        for task in tasks.tasks_by_date(newest_first=reverse):
+            yield task
+        return
+    if not hasattr(tasks, 'rows'):
+        ordered = sorted(tasks, key=lambda task: task.created)
+        for task in (reversed(ordered) if reverse else ordered):
+            yield task
+        return
+    import collections
+    from array import array
+    created = tasks.created
+    counts = collections.Counter(created)
+    position, next_row = 0, {}
+    for date in sorted(counts):
+        next_row[date] = position
+        position += counts[date]
+    order = array('I', [0]) * len(tasks)
+    for row, date in enumerate(created):
+        order[next_row[date]] = row
+        next_row[date] += 1
+    if reverse:
+        order.reverse()
+    for start in range(0, len(order), CHUNK_SIZE):
+        batch = order[start:start + CHUNK_SIZE]
+        rows = sorted(batch)
+        decoded = dict(zip(rows, tasks.rows(rows)))
+        for row in batch:
+            yield decoded[row]
+
+
+def run_add(args):
+    from tasklist import Task
+    tasklist, task_journal = _open(args.file, args.engine)
+    tasklist.add_task(args.note, args.priority, args.tags)
+    _save(task_journal)
+    print('Added task {}.'.format(Task.last_id))
+
+
+def run_search(args):
+    query = args.query.lower()
+    tasks = _read(args.file)
+    if hasattr(tasks, 'search'):  # a task database searches its FTS table
+        _write(tasks.search(query), args.format, sys.stdout)
+    else:
+        _write((task for task in tasks if task.match(query)), args.format, sys.stdout)
+
+
+def run_query(args):
+    import query
+    from tasklist import TaskList
+    tasks = _read(args.file)
+    try:
+        if hasattr(tasks, 'explain'):  # a task database plans its own queries
+            if args.explain:
+                print(tasks.explain(args.query))
+            else:
+                _write(tasks.query(args.query), args.format, sys.stdout)
+            return
+        tasklist = TaskList()
+        tasklist.tasks = tasks
+        plan = query.plan(tasklist, args.query)
+    except query.QueryError as e:
+        raise CommandError(e)
+    if args.explain:
+        print(plan.explain())
+    else:
+        _write(plan.run(), args.format, sys.stdout)
+
+
+def run_delete(args):
+    tasklist, task_journal = _open(args.file, args.engine)
+    missing = [task_id for task_id in args.ids if tasklist._find_task(task_id) is None]
+    deleted = tasklist.delete_tasks(args.ids)
+    _save(task_journal)
+    print('Deleted {} task(s).'.format(deleted))
+    if missing:
+        raise CommandError('No such task: {}'.format(', '.join(str(i) for i in missing)))
+
+
+def run_sort(args):
+    order = by_date if args.by == 'date' else by_priority
+    _write(order(_read(args.file), args.reverse), args.format, sys.stdout)
+
+
+def _format(filename, fmt):
+    """Return the format given, or the one the file extension implies."""
+
+    if fmt:
+        return fmt
+    extension = os.path.splitext(filename or '')[1].lstrip('.').lower()
+    return extension if extension in FORMATS else None
+
+
+def run_import(args):
+    import transfer
+    fmt = _format(args.source, args.format)
+    if fmt not in ('csv', 'jsonl'):
+        raise CommandError('Use --format to say whether "{}" is csv or jsonl.'.format(args.source))
+    tasklist, task_journal = _open(args.file, args.engine)
+    # a task database imports in one transaction, so a bad line leaves it as it was
+    batch = tasklist.batch() if hasattr(tasklist, 'batch') else contextlib.nullcontext()
+    with _input(args.source) as fh, batch:
+        try:
+            if fmt == 'csv':
+                count = transfer.import_csv(tasklist, fh)
+            else:
+                count = transfer.import_jsonl(tasklist, fh)
+        except transfer.TransferError as e:
+            raise CommandError('"{}" {}; nothing was imported.'.format(args.source, e))
+    _save(task_journal)
+    print('Imported {} task(s).'.format(count))
+
+
+def run_export(args):
+    tasks = _read(args.file)
+    with _output(args.output) as fh:
+        _write(tasks, _format(args.output, args.format) or 'text', fh)
+
+
+def run_stats(args):
+    import collections, datetime
+    import taskfile, util
+    from tasklist import DATE_FORMAT, PRIORITIES
+    tasks = _read(args.file)
+    name = util.valid_filename(args.file)
+    kind = 'binary' if taskfile.is_task_file(name) else 'pickle'
+    if hasattr(tasks, 'count_by_priority'):  # count in the database
+        kind = 'sqlite'
+        priorities = dict((code, tasks.count_by_priority(code))
+                          for code in range(len(PRIORITIES)))
+        by_date = tasks.tasks_by_date()
+        dates = (by_date[0].created, by_date[-1].created) if len(tasks) else None
+    elif hasattr(tasks, 'priorities'):  # read the columns without decoding any task
+        priorities, created = collections.Counter(tasks.priorities), tasks.created
+        dates = (min(created), max(created)) if len(tasks) else None
+    else:
+        priorities = collections.Counter(task._priority for task in tasks)
+        dates = (min(task.created for task in tasks),
+                 max(task.created for task in tasks)) if tasks else None
+    print('File: {} ({}, {:,} bytes)'.format(name, kind, os.path.getsize(name)))
+    print('Tasks: {}'.format(len(tasks)))
+    for code in reversed(range(len(PRIORITIES))):
+        print('  {}: {}'.format(PRIORITIES[code], priorities[code]))
+    if dates:
+        print('Created: {} - {}'.format(
+            *[datetime.date.fromordinal(date).strftime(DATE_FORMAT) for date in dates]))
+
+
+def run_tags(args):
+    import collections
+    from tasklist import tag_set
+    tasks = _read(args.file)
+    if hasattr(tasks, 'tag_counts'):  # a task database counts its distinct tags strings
+        counts = tasks.tag_counts()
+    elif getattr(tasks, 'strings', None) is not None:
+        # count the tags column of a binary task file without decoding any task
+        counts = collections.Counter()
+        for code, count in collections.Counter(tasks.tags).items():
+            for tag in tag_set(tasks.strings[code]):
+                counts[tag] += count
+    else:
+        counts = collections.Counter(tag for task in tasks for tag in task.tag_set)
+    for tag, count in sorted(counts.items(), key=lambda item: (-item[1], item[0])):
+        print('{:>8}  {}'.format(count, tag))
+
+
+def parser():
+    """Return the argparse.ArgumentParser for the command line."""
+
+    main_parser = argparse.ArgumentParser(description='Work with task files from the command line.')
+    main_parser.add_argument('--timings', action='store_true',
+                             help='print how long the task list operations took (to stderr)')
+    main_parser.add_argument('--engine', choices=('file', 'sqlite'), default='file',
+                             help='how to store a task file the command creates: a binary '
+                             'task file with a journal, or a SQLite database')
+    commands = main_parser.add_subparsers(dest='command', metavar='command')
+    commands.required = True
+
+    command = commands.add_parser('add', help='add a task')
+    command.add_argument('file')
+    command.add_argument('note')
+    command.add_argument('-p', '--priority', type=str.lower, default='low',
+                         choices=('low', 'medium', 'high'))
+    command.add_argument('-t', '--tags', default='')
+    command.set_defaults(run=run_add)
+
+    command = commands.add_parser('search', help='print the tasks that contain some text')
+    command.add_argument('file')
+    command.add_argument('query')
+    command.add_argument('-f', '--format', choices=FORMATS, default='text')
+    command.set_defaults(run=run_search)
+
+    command = commands.add_parser('query', help='print the tasks matching a query, e.g. '
+                                  '\'priority:high tag:ops created:>2026-01-01 "disk full"\'')
+    command.add_argument('file')
+    command.add_argument('query')
+    command.add_argument('--explain', action='store_true',
+                         help='show how the query would be run instead of running it')
+    command.add_argument('-f', '--format', choices=FORMATS, default='text')
+    command.set_defaults(run=run_query)
+
+    command = commands.add_parser('delete', help='delete tasks by id')
+    command.add_argument('file')
+    command.add_argument('ids', type=int, nargs='+', metavar='id')
+    command.set_defaults(run=run_delete)
+
+    command = commands.add_parser('sort', help='print the tasks by priority or date')
+    command.add_argument('file')
+    command.add_argument('--by', choices=('priority', 'date'), default='priority')
+    command.add_argument('-r', '--reverse', action='store_true',
+                         help='lowest priority or newest first')
+    command.add_argument('-f', '--format', choices=FORMATS, default='text')
+    command.set_defaults(run=run_sort)
+
+    command = commands.add_parser('import', help='add the tasks in a CSV or JSON Lines file')
+    command.add_argument('file')
+    command.add_argument('source', help='the file to import, or - for stdin')
+    command.add_argument('-f', '--format', choices=('csv', 'jsonl'))
+    command.set_defaults(run=run_import)
+
+    command = commands.add_parser('export', help='write every task as text, CSV or JSON Lines')
+    command.add_argument('file')
+    command.add_argument('-o', '--output', help='the file to create (default: stdout)')
+    command.add_argument('-f', '--format', choices=FORMATS,
+                         help='default: from the output file name, otherwise text')
+    command.set_defaults(run=run_export)
+
+    command = commands.add_parser('stats', help='summarize a task file')
+    command.add_argument('file')
+    command.set_defaults(run=run_stats)
+
+    command = commands.add_parser('tags', help='print each tag with the number of tasks '
+                                  'that have it')
+    command.add_argument('file')
+    command.set_defaults(run=run_tags)
+    return main_parser
+
+
+def main(argv=None):
+    """Run a command; return the exit status."""
+
+    args = parser().parse_args(argv)
+    if args.timings:
+        import stats
+        stats.enable()
+    try:
+        args.run(args)
+    except CommandError as e:
+        print('ERROR: {}'.format(e), file=sys.stderr)
+        return 1
+    except BrokenPipeError:
+        # the reader (e.g. head) went away; don't complain when stdout is closed
+        sys.stdout = open(os.devnull, 'w')
+        return 1
+    finally:
+        if args.timings:
+            print(stats.report(), file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
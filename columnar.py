@@ -0,0 +1,115 @@
+#------------------------------------------
+# Name:     columnar
+# Purpose:  Compact, column oriented storage for large task lists
+#
+# Author:   Robin Siebler
+# Created:  10/18/26
+#------------------------------------------
+__author__ = 'Robin Siebler'
+__date__ = '10/18/26'
+
+import bisect, datetime
+from array import array
+from tasklist import Task, PRIORITIES, priority_code, tag_set, DATE_FORMAT
+
+
+class TaskView(object):
+    """A read-only, Task-like view of one row of a ColumnStore."""
+
+    __slots__ = ('_store', '_row')
+
+    def __init__(self, store, row):
+        self._store = store
+        self._row = row
+
+    id = property(lambda self: self._store.ids[self._row])
+    note = property(lambda self: self._store.notes[self._row])
+    tags = property(lambda self: self._store.strings[self._store.tags[self._row]])
+    tag_set = property(lambda self: tag_set(self.tags))
+    created = property(lambda self: self._store.created[self._row])
+    _priority = property(lambda self: self._store.priorities[self._row])
+    priority = property(lambda self: PRIORITIES[self._priority])
+    version = 0
+
+    @property
+    def creation_date(self):
+        return datetime.date.fromordinal(self.created).strftime(DATE_FORMAT)
+
+    __str__ = Task.__str__
+    match = Task.match
+
+    def __getstate__(self):
+        store, row = self._store, self._row
+        return (store.ids[row], store.notes[row], store.priorities[row],
+                store.strings[store.tags[row]], store.created[row])
+
+    def to_task(self):
+        """Return a real (mutable) Task holding the same data."""
+
+        return Task.from_state(self.__getstate__())
+
+
+class ColumnStore(object):
+    """Holds tasks as parallel arrays instead of one object per task.
+
+    Ids, priorities and creation dates are stored in typed arrays, tags are stored as
+    an index into a table of interned strings.  Tasks must be appended in id order.
+    """
+
+    def __init__(self, tasks=()):
+        self.ids = array('l')
+        self.priorities = array('b')
+        self.created = array('l')
+        self.tags = array('l')
+        self.notes = []
+        self.strings = []  # the interned tag strings
+        self._string_codes = {}
+        for task in tasks:
+            self.append(task)
+
+    def _intern(self, string):
+        code = self._string_codes.get(string)
+        if code is None:
+            code = self._string_codes[string] = len(self.strings)
+            self.strings.append(string)
+        return code
+
+    def append(self, task):
+        """Append a task (or anything Task-like) to the store."""
+
+        if self.ids and task.id <= self.ids[-1]:
+            raise ValueError('tasks must be appended in id order')
+        self.ids.append(task.id)
+        self.priorities.append(priority_code(task.priority))
+        self.created.append(task.created)
+        self.tags.append(self._intern(task.tags))
+        self.notes.append(task.note)
+
+    def find(self, task_id):
+        """Return a view of the task with the given id, or None."""
+
+        row = bisect.bisect_left(self.ids, task_id)
+        if row < len(self.ids) and self.ids[row] == task_id:
+            return TaskView(self, row)
+        return None
+
+    def to_tasks(self):
+        """Return the stored tasks as a list of real Task objects."""
+
+        return [view.to_task() for view in self]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [TaskView(self, r) for r in range(*row.indices(len(self)))]
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError('task index out of range')
+        return TaskView(self, row)
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield TaskView(self, row)
@@ -8,13 +8,19 @@ The following actions are available:
 		Load a task file - open a previously saved task file
 		Save a task file - save the current tasks to a file
 		Delete a task file - delete an unneeded task file
+		Stats - time task list operations (tap again to see the timings)
 	Tasks:
 		Add a task - create a new task
 		Delete a task - delete a completed or unneeded task
 		Modify a task - you can change all aspects of a task 
-		Search tasks - Search for text or tags
+		Search tasks - Search for text or tags (matches are shown as you type)
+			or run a query, e.g. priority:high tag:ops created:>2026-01-01 "disk full"
+		Undo/Redo - undo (or redo) the latest change to the tasks
 		Recite: Speak the specified task(s) aloud
+		Pause/Skip/Stop - pause, skip a task or cancel a recitation
 	Order:
 		Sort tasks by number
 		Sort tasks by priority 
+		Sort tasks by date (newest first)
+		Prev/Next - page through a long list of tasks
 """
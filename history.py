@@ -0,0 +1,68 @@
+#------------------------------------------
+# Name:     history
+# Purpose:  Bounded undo/redo log of the changes made to a task list
+#
+# Author:   Robin Siebler
+# Created:  10/18/26
+#------------------------------------------
+__author__ = 'Robin Siebler'
+__date__ = '10/18/26'
+
+# Each entry is what it takes to reverse one change: (ids, states), the ids of the tasks
+# to delete and the __getstate__() tuples of the tasks to put back (replacing the task
+# with the same id, or restoring a deleted one).  So adding tasks costs an entry of ids
+# and modifying or deleting them an entry of their old states.  Reversing an entry
+# gives the entry that reverses it again (see TaskList.undo()), so redo needs nothing
+# stored up front, and undo and redo cost only the tasks they change.
+
+import collections
+
+HISTORY_SIZE = 100  # changes kept for undo
+
+
+class History(object):
+    """The undo and redo stacks of a task list; the oldest changes fall off the bottom
+    of the undo stack once it holds size entries."""
+
+    def __init__(self, size=HISTORY_SIZE):
+        self._undo = collections.deque(maxlen=size)
+        self._redo = []
+
+    def __len__(self):
+        return len(self._undo)
+
+    @property
+    def can_undo(self):
+        return bool(self._undo)
+
+    @property
+    def can_redo(self):
+        return bool(self._redo)
+
+    def record(self, ids, states):
+        """Remember how to reverse a new change; the changes undone so far can't be
+        redone any more."""
+
+        self._undo.append((ids, states))
+        if self._redo:
+            self._redo = []
+
+    def pop_undo(self):
+        """Return the entry that reverses the latest change, or None."""
+
+        return self._undo.pop() if self._undo else None
+
+    def pop_redo(self):
+        """Return the entry that redoes the latest change undone, or None."""
+
+        return self._redo.pop() if self._redo else None
+
+    def push_undo(self, entry):
+        self._undo.append(entry)
+
+    def push_redo(self, entry):
+        self._redo.append(entry)
+
+    def clear(self):
+        self._undo.clear()
+        self._redo = []
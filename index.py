@@ -0,0 +1,330 @@
+#------------------------------------------
+# Name:     index
+# Purpose:  Secondary indexes used by TaskList
+#
+# Author:   Robin Siebler
+# Created:  10/18/26
+#------------------------------------------
+__author__ = 'Robin Siebler'
+__date__ = '10/18/26'
+
+import bisect
+
+GRAM = 3  # length of the n-grams used to find vocabulary words
+WORD = ''  # the key of a trie node that marks the end of a word (holding the word)
+
+
+def grams(word):
+    """Return the set of n-grams contained in a word."""
+
+    return set(word[i:i + GRAM] for i in range(len(word) - GRAM + 1))
+
+
+class TextIndex(object):
+    """An inverted index over the (lower case) words in the note and tags of each task.
+
+    Words map to the tasks that contain them and n-grams map to the words that contain
+    them, so a substring search only has to look at the tasks whose words could match.
+    The words are also kept in a prefix trie for searching as the user types.
+    """
+
+    def __init__(self, tasks=()):
+        self.postings = {}  # word -> set of tasks
+        self.vocabulary = {}  # n-gram -> set of words
+        self.trie = {}  # character -> child node; node[WORD] is the word ending there
+        for task in tasks:
+            self.add(task)
+
+    @staticmethod
+    def words(task):
+        return set((task.note.lower() + ' ' + task.tags.lower()).split())
+
+    def add(self, task):
+        """Index a task.  Must be called after the task's text has been set."""
+
+        for word in self.words(task):
+            posting = self.postings.get(word)
+            if posting is None:
+                posting = self.postings[word] = set()
+                for gram in grams(word):
+                    self.vocabulary.setdefault(gram, set()).add(word)
+                node = self.trie
+                for char in word:
+                    node = node.setdefault(char, {})
+                node[WORD] = word
+            posting.add(task)
+
+    def discard(self, task):
+        """Remove a task from the index.  Must be called before the task's text changes."""
+
+        for word in self.words(task):
+            posting = self.postings.get(word)
+            if posting is None:
+                continue
+            posting.discard(task)
+            if not posting:
+                del self.postings[word]
+                for gram in grams(word):
+                    words = self.vocabulary[gram]
+                    words.discard(word)
+                    if not words:
+                        del self.vocabulary[gram]
+                self._remove_from_trie(word)
+
+    def _remove_from_trie(self, word):
+        path, node = [], self.trie
+        for char in word:
+            path.append((node, char))
+            node = node[char]
+        del node[WORD]
+        for parent, char in reversed(path):
+            if parent[char]:
+                break
+            del parent[char]  # prune the nodes no other word needs
+
+    def prefixed(self, prefix):
+        """Return the indexed words that start with prefix."""
+
+        node = self.trie
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return []
+        words, nodes = [], [node]
+        while nodes:
+            node = nodes.pop()
+            for key, child in node.items():
+                if key == WORD:
+                    words.append(child)
+                else:
+                    nodes.append(child)
+        return words
+
+    def _matching_words(self, fragment):
+        """Return the indexed words that contain fragment."""
+
+        if len(fragment) < GRAM:
+            return [word for word in self.postings if fragment in word]
+        candidates = None
+        for gram in grams(fragment):
+            words = self.vocabulary.get(gram)
+            if not words:
+                return []
+            candidates = words if candidates is None else candidates & words
+        return [word for word in candidates if fragment in word]
+
+    def candidates(self, search_string, limit=None):
+        """Return a superset of the tasks that could contain search_string.
+
+        Every whitespace separated fragment of the search string has to lie inside a
+        single word of a matching task.  Fragments are intersected smallest first and
+        fragments that wouldn't narrow the result much are left for the caller to verify.
+
+        :param limit: give up if the smallest candidate set would be larger than this
+        :return: a set of tasks, or None if a full scan would be cheaper
+        """
+
+        return self._intersect([self._matching_words(fragment)
+                                for fragment in set(search_string.split())], limit)
+
+    def estimate(self, search_string):
+        """Return an upper bound on the number of tasks that contain search_string.
+
+        :return: the number, or None if search_string has no words
+        """
+
+        sizes = [sum(len(self.postings[word]) for word in self._matching_words(fragment))
+                 for fragment in set(search_string.split())]
+        return min(sizes) if sizes else None
+
+    def prefix_candidates(self, search_string):
+        """Return the tasks in which every whitespace separated fragment of search_string
+        starts a word.  Only the words under each fragment's trie node are looked at.
+        """
+
+        return self._intersect([self.prefixed(fragment)
+                                for fragment in set(search_string.split())], None, exact=True)
+
+    def _intersect(self, fragment_words, limit, exact=False):
+        """Intersect the tasks containing any of the words of each fragment, smallest first.
+
+        :param fragment_words: a list holding the matching words of each fragment
+        :param exact: intersect every fragment, even those that hardly narrow the result
+        """
+
+        fragments = []
+        for words in fragment_words:
+            if not words:
+                return set()
+            fragments.append((sum(len(self.postings[word]) for word in words), words))
+        if not fragments:
+            return None
+        fragments.sort(key=lambda fragment: fragment[0])
+        if limit is not None and fragments[0][0] > limit:
+            return None
+        result = None
+        for size, words in fragments:
+            if result is not None and size > 4 * len(result) and not exact:
+                break
+            tasks = set()
+            for word in words:
+                tasks.update(self.postings[word])
+            result = tasks if result is None else result & tasks
+            if not result:
+                break
+        return result
+
+
+class PriorityIndex(object):
+    """The ids of the tasks of each priority, in id order."""
+
+    def __init__(self, tasks=(), priorities=3):
+        self.buckets = [[] for _ in range(priorities)]
+        ids, codes = getattr(tasks, 'ids', None), getattr(tasks, 'priorities', None)
+        if ids is not None and codes is not None:
+            # a column store: no need to look at (or decode) the tasks themselves
+            for task_id, code in zip(ids, codes):
+                self.buckets[code].append(task_id)
+            for bucket in self.buckets:
+                bucket.sort()
+        else:
+            for task in tasks:
+                self.add(task)
+
+    def add(self, task):
+        bucket = self.buckets[task._priority]
+        if not bucket or bucket[-1] < task.id:
+            bucket.append(task.id)
+        else:
+            bisect.insort(bucket, task.id)
+
+    def discard(self, task):
+        bucket = self.buckets[task._priority]
+        i = bisect.bisect_left(bucket, task.id)
+        if i < len(bucket) and bucket[i] == task.id:
+            del bucket[i]
+
+    def ids(self, code):
+        """Return the ids of the tasks with the given priority code."""
+
+        return self.buckets[code]
+
+    def count(self, code):
+        return len(self.buckets[code])
+
+
+class TagIndex(object):
+    """The ids of the tasks with each tag.
+
+    How many tasks have a tag (its facet count) is the size of its set, and the tasks
+    with several tags are the intersection (or union) of their sets.
+    """
+
+    def __init__(self, tasks=()):
+        self.postings = {}  # tag -> set of task ids
+        ids, codes = getattr(tasks, 'ids', None), getattr(tasks, 'tags', None)
+        strings = getattr(tasks, 'strings', None)
+        if ids is not None and codes is not None and strings is not None:
+            # a column store: each distinct tags string is split once, no task decoded
+            from tasklist import tag_set
+            sets = [tag_set(string) for string in strings]
+            for task_id, code in zip(ids, codes):
+                for tag in sets[code]:
+                    self._posting(tag).add(task_id)
+        else:
+            for task in tasks:
+                self.add(task)
+
+    def _posting(self, tag):
+        posting = self.postings.get(tag)
+        if posting is None:
+            posting = self.postings[tag] = set()
+        return posting
+
+    def add(self, task):
+        for tag in task.tag_set:
+            self._posting(tag).add(task.id)
+
+    def discard(self, task):
+        """Remove a task from the index.  Must be called before the task's tags change."""
+
+        for tag in task.tag_set:
+            posting = self.postings.get(tag)
+            if posting is not None:
+                posting.discard(task.id)
+                if not posting:
+                    del self.postings[tag]
+
+    def count(self, tag):
+        return len(self.postings.get(tag, ()))
+
+    def counts(self):
+        """Return a tag -> number of tasks dict."""
+
+        return dict((tag, len(posting)) for tag, posting in self.postings.items())
+
+    def ids(self, tags, match_any=False):
+        """Return the set of ids of the tasks with all of the tags (smallest set first),
+        or with any of them.
+
+        :param tags: an iterable of normalized tags
+        """
+
+        postings = sorted((self.postings.get(tag, ()) for tag in tags), key=len)
+        if not postings:
+            return set()
+        if match_any:
+            return set().union(*postings)
+        return set(postings[0]).intersection(*postings[1:])
+
+
+class DateIndex(object):
+    """Task ids ordered by creation date (and by id within a day).
+
+    Each entry is a single int, created << 32 | id, so the index is one sorted list and
+    a date range is found with two bisections.
+    """
+
+    def __init__(self, tasks=()):
+        ids, created = getattr(tasks, 'ids', None), getattr(tasks, 'created', None)
+        if ids is not None and created is not None:
+            # a column store: no need to look at (or decode) the tasks themselves
+            self.keys = sorted(day << 32 | task_id for day, task_id in zip(created, ids))
+        else:
+            self.keys = sorted(task.created << 32 | task.id for task in tasks)
+
+    def add(self, task):
+        key = task.created << 32 | task.id
+        if not self.keys or self.keys[-1] < key:
+            self.keys.append(key)  # the usual case: a task created today
+        else:
+            bisect.insort(self.keys, key)
+
+    def discard(self, task):
+        key = task.created << 32 | task.id
+        i = bisect.bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            del self.keys[i]
+
+    def ids(self, start=None, end=None):
+        """Return the ids of the tasks created from start to end (inclusive), oldest first.
+
+        :param start: the first date ordinal (default: no limit)
+        :param end: the last date ordinal (default: no limit)
+        """
+
+        low = 0 if start is None else bisect.bisect_left(self.keys, start << 32)
+        high = len(self.keys) if end is None else bisect.bisect_left(self.keys, (end + 1) << 32)
+        return [key & 0xFFFFFFFF for key in self.keys[low:high]]
+
+    def count(self, start=None, end=None):
+        """Return the number of tasks created from start to end (inclusive)."""
+
+        low = 0 if start is None else bisect.bisect_left(self.keys, start << 32)
+        high = len(self.keys) if end is None else bisect.bisect_left(self.keys, (end + 1) << 32)
+        return max(high - low, 0)
+
+    def newest(self, count):
+        """Return the ids of the count most recently created tasks, newest first."""
+
+        return [key & 0xFFFFFFFF for key in self.keys[:-count - 1:-1]] if count > 0 else []
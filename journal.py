@@ -0,0 +1,402 @@
+#------------------------------------------
+# Name:     journal
+# Purpose:  Append-only journal of the changes made to a task file
+#
+# Author:   Robin Siebler
+# Created:  10/18/26
+#------------------------------------------
+__author__ = 'Robin Siebler'
+__date__ = '10/18/26'
+
+import contextlib, os, pickle, sys
+import sqlstore, stats, taskfile, util
+from saver import AsyncSaver
+from tasklist import Task
+
+JOURNAL_EXT = '.journal'
+OLD_EXT = '.old'
+COMPACT_SIZE = 256 * 1024  # rewrite the snapshot once the journal is bigger than this
+
+
+def journal_name(filename):
+    return filename + JOURNAL_EXT
+
+
+def journal_files(filename):
+    """Return the journal files of a task file, oldest first."""
+
+    name = journal_name(filename)
+    return name + OLD_EXT, name
+
+
+def apply_record(tasks, index, record):
+    """Apply one journal record to a list of tasks.
+
+    :param tasks: the list of tasks to change
+    :param index: a task.id -> task dict for tasks
+    :param record: a (seq, 'delta', states, deleted ids) tuple
+    """
+
+    operation, args = record[1], record[2:]
+    if operation == 'delta':
+        states, deleted = args
+        deleted = set(task_id for task_id in deleted if index.pop(task_id, None))
+        if deleted:
+            tasks[:] = [task for task in tasks if task.id not in deleted]
+        for state in states:
+            task = index.get(state[0])
+            if task:
+                task.__setstate__(state)
+            else:
+                task = index[state[0]] = Task.from_state(state)
+                tasks.append(task)
+
+
+def merge(theirs, delta, bases):
+    """Fold the changes made here into the tasks as another program has saved them.
+
+    A field changed here wins over the same task's field as saved there; the fields not
+    changed here keep their saved values.  A task deleted on either side stays deleted
+    (a change made here to a task deleted there is dropped).  A task added here whose id
+    was taken there gets a new id.
+
+    :param theirs: a task.id -> task dict of the tasks in the file now
+    :param delta: the changes made here, TaskList.delta()
+    :param bases: the states of the tasks before the changes made here, TaskList.dirty
+    :return: the delta to save, (states, deleted ids)
+    """
+
+    states = []
+    largest = max(theirs) if theirs else 0
+    for state in delta[0]:
+        base, task = bases.get(state[0]), theirs.get(state[0])
+        if base is None:  # added here
+            if task is not None:
+                largest = Task.allocate_ids(1, largest)
+                state = (largest,) + state[1:]
+            states.append(state)
+        elif task is not None:
+            saved = task.__getstate__()
+            state = tuple(ours if ours != old else current
+                          for ours, old, current in zip(state, base, saved))
+            if state != saved:
+                states.append(state)
+    deleted = [task_id for task_id in delta[1]
+               if bases.get(task_id) is not None and task_id in theirs]
+    return states, deleted
+
+
+def read_records(filename):
+    """Yield the complete records of a journal file.
+
+    A record cut short by a crash ends the journal; the file is truncated after the last
+    complete record so new records aren't appended after the damaged one.
+    """
+
+    if not os.path.exists(filename):
+        return
+    with open(filename, 'r+b') as fh:
+        good = 0
+        while True:
+            try:
+                record = pickle.load(fh)
+            except EOFError:
+                break
+            except (pickle.UnpicklingError, ValueError, IndexError, AttributeError):
+                fh.truncate(good)
+                break
+            good = fh.tell()
+            yield record
+
+
+def load(filename):
+    """Load a journaled task file: its snapshot plus any journal records.
+
+    The file is locked (shared) meanwhile, so it can't be compacted part way through.
+
+    :param filename: the name of the task file
+    :return: (tasks, seq) where seq is the sequence number of the last change.  A
+        binary task file without a journal is returned as a (lazy) taskfile.TaskFile,
+        and a task database as a sqlstore.SQLiteTaskList (with seq 0; it has no journal).
+    """
+
+    if sqlstore.is_sqlite_file(filename):
+        return sqlstore.SQLiteTaskList(filename), 0
+    with util.file_lock(filename, shared=True):
+        return _load(filename)
+
+
+def _load(filename):
+    """load(), with the file already locked."""
+
+    if stats.enabled:
+        stats.count('bytes_read', sum(os.path.getsize(name) for name in
+                                      (filename,) + journal_files(filename)
+                                      if os.path.exists(name)))
+    if taskfile.is_task_file(filename):
+        tasks = taskfile.TaskFile(filename)
+        seq = tasks.seq
+        if not any(os.path.exists(journal) for journal in journal_files(filename)):
+            return tasks, seq  # leave the tasks in the file until they're needed
+    else:
+        with open(filename, 'rb') as fh:
+            tasks = pickle.load(fh)
+            try:
+                seq = pickle.load(fh)
+            except EOFError:
+                seq = 0  # a plain task file
+    if not isinstance(tasks, list):
+        tasks = tasks.to_tasks()  # a ColumnStore
+    index = dict((task.id, task) for task in tasks)
+    for journal in journal_files(filename):
+        for record in read_records(journal):
+            if record[0] > seq:
+                apply_record(tasks, index, record)
+                seq = record[0]
+    return tasks, seq
+
+
+def write_snapshot(states, seq, filename, binary=False):
+    """Write the snapshot of a task file.
+
+    :param states: the __getstate__() tuples of the tasks
+    :param seq: the sequence number of the last change included
+    :param binary: write a binary (taskfile) snapshot instead of a pickle
+    """
+
+    if binary:
+        taskfile.write((Task.from_state(state) for state in states), filename, seq)
+    else:
+        with util.atomic_open(filename) as fh:
+            pickle.dump([Task.from_state(state) for state in states], fh,
+                        pickle.HIGHEST_PROTOCOL)
+            pickle.dump(seq, fh)
+    if stats.enabled:
+        stats.count('bytes_written', os.path.getsize(filename))
+
+
+def _snapshot_stamp(filename):
+    """Return what changes when a snapshot of a task file is written or its journal is
+    set aside, but not when a record is appended."""
+
+    return util.file_stamp(filename), util.file_stamp(journal_name(filename) + OLD_EXT)
+
+
+def _exclusive(tasklist):
+    """Keep the other threads off a threadsafe.ThreadSafeTaskList while the block runs."""
+
+    lock = getattr(tasklist, 'lock', None)
+    return lock.write() if lock is not None else contextlib.nullcontext()
+
+
+class Journal(object):
+    """Appends the changes made to a TaskList to its task file.
+
+    A journaled task file is a snapshot plus a journal of the changes made since.  The
+    snapshot is an ordinary pickled task list (so util.load can still read it) followed
+    by a second pickle holding the sequence number of the last change it contains.  Each
+    save appends the tasks changed since the last one (see TaskList.delta()) to
+    "<file>.journal" as a (seq, 'delta', states, deleted ids) record, so a task edited
+    many times between saves is written once.  Once the journal grows past compact_size
+    a new snapshot is written in the background (see snapshot()).  Records that are
+    already part of the snapshot are skipped by their sequence number, so a crash at any
+    point neither loses nor repeats a change.
+
+    Several programs (or journals) can save the same task file.  Each write is made
+    under an exclusive util.file_lock(), and a save first checks the file's util.stamp()
+    against the one it last loaded or saved: if another program has saved since, its
+    changes are loaded and the changes made here are merged into them (see merge()).
+    """
+
+    def __init__(self, tasklist, filename, seq=0, compact_size=COMPACT_SIZE, binary=False,
+                 saver=None, stamp=None):
+        """Start journaling a task list.
+
+        :param tasklist: the TaskList whose changes are saved
+        :param filename: the task file
+        :param seq: the sequence number of the last change already in the file
+        :param compact_size: journal size (in bytes) that triggers a new snapshot
+        :param binary: write snapshots in the binary (taskfile) format
+        :param saver: the saver.AsyncSaver that writes snapshots in the background
+        :param stamp: the util.stamp() of the task file when its tasks were loaded, or
+            None to replace the file with the task list on the first save
+        """
+
+        self.tasklist = tasklist
+        self.filename = util.valid_filename(filename)
+        self.seq = seq
+        self.compact_size = compact_size
+        self.binary = binary
+        self.saver = saver or AsyncSaver()
+        self.stamp = stamp
+        self._generation = 0  # incremented by each snapshot; a queued older one is dropped
+
+    @classmethod
+    def open(cls, tasklist, filename, **kwargs):
+        """Load a task file into tasklist and return a journal for it."""
+
+        filename = util.valid_filename(filename)
+        with util.file_lock(filename):
+            tasks, seq = _load(filename)
+            with _exclusive(tasklist):
+                tasklist.tasks = tasks
+            kwargs.setdefault('binary', taskfile.is_task_file(filename))
+            journal = cls(tasklist, filename, seq, stamp=util.stamp(filename), **kwargs)
+            if os.path.exists(journal_name(filename) + OLD_EXT):
+                journal._snapshot()  # finish a compaction that was interrupted
+        return journal
+
+    def close(self):
+        """Wait for the snapshot being written, if any (unsaved changes are dropped)."""
+
+        self.wait()
+
+    @property
+    def pending(self):
+        """True if the task list has changes that haven't been saved."""
+
+        dirty = self.tasklist.dirty
+        return dirty is None or bool(dirty)
+
+    def save(self):
+        """Append the changes made since the last save to the journal.
+
+        Writes a full snapshot instead if the task file doesn't exist yet (or every task
+        was renumbered), and starts one in the background once the journal has grown
+        past compact_size.
+
+        :return: True if another program had saved the file since, so the task list now
+            holds its changes as well
+        :raise util.ConflictError: if the tasks here were renumbered and the file was
+            saved by another program since, so the changes can't be merged
+        """
+
+        with util.file_lock(self.filename), _exclusive(self.tasklist):
+            if not os.path.exists(self.filename):
+                self._snapshot()
+                return False
+            merged = self.stamp is not None and util.stamp(self.filename) != self.stamp
+            if merged:
+                tasks, seq, delta = self._merge()
+            else:
+                seq, delta = self.seq, self.tasklist.delta()
+                if delta is None:
+                    self._snapshot()  # every task changed
+                    return False
+            size = 0
+            if delta[0] or delta[1]:
+                seq += 1
+                size = self._append((seq, 'delta') + delta)
+            self.seq = seq
+            if merged:
+                self.tasklist.tasks = tasks
+            else:
+                self.tasklist.mark_clean()  # only once the changes are on disk
+            self.stamp = util.stamp(self.filename)
+            if size > self.compact_size and not self.saver.busy():
+                self._snapshot(background=True)
+        return merged
+
+    def _merge(self):
+        """Load the task file as another program has saved it and merge the changes
+        made here into it (see merge()).
+
+        :return: (the merged tasks, the sequence number of the last change in the file,
+            the delta that turns the file into the merged tasks)
+        """
+
+        delta = self.tasklist.delta()
+        if delta is None:
+            raise util.ConflictError('"{}" was changed by another program after its tasks '
+                                     'were renumbered here'.format(self.filename))
+        tasks, seq = _load(self.filename)
+        if not isinstance(tasks, list):
+            tasks = tasks.to_tasks()  # a TaskFile without a journal
+        index = dict((task.id, task) for task in tasks)
+        delta = merge(index, delta, self.tasklist.dirty)
+        apply_record(tasks, index, (seq + 1, 'delta') + delta)
+        if tasks:
+            Task.allocate_ids(0, max(index))  # never hand out the ids saved there
+        if stats.enabled:
+            stats.count('merges')
+        return tasks, seq, delta
+
+    def _append(self, record):
+        """Append a record to the journal and flush it to disk; return the journal size."""
+
+        with open(journal_name(self.filename), 'ab') as fh:
+            start = fh.tell()
+            pickle.dump(record, fh, pickle.HIGHEST_PROTOCOL)
+            fh.flush()
+            os.fsync(fh.fileno())
+            if stats.enabled:
+                stats.count('bytes_written', fh.tell() - start)
+            return fh.tell()
+
+    def snapshot(self, background=False):
+        """Write the whole task list as a new snapshot, which makes the journal obsolete.
+
+        The tasks are copied before returning, so with background=True the list can be
+        changed while the snapshot is written.  The journal is set aside as
+        "<file>.journal.old" and removed once the snapshot is safely on disk.
+        """
+
+        with util.file_lock(self.filename), _exclusive(self.tasklist):
+            self._snapshot(background)
+
+    def _snapshot(self, background=False):
+        """snapshot(), with the file and the task list already locked.
+
+        A snapshot written in the background is dropped if a newer one has been taken
+        by then, here or by another program (which would have set aside the journal
+        again), since the journal still holds every change it has.  If writing it fails,
+        the changes it held are marked unsaved again, so the next save still has them.
+        """
+
+        dirty = self.tasklist.dirty
+        self.tasklist.mark_clean()
+        states = [task.__getstate__() for task in self.tasklist.tasks]
+        filename, seq, binary = self.filename, self.seq, self.binary
+        journal = journal_name(filename)
+        unchanged = util.stamp(filename) == self.stamp  # only saved here since
+        # if an older snapshot is still queued, its journal is already set aside; the
+        # records in the current journal are all part of this snapshot too
+        if os.path.exists(journal) and not os.path.exists(journal + OLD_EXT):
+            os.replace(journal, journal + OLD_EXT)
+        if unchanged:
+            self.stamp = util.stamp(filename)
+        self._generation += 1
+        generation = self._generation
+        snapshot_stamp = _snapshot_stamp(filename)
+
+        def write():
+            if background and self.stamp is not None:
+                if generation != self._generation or _snapshot_stamp(filename) != snapshot_stamp:
+                    return
+            unchanged = util.stamp(filename) == self.stamp
+            try:
+                write_snapshot(states, seq, filename, binary)
+            except Exception:
+                with _exclusive(self.tasklist):
+                    self.tasklist.mark_dirty(dirty)
+                raise
+            if os.path.exists(journal + OLD_EXT):
+                os.remove(journal + OLD_EXT)
+            if unchanged or self.stamp is None:
+                self.stamp = util.stamp(filename)
+
+        if background:
+            def locked_write():
+                with util.file_lock(filename):
+                    write()
+            self.saver.submit(filename, locked_write)
+        else:
+            write()
+
+    def wait(self):
+        """Wait for the snapshots being written in the background."""
+
+        self.saver.wait()
+
+stats.register(sys.modules[__name__], {'load': 'load', 'write_snapshot': 'snapshot_write'})
+stats.register(Journal, {'open': 'open', 'save': 'save', '_snapshot': 'snapshot'})
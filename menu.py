@@ -8,9 +8,16 @@
 __author__ = 'Robin Siebler'
 __date__ = '7/28/14'
 
-import speech, sys, ui
-import help, util
-import tasklist; reload(tasklist)
+import ui
+import help, recite, saver, stats, tasklist, threadsafe, util, views
+# journal, query and sqlstore (which import pickle and sqlite3) are imported when first
+# used; run() imports them in the background once the main view is up.
+
+PAGE_SIZE = 100  # number of tasks shown at a time
+DIALOGS = ('message', 'search_tasks', 'add_task', 'load_task_file', 'save_task_file',
+           'delete_task', 'modify_task_number', 'modify_task', 'speak_task_number',
+           'delete_task_file', 'select_language')  # in the order run() builds them
+AUTOSAVE_INTERVAL = 60  # seconds between saves of the changes to the current task file
 
 
 class Menu:
@@ -18,16 +25,22 @@ class Menu:
     def __init__(self):
         """Initialize the task list."""
 
-        self.tasklist = tasklist.TaskList()
+        self.tasklist = threadsafe.ThreadSafeTaskList(stable_ids=True)
         self.current_task = ''
         self.current_task_file = ''
+        self.journal = None
+        self.saver = saver.AsyncSaver(callback=self.save_finished)
+        self.reciter = recite.Reciter(callback=self.recitation_finished)
         self.main_view = ''
         self.controls_enabled = False
+        self.shown_tasks = None  # the tasks being paged through (None for all of them)
+        self.page_offset = 0
+        self.views = views.ViewCache({'self': self})
 
     def display_message(self, message):
         """Display any warnings or errors to the user."""
 
-        self.message_dialog = ui.load_view('dialogs/message')
+        self.message_dialog = self.views.get('dialogs/message')
         self.message_dialog['label1'].text = message
         self.message_dialog.present('popover', popover_location=(500, 500))
 
@@ -35,29 +48,73 @@ class Menu:
 #        speech.say(message, self.language, self.speech_rate)
 
     def show_tasks(self, sender, tasks=None):
-        """Display the tasks (in ID order)
+        """Display the tasks (in ID order), one page at a time
 
         :param tasks: tasks object
         """
 
         if not tasks:
-            tasks = self.tasklist.tasks
-        tv_text = ""
-        if tasks:
+            tasks = None  # all of them
+        if tasks is not self.shown_tasks:
+            self.shown_tasks = tasks
+            self.page_offset = 0
+        total = len(self.tasklist) if tasks is None else len(tasks)
+        if total:
             if not self.controls_enabled:
                 #enable controls if there are tasks loaded
-                buttons = 'number priority save delete_task modify search speak'
+                buttons = 'number priority date save delete_task modify search speak'
                 for button in buttons.split():
                     # turn on invalid controls
                     self.main_view['button_' + button].enabled = True
                 self.controls_enabled = True
-            for task in tasks:
-                tv_text += '{}: {}\n\tPriority: {}\n\tTags: {}\n'.format(task.id, task.note, task.priority, task.tags)
+            # stay on the last page if tasks were deleted from it
+            self.page_offset = min(self.page_offset, (total - 1) // PAGE_SIZE * PAGE_SIZE)
+            page = self.tasklist.iter_range(self.page_offset, PAGE_SIZE, tasks)
+            text = [self.tasklist.render(number, task) for number, task in page]
+            if total > PAGE_SIZE:
+                last = min(self.page_offset + PAGE_SIZE, total)
+                text.append('\nShowing tasks {}-{} of {}\n'.format(self.page_offset + 1, last, total))
+            tv_text = ''.join(text)
         else:
             tv_text = '\nThere are no tasks to display!\n'
 
+        self.main_view['button_prev'].enabled = self.page_offset > 0
+        self.main_view['button_next'].enabled = self.page_offset + PAGE_SIZE < total
+        self.enable_history_controls()
         self.task_textview.text = tv_text
 
+    def enable_history_controls(self):
+        """Enable Undo and Redo when there is a change to undo or redo (a task database
+        has no history)."""
+
+        history = getattr(self.tasklist, 'history', None)
+        self.main_view['button_undo'].enabled = history is not None and history.can_undo
+        self.main_view['button_redo'].enabled = history is not None and history.can_redo
+
+    def undo(self, sender):
+        """Undo the latest change to the tasks."""
+
+        if self.tasklist.undo():
+            self.show_tasks(None)
+
+    def redo(self, sender):
+        """Redo the latest change undone."""
+
+        if self.tasklist.redo():
+            self.show_tasks(None)
+
+    def previous_page(self, sender):
+        """Display the previous page of tasks."""
+
+        self.page_offset = max(self.page_offset - PAGE_SIZE, 0)
+        self.show_tasks(None, self.shown_tasks)
+
+    def next_page(self, sender):
+        """Display the next page of tasks."""
+
+        self.page_offset += PAGE_SIZE
+        self.show_tasks(None, self.shown_tasks)
+
     def show_tasks_by_priority(self, sender, tasks=None):
 
         """Display the tasks (in Priority order)
@@ -65,23 +122,33 @@ class Menu:
         :param tasks: tasks object
         """
 
-        def task_as_str(task):
+        def task_as_str(number, task):
 
-            return '{}: {}\n\tTags: {}'.format(task.id, task.note, task.tags)
+            return '{}: {}\n\tTags: {}'.format(number, task.note, task.tags)
 
-        def priority_text(priority, tasks):
+        def priority_text(priority, tasks, count):
 
-            text = '{}:\n{}\n'.format(priority, '-' * 20)
-            new_tasks = [task_as_str(t) for t in tasks
-                             if t.priority == priority]
+            text = '{} ({}):\n{}\n'.format(priority, count, '-' * 20)
+            new_tasks = [task_as_str(n, t) for n, t in self.tasklist.numbered(tasks)]
             text += '\n'.join(new_tasks) or 'There are no tasks to display!'
             return text
 
-        if not tasks:
-            tasks = self.tasklist.tasks
+        def priority_tasks(priority):
 
-        self.task_textview.text = '\n\n'.join(priority_text(p, tasks)
-                                              for p in 'High Medium Low'.split())
+            if tasks:
+                return [t for t in tasks if t.priority == priority]
+            return self.tasklist.tasks_by_priority(priority)
+
+        text = []
+        for p in 'High Medium Low'.split():
+            p_tasks = priority_tasks(p)
+            text.append(priority_text(p, p_tasks, len(p_tasks)))
+        self.task_textview.text = '\n\n'.join(text)
+
+    def show_tasks_by_date(self, sender):
+        """Display the tasks (newest first)"""
+
+        self.show_tasks(None, self.tasklist.tasks_by_date(newest_first=True))
 
     def prompt_search(self, sender):
         """Prompt the user for a search string."""
@@ -90,7 +157,7 @@ class Menu:
             self.main_view['button_search'].title = 'Search'
             self.show_tasks(None)
         else:
-            self.search_dialog = ui.load_view('dialogs/search_tasks')
+            self.search_dialog = self.views.get('dialogs/search_tasks')
             self.search_dialog['txt_search'].begin_editing()
             self.search_dialog['txt_search'].delegate = self
             self.search_dialog.present('popover', popover_location=(500, 500))
@@ -98,9 +165,17 @@ class Menu:
     def search_tasks(self, sender):
         """Search the task list for a task whose note or tag contains the user provided search string."""
 
+        import query
         search_string = self.search_dialog['txt_search'].text.lower()
         if search_string:
-            tasks = self.tasklist.search(search_string)
+            tasks = None
+            if query.is_structured(search_string):
+                try:
+                    tasks = self.tasklist.query(search_string)
+                except query.QueryError:
+                    pass  # not a query after all (e.g. "tag:" on its own); search the text
+            if tasks is None:
+                tasks = self.tasklist.search(search_string)
             if tasks:
                 self.search_dialog.close()
                 self.main_view['button_search'].title = 'Show All'
@@ -109,10 +184,30 @@ class Menu:
                 message = 'There were no tasks containing "{}".'.format(search_string)
                 self.display_message(message)
 
+    def search_as_you_type(self, search_string):
+        """Show the tasks in which each word typed so far starts a word.
+
+        Enter still runs the full search (see search_tasks).
+        """
+
+        import query
+        if not search_string.strip():
+            self.main_view['button_search'].title = 'Search'
+            self.show_tasks(None)
+            return
+        if query.is_structured(search_string):
+            return  # a query is only run once it is complete (when Enter is pressed)
+        tasks = self.tasklist.search_prefix(search_string)
+        self.main_view['button_search'].title = 'Show All'
+        if tasks:
+            self.show_tasks(None, tasks=tasks)
+        else:
+            self.task_textview.text = '\nThere are no tasks matching "{}".\n'.format(search_string)
+
     def prompt_add(self, sender):
         """Prompt the user to add a task."""
 
-        self.add_dialog = ui.load_view('dialogs/add_task')
+        self.add_dialog = self.views.get('dialogs/add_task')
         self.add_dialog['button_save'].enabled = False
         self.add_dialog['txt_add_task'].delegate = self
         self.add_dialog['txt_add_task'].begin_editing()
@@ -132,7 +227,7 @@ class Menu:
     def prompt_delete_file(self, sender):
         """Prompt the user to delete a task file."""
 
-        self.delete_dialog = ui.load_view('dialogs/delete_task_file')
+        self.delete_dialog = self.views.get('dialogs/delete_task_file')
         self.delete_dialog['txt_filename'].begin_editing()
         self.delete_dialog.present('popover', popover_location=(500, 500))
 
@@ -152,7 +247,7 @@ class Menu:
     def prompt_delete_task(self, sender):
         """Prompt the user to delete a task."""
 
-        self.delete_dialog = ui.load_view('dialogs/delete_task')
+        self.delete_dialog = self.views.get('dialogs/delete_task')
         self.delete_dialog['txt_del_task'].begin_editing()
         self.delete_dialog['txt_del_task'].delegate = self
         self.delete_dialog.present('popover', popover_location=(500, 500))
@@ -165,8 +260,9 @@ class Menu:
             task_id = self._validate_task_id(task_id)
             if task_id:
                 self.delete_dialog.close()
-                self.tasklist.delete_task(task_id)
-                self.tasklist._renumber_tasks()
+                self.tasklist.delete_task(self.tasklist.task_at(task_id).id)
+                if not self.tasklist.stable_ids:
+                    self.tasklist._renumber_tasks()
                 self.show_tasks(None)
             else:
                 self.delete_dialog['txt_del_task'].text = ''
@@ -174,7 +270,7 @@ class Menu:
     def prompt_modify_task_number(self, sender):
         """Prompt the user for the number of the task to modify."""
 
-        self.modify_dialog = ui.load_view('dialogs/modify_task_number')
+        self.modify_dialog = self.views.get('dialogs/modify_task_number')
         self.modify_dialog['txt_mod_task_num'].begin_editing()
         self.modify_dialog['txt_mod_task_num'].delegate = self
         self.modify_dialog.present('popover', popover_location=(500, 500))
@@ -184,9 +280,9 @@ class Menu:
 
         task_id = self._validate_task_id(self.modify_dialog['txt_mod_task_num'].text)
         if task_id:
-            self.current_task = self.tasklist._find_task(task_id)
+            self.current_task = self.tasklist.task_at(task_id)
             self.modify_dialog.close()
-            self.modify_dialog = ui.load_view('dialogs/modify_task')
+            self.modify_dialog = self.views.get('dialogs/modify_task')
             self.modify_dialog['txt_mod_task'].delegate = self
             self.modify_dialog['txt_mod_task'].text = self.current_task.note
             self.modify_dialog['segmentedcontrol1'].selected_index = ['Low', 'Medium', 'High'].index(self.current_task.priority)
@@ -196,17 +292,18 @@ class Menu:
     def save_modified_task(self, sender):
         """Save the contents of the modified task."""
 
-        self.current_task.note = self.modify_dialog['txt_mod_task'].text
+        note = self.modify_dialog['txt_mod_task'].text
         priority_num = self.modify_dialog['segmentedcontrol1'].selected_index
-        self.current_task.priority = 'Low Medium High'.split()[priority_num]
-        self.current_task.tags = self.modify_dialog['txt_mod_tags'].text
+        priority = 'Low Medium High'.split()[priority_num]
+        tags = self.modify_dialog['txt_mod_tags'].text
+        self.tasklist.modify_task(self.current_task.id, note, priority, tags)
         self.modify_dialog.close()
         self.show_tasks(None)
 
     def prompt_load(self, sender):
         """Prompt the user for the name of a task file."""
 
-        self.load_dialog = ui.load_view('dialogs/load_task_file')
+        self.load_dialog = self.views.get('dialogs/load_task_file')
         self.load_dialog['txt_load'].begin_editing()
         self.load_dialog['txt_load'].delegate = self
         self.load_dialog.present('popover', popover_location=(500, 500))
@@ -214,23 +311,49 @@ class Menu:
     def load_tasks(self, sender):
         """Retrieve the contents of the task file."""
 
+        import journal, pickle, sqlite3, sqlstore
+        from taskfile import TaskFileError
         task_file = self.load_dialog['txt_load'].text
         if task_file:
             task_file = util.validate_file(task_file)
             if task_file:
                 self.load_dialog.close()
-                self.tasklist.tasks = util.load(task_file)
+                # the task file loaded now stays loaded if the new one can't be read
+                try:
+                    if sqlstore.is_sqlite_file(task_file):
+                        # every change is committed to the database as it's made
+                        new_tasklist, new_journal = sqlstore.SQLiteTaskList(task_file), None
+                    else:
+                        new_tasklist = threadsafe.ThreadSafeTaskList(stable_ids=True)
+                        new_journal = journal.Journal.open(new_tasklist, task_file,
+                                                           saver=self.saver)
+                except (IOError, EOFError, pickle.PickleError, sqlite3.DatabaseError,
+                        TaskFileError) as e:
+                    self.display_message('Unable to load {}: {}'.format(task_file, e))
+                    return
+                self.close_task_file()
+                self.tasklist, self.journal = new_tasklist, new_journal
                 self.current_task_file = task_file
-                tasklist.Task.last_id = len(self.tasklist.tasks)
+                tasks = self.tasklist.tasks
+                tasklist.Task.last_id = tasks[-1].id if len(tasks) else 0
                 self.show_tasks(None)
             else:
                 self.display_message(self.load_dialog['txt_load'].text + ' is not a valid file')
                 self.load_dialog['txt_load'].text = ''
 
+    def close_task_file(self):
+        """Stop journaling the loaded task file (or close its database)."""
+
+        if self.journal:
+            self.journal.close()
+            self.journal = None
+        if hasattr(self.tasklist, 'backup'):  # a sqlstore.SQLiteTaskList
+            self.tasklist.close()
+
     def prompt_save(self, sender):
         """Prompt the user for the name of a task file."""
 
-        self.save_dialog = ui.load_view('dialogs/save_task_file')
+        self.save_dialog = self.views.get('dialogs/save_task_file')
         self.save_dialog['txt_save_file'].begin_editing()
         self.save_dialog['txt_save_file'].delegate = self
         self.save_dialog.present('popover', popover_location=(500, 500))
@@ -238,24 +361,62 @@ class Menu:
     def save_tasks(self, sender):
         """Save the tasks to the specified file."""
 
+        import journal, sqlstore
         task_file = self.save_dialog['txt_save_file'].text
         if task_file:
             if task_file.rfind('.tsk', len(task_file) - 4) == -1:
                 task_file += '.tsk'
             self.save_dialog.close()
-            if task_file == self.current_task_file:
-                # some bug; even though the file should be closed, I can't overwrite it
-                util.delete(task_file)
-            util.save(self.tasklist.tasks, task_file)
+            if self.journal and task_file == self.current_task_file:
+                # only the changes made since the last save are written
+                try:
+                    if self.journal.save():
+                        self.show_tasks(None)  # merged with changes saved elsewhere
+                except (IOError, OSError) as e:
+                    self.save_finished(task_file, e)
+            elif isinstance(self.tasklist, sqlstore.SQLiteTaskList):
+                if task_file != self.current_task_file:
+                    # save a copy of the database and carry on working in it
+                    self.tasklist.backup(task_file)
+                    self.close_task_file()
+                    self.tasklist = sqlstore.SQLiteTaskList(task_file)
+                    self.current_task_file = task_file
+            else:
+                binary = True  # new task files use the binary format
+                if self.journal:
+                    self.journal.close()
+                    binary = self.journal.binary  # keep the format of the loaded file
+                self.journal = journal.Journal(self.tasklist, task_file, binary=binary,
+                                               saver=self.saver)
+                self.journal.snapshot(background=True)
+                self.current_task_file = task_file
         else:
             self.save_dialog['txt_save_file'].text = ''
 
+    def save_finished(self, task_file, error):
+        """Report a failed background save (called on the saver's thread)."""
+
+        if error:
+            message = 'Unable to save {}: {}'.format(task_file, error)
+            ui.delay(lambda: self.display_message(message), 0)
+
+    def autosave(self):
+        """Save the changes to the current task file every AUTOSAVE_INTERVAL seconds."""
+
+        if self.journal and self.journal.pending:
+            try:
+                if self.journal.save():
+                    self.show_tasks(None)  # merged with changes saved elsewhere
+            except (IOError, OSError) as e:
+                self.save_finished(self.journal.filename, e)
+        ui.delay(self.autosave, AUTOSAVE_INTERVAL)
+
     def prompt_speak(self, sender):
         """Prompt the user for the task(s) to speak."""
 
         self.speech_rate = 0.3
         self.language = 'en-GB'
-        self.prompt_dialog = ui.load_view('dialogs/speak_task_number')
+        self.prompt_dialog = self.views.get('dialogs/speak_task_number')
         self.prompt_dialog['button_select'].enabled = False
         self.prompt_dialog['txt_speak_number'].delegate = self
         self.prompt_dialog["segmentedcontrol1"].action = self.display_speak_options
@@ -294,29 +455,87 @@ class Menu:
             task_id = self._validate_task_id(self.prompt_dialog['txt_speak_number'].text)
             if task_id:
                 self.prompt_dialog.close()
-                self.current_task = self.tasklist._find_task(task_id)
-                self.speak_task(self.current_task)
+                self.current_task = self.tasklist.task_at(task_id)
+                self.speak_task(self.current_task, task_id)
             else:
                 self.prompt_dialog['txt_speak_number'].text = ''
                 self.prompt_dialog['button_select'].enabled = False
         else:
             self.prompt_dialog.close()
-            for task in self.tasklist.tasks:
-                self.speak_task(task)
-        speech.say('Recitation complete.', self.language, self.speech_rate)
+            self.recite(self.tasklist.numbered())
 
-    def speak_task(self, task):
-        """Recite the provided task"""
+    def recite(self, tasks):
+        """Recite tasks in the background, replacing any recitation in progress.
 
-        if not task:
-            return
-        if task.tags:
-            fmt = 'Task number {}, priority: {}, {}, This task has the following tags: {}'
-            msg = fmt.format(task.id, task.priority, task.note, ' and '.join(task.tags.split()))
+        The text of each task is only produced when it is about to be spoken.
+
+        :param tasks: (number, task) pairs
+        """
+
+        def utterances():
+            for number, task in tasks:
+                if task:
+                    yield self.tasklist.utterance(number, task)
+            yield 'Recitation complete.'
+
+        self.reciter.cancel()
+        self.reciter.recite(utterances(), self.language, self.speech_rate)
+        self.enable_recitation_controls(True)
+
+    def speak_task(self, task, number=None):
+        """Recite the provided task
+
+        :param number: the number the task is displayed with (default: its id)
+        """
+
+        if task:
+            self.recite([(task.id if number is None else number, task)])
+
+    def enable_recitation_controls(self, enabled):
+        self.main_view['button_pause'].title = 'Pause'
+        for button in 'pause skip stop'.split():
+            self.main_view['button_' + button].enabled = enabled
+
+    def pause_recitation(self, sender):
+        """Pause the recitation, or resume it if it is paused."""
+
+        if self.reciter.paused:
+            self.reciter.resume()
+            sender.title = 'Pause'
         else:
-            fmt = 'Task number {}, priority: {}, {}, This task does not have any tags.'
-            msg = fmt.format(task.id, task.priority, task.note)
-        speech.say(msg, self.language, self.speech_rate)
+            self.reciter.pause()
+            sender.title = 'Resume'
+
+    def skip_utterance(self, sender):
+        """Skip to the next task being recited."""
+
+        self.reciter.skip()
+
+    def stop_recitation(self, sender):
+        """Cancel the recitation."""
+
+        self.reciter.cancel()
+
+    def recitation_finished(self, completed, error):
+        """Turn the recitation controls off and report a recitation that failed (called
+        on the reciter's thread)."""
+
+        def finished():
+            if not self.reciter.busy():
+                self.enable_recitation_controls(False)
+            if error:
+                self.display_message('Unable to recite the tasks: {}'.format(error))
+
+        ui.delay(finished, 0)
+
+    def show_stats(self, sender):
+        """Turn on timing of task list operations, or display the timings so far."""
+
+        if stats.enabled:
+            self.task_textview.text = stats.report()
+        else:
+            stats.enable()
+            self.display_message('Timing of task list operations is on. Tap Stats again to see the results.')
 
     def _validate_task_id(self, task_id):
         """Validate the given task ID.
@@ -324,7 +543,7 @@ class Menu:
         :return: False if an invalid ID was provided, otherwise a string containing the valid task id.
         """
         if task_id:
-            if task_id.isdecimal() and int(task_id) <= len(self.tasklist.tasks):
+            if task_id.isdecimal() and 0 < int(task_id) <= len(self.tasklist):
                 return task_id
             else:
                 self.display_message('{} is not an existing task!'.format(task_id))
@@ -373,7 +592,7 @@ class Menu:
             {'title': 'Chinese (Taiwan)', 'code': 'zh-Tw'}
         ]
 
-        self.prompt_lang = ui.load_view('dialogs/select_language')
+        self.prompt_lang = self.views.get('dialogs/select_language')
         table = self.prompt_lang['tableview1']
         listsource = ui.ListDataSource(self.lang_list)
         table.data_source = listsource
@@ -409,6 +628,8 @@ class Menu:
             view = textfield.superview
             button = view['button_save']
             button.enabled = textfield.text != ''
+        elif textfield.name == 'txt_search':
+            self.search_as_you_type(textfield.text)
 
 
     def textfield_should_return(self, textfield):
@@ -432,13 +653,30 @@ class Menu:
         """Let's get the party started!"""
 
         self.main_view = ui.load_view('menu')
-        buttons = 'number priority save delete_task modify search speak'
+        buttons = ('number priority date save delete_task modify search speak prev next pause skip stop '
+                   'undo redo')
         for button in buttons.split():
             # turn off invalid controls
             self.main_view['button_' + button].enabled = False
         self.main_view.present('full_screen')
         self.task_textview = self.main_view['task_textview']
         self.task_textview.text = help.help_text
+        ui.delay(self.autosave, AUTOSAVE_INTERVAL)
+        self.warm_up()
+
+    def warm_up(self):
+        """Get the first use of each feature ready while the user looks at the main view:
+        import the deferred modules on a background thread and build the dialogs in idle
+        moments of the ui loop."""
+
+        def import_deferred():
+            import journal, query, sqlstore
+
+        import threading
+        thread = threading.Thread(target=import_deferred, name='warm-up')
+        thread.daemon = True
+        thread.start()
+        self.views.prewarm(['dialogs/' + name for name in DIALOGS])
 
 if __name__ == '__main__':
     Menu().run()
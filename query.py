@@ -0,0 +1,301 @@
+#------------------------------------------
+# Name:     query
+# Purpose:  Structured queries over a TaskList, planned around its indexes
+#
+# Author:   Robin Siebler
+# Created:  10/18/26
+#------------------------------------------
+__author__ = 'Robin Siebler'
+__date__ = '10/18/26'
+
+# A query is a list of terms which all have to match:
+#
+#   priority:high           the priority (several: priority:high,medium)
+#   tag:ops                 one of the task's tags (tag:ops,dev for either; tag:ops
+#                           tag:dev for both)
+#   created:>2026-01-01     the creation date: =, >, >=, <, <= or a range (a..b), as
+#                           yyyy-mm-dd or mm/dd/yyyy
+#   note:disk               text in the note
+#   disk, "disk full"       text in the note or the tags (like TaskList.search)
+#   -tag:ops                any term can be negated
+#
+# The planner asks each index how many tasks a term could match, starts from the most
+# selective term and intersects the others cheapest first.  A term whose candidates
+# would hardly narrow the result, and a term no index covers (e.g. a negated one), is
+# checked on the remaining tasks instead; only a query without any indexed term scans
+# the whole list.
+#
+#   print(plan(tasklist, 'priority:high "disk full"').explain())
+
+import datetime, re
+from tasklist import DATE_FORMAT, PRIORITIES, priority_code, tag_set
+
+TERM = re.compile(r'(-?)(?:(\w+):)?(?:"([^"]*)"?|(\S+))')
+DATE_FORMATS = ('%Y-%m-%d', DATE_FORMAT)
+NARROWING = 4  # intersect a term only if it has less than this times the current candidates
+
+
+class QueryError(ValueError):
+    pass
+
+
+def _date(text):
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(text, fmt).toordinal()
+        except ValueError:
+            pass
+    raise QueryError('"{}" is not a date (use yyyy-mm-dd or mm/dd/yyyy)'.format(text))
+
+
+def _show_date(ordinal):
+    return datetime.date.fromordinal(ordinal).strftime(DATE_FORMAT)
+
+
+class Term(object):
+    """One condition of a query.
+
+    exact is True if the ids an index returns for the term are exactly its matches,
+    False if they are a superset which still has to be checked with matches().
+    """
+
+    exact = False
+
+    def matches(self, task):
+        raise NotImplementedError
+
+    def estimate(self, tasklist):
+        """Return how many tasks an index says could match, or None if none can tell."""
+
+        return None
+
+    def ids(self, tasklist):
+        """Return the set of ids of the tasks that could match (see estimate())."""
+
+        raise NotImplementedError
+
+
+class Priority(Term):
+    exact = True
+
+    def __init__(self, value):
+        try:
+            self.codes = sorted(set(priority_code(name) for name in value.split(',')))
+        except KeyError:
+            raise QueryError('"{}" is not a priority ({})'.format(value, ', '.join(PRIORITIES)))
+
+    def __str__(self):
+        return 'priority:{}'.format(','.join(PRIORITIES[code].lower() for code in self.codes))
+
+    def matches(self, task):
+        return task._priority in self.codes
+
+    def estimate(self, tasklist):
+        return sum(tasklist._priorities().count(code) for code in self.codes)
+
+    def ids(self, tasklist):
+        ids = set()
+        for code in self.codes:
+            ids.update(tasklist._priorities().ids(code))
+        return ids
+
+
+class Created(Term):
+    exact = True
+
+    def __init__(self, value):
+        self.start = self.end = None
+        if '..' in value:
+            start, end = value.split('..', 1)
+            self.start = _date(start) if start else None
+            self.end = _date(end) if end else None
+        else:
+            match = re.match(r'(>=|<=|>|<|=)?(.*)$', value)
+            operator, date = match.group(1) or '=', _date(match.group(2))
+            if operator in ('=', '>=', '>'):
+                self.start = date + (operator == '>')
+            if operator in ('=', '<=', '<'):
+                self.end = date - (operator == '<')
+
+    def __str__(self):
+        return 'created:{}..{}'.format('' if self.start is None else _show_date(self.start),
+                                       '' if self.end is None else _show_date(self.end))
+
+    def matches(self, task):
+        return ((self.start is None or task.created >= self.start) and
+                (self.end is None or task.created <= self.end))
+
+    def estimate(self, tasklist):
+        return tasklist._dates().count(self.start, self.end)
+
+    def ids(self, tasklist):
+        return set(tasklist._dates().ids(self.start, self.end))
+
+
+class Text(Term):
+    """Text in the note or the tags (or, for a note: term, in the note only)."""
+
+    def __init__(self, value, field=None):
+        self.text = value.lower()
+        self.field = field
+
+    def __str__(self):
+        return '{}"{}"'.format(self.field + ':' if self.field else '', self.text)
+
+    def matches(self, task):
+        if self.field == 'note':
+            return self.text in task.note.lower()
+        return task.match(self.text)
+
+    def estimate(self, tasklist):
+        return tasklist._text().estimate(self.text)
+
+    def ids(self, tasklist):
+        candidates = tasklist._text().candidates(self.text)
+        return set(task.id for task in candidates)
+
+
+class Tag(Term):
+    """One of the task's tags (several: tag:ops,dev for either), from the tag index."""
+
+    exact = True
+
+    def __init__(self, value):
+        self.tags = sorted(tag_set(value))
+        if not self.tags:
+            raise QueryError('"tag:" needs a tag')
+
+    def __str__(self):
+        return 'tag:{}'.format(','.join(self.tags))
+
+    def matches(self, task):
+        return not task.tag_set.isdisjoint(self.tags)
+
+    def estimate(self, tasklist):
+        return sum(tasklist._tags().count(tag) for tag in self.tags)
+
+    def ids(self, tasklist):
+        return tasklist._tags().ids(self.tags, match_any=True)
+
+
+class Not(Term):
+    def __init__(self, term):
+        self.term = term
+
+    def __str__(self):
+        return '-{}'.format(self.term)
+
+    def matches(self, task):
+        return not self.term.matches(task)
+
+
+FIELDS = {'priority': Priority, 'created': Created, 'tag': Tag, 'tags': Tag,
+          'note': lambda value: Text(value, 'note')}
+
+
+def parse(query_string):
+    """Return the list of Terms in a query string.
+
+    :raise QueryError: for an unknown field or a value that doesn't fit its field
+    """
+
+    terms = []
+    for negated, field, quoted, word in TERM.findall(query_string):
+        value = quoted if quoted or not word else word
+        if field:
+            if field.lower() not in FIELDS:
+                raise QueryError('Unknown field "{}" (use {})'.format(
+                    field, ', '.join(sorted(FIELDS))))
+            term = FIELDS[field.lower()](value)
+        elif value.strip():
+            term = Text(value)
+        else:
+            continue
+        terms.append(Not(term) if negated else term)
+    return terms
+
+
+class Plan(object):
+    """How a query will be run: the terms answered by an index (most selective first)
+    and the terms checked on each remaining task."""
+
+    def __init__(self, tasklist, query_string):
+        self.tasklist = tasklist
+        self.query_string = query_string
+        terms = parse(query_string)
+        estimated = []
+        self.checks = []  # terms matched against each candidate task
+        for term in terms:
+            estimate = term.estimate(tasklist)
+            if estimate is None:
+                self.checks.append(term)
+            else:
+                estimated.append((estimate, term))
+        estimated.sort(key=lambda item: item[0])
+        self.steps = []  # (estimate, term) intersected in this order
+        size = None
+        for estimate, term in estimated:
+            if size is not None and estimate > NARROWING * size:
+                self.checks.append(term)  # cheaper to check the few candidates left
+                continue
+            self.steps.append((estimate, term))
+            size = estimate if size is None else min(size, estimate)
+            if not term.exact:
+                self.checks.append(term)
+        self.full_scan = not self.steps
+
+    def estimate(self):
+        """Return the estimated number of results, assuming the terms are independent."""
+
+        total = len(self.tasklist)
+        if not total:
+            return 0
+        result = float(total)
+        for estimate, _ in self.steps:
+            result *= estimate / float(total)
+        return int(round(result))
+
+    def run(self):
+        """Return the matching tasks, in id order."""
+
+        tasklist = self.tasklist
+        if self.full_scan:
+            candidates = iter(tasklist)
+        else:
+            ids = None
+            for _, term in self.steps:
+                ids = term.ids(tasklist) if ids is None else ids & term.ids(tasklist)
+                if not ids:
+                    return []
+            candidates = (tasklist._find_task(task_id) for task_id in sorted(ids))
+        checks = self.checks
+        return [task for task in candidates if all(term.matches(task) for term in checks)]
+
+    def explain(self):
+        """Return a description of the plan and its estimated cardinalities."""
+
+        lines = ['Query: {}'.format(self.query_string)]
+        if self.full_scan:
+            lines.append('  scan all {} tasks'.format(len(self.tasklist)))
+        for number, (estimate, term) in enumerate(self.steps, 1):
+            lines.append('  {}. {} {:<30} ~{} tasks'.format(
+                number, 'index    ' if number == 1 else 'intersect', str(term), estimate))
+        for term in self.checks:
+            lines.append('  check {}'.format(term))
+        lines.append('Estimated results: {}'.format(self.estimate()))
+        return '\n'.join(lines)
+
+
+def plan(tasklist, query_string):
+    """Parse a query and plan how to run it on a TaskList."""
+
+    return Plan(tasklist, query_string)
+
+
+def is_structured(search_string):
+    """Return True if a search string uses the query language (rather than being text):
+    if it has a term for one of the FIELDS.  Other text with a colon (10:30) or a leading
+    '-' is left to a plain search.
+    """
+
+    return any(field.lower() in FIELDS for _, field, _, _ in TERM.findall(search_string))
@@ -0,0 +1,212 @@
+#------------------------------------------
+# Name:     recite
+# Purpose:  Recite tasks on a background thread
+#
+# Author:   Robin Siebler
+# Created:  10/18/26
+#------------------------------------------
+__author__ = 'Robin Siebler'
+__date__ = '10/18/26'
+
+# A Reciter speaks through a backend: an object with say(text, language, rate),
+# is_speaking() and stop() methods, like Pythonista's speech module; say() has to return
+# without waiting for the text to be spoken.  SpeechBackend uses that module;
+# RecordingBackend stands in for it where there is no speech module.
+#
+#   reciter = Reciter(RecordingBackend())
+#   reciter.recite(tasklist.utterance(n, task) for n, task in tasklist.numbered())
+#   reciter.pause(); reciter.resume(); reciter.skip(); reciter.cancel()
+
+import collections, threading, time, traceback
+
+POLL_INTERVAL = 0.1  # seconds between checks whether the backend is still speaking
+
+
+class SpeechBackend(object):
+    """Speaks through Pythonista's speech module (which is imported when first used)."""
+
+    def __init__(self):
+        import speech
+        self._speech = speech
+
+    def say(self, text, language, rate):
+        self._speech.say(text, language, rate)
+
+    def is_speaking(self):
+        return self._speech.is_speaking()
+
+    def stop(self):
+        self._speech.stop()
+
+
+class RecordingBackend(object):
+    """A stand-in for the speech module that records what it is asked to say.
+
+    :param duration: how long each utterance pretends to take (in seconds)
+    """
+
+    def __init__(self, duration=0.0):
+        self.duration = duration
+        self.spoken = []  # (text, language, rate) for each call of say()
+        self._until = 0.0
+
+    def say(self, text, language, rate):
+        self.spoken.append((text, language, rate))
+        self._until = time.time() + self.duration
+
+    def is_speaking(self):
+        return time.time() < self._until
+
+    def stop(self):
+        self._until = 0.0
+
+
+class Reciter(object):
+    """Speaks recitations one at a time on a worker thread.
+
+    A recitation is an iterable (usually a generator) of utterances, which is only
+    consumed as it is spoken, so reciting a long task list starts right away and costs
+    nothing up front.  Recitations queue up behind each other.
+    """
+
+    def __init__(self, backend=None, callback=None):
+        """Initialize the reciter.
+
+        :param backend: what speaks (default: a SpeechBackend, created when first used)
+        :param callback: called (on the worker thread) as callback(completed, error)
+            after each recitation; completed is False if it was cancelled or failed, and
+            error is the exception it failed with (or None).  Without a callback, the
+            traceback of an error is printed.
+        """
+
+        self.backend = backend
+        self.callback = callback
+        self.speaking = None  # the utterance being spoken
+        self._jobs = collections.deque()  # (utterances, language, rate)
+        self._condition = threading.Condition()
+        self._generation = 0  # incremented by cancel()
+        self._paused = False
+        self._skip = False
+        self._busy = False
+        self._worker = None
+
+    def recite(self, utterances, language='en-GB', rate=0.3):
+        """Queue a recitation.
+
+        :param utterances: an iterable of the texts to say
+        :param language: the language code, e.g. 'en-GB'
+        :param rate: the speech rate (0.0-1.0)
+        """
+
+        if self.backend is None:
+            self.backend = SpeechBackend()
+        with self._condition:
+            self._jobs.append((utterances, language, rate))
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name='reciter')
+                self._worker.daemon = True
+                self._worker.start()
+            self._condition.notify_all()
+
+    def pause(self):
+        """Stop speaking; resume() starts the interrupted utterance again."""
+
+        with self._condition:
+            self._paused = True
+            self._condition.notify_all()
+        if self.backend:
+            self.backend.stop()
+
+    def resume(self):
+        with self._condition:
+            self._paused = False
+            self._condition.notify_all()
+
+    @property
+    def paused(self):
+        return self._paused
+
+    def skip(self):
+        """Move on to the next utterance."""
+
+        with self._condition:
+            self._skip = True
+            self._condition.notify_all()
+        if self.backend:
+            self.backend.stop()
+
+    def cancel(self):
+        """Stop speaking and drop every queued recitation."""
+
+        with self._condition:
+            self._jobs.clear()
+            self._generation += 1
+            self._paused = False
+            self._condition.notify_all()
+        if self.backend:
+            self.backend.stop()
+
+    def busy(self):
+        """Return True if a recitation is queued or being spoken."""
+
+        with self._condition:
+            return self._busy or bool(self._jobs)
+
+    def wait(self):
+        """Wait until every queued recitation has finished."""
+
+        with self._condition:
+            while self._busy or self._jobs:
+                self._condition.wait()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._jobs:
+                    self._condition.wait()
+                utterances, language, rate = self._jobs.popleft()
+                generation = self._generation
+                self._skip = False  # a skip() made while nothing was being said
+                self._busy = True
+            completed, error = False, None
+            try:
+                completed = all(self._say(text, language, rate, generation)
+                                for text in utterances)
+            except RuntimeError:
+                pass  # the tasks being recited changed size; treat it as cancelled
+            except Exception as e:
+                error = e
+                if not self.callback:
+                    traceback.print_exc()
+            finally:
+                try:
+                    if self.callback:
+                        self.callback(completed, error)
+                finally:
+                    with self._condition:
+                        self.speaking = None
+                        self._busy = False
+                        self._condition.notify_all()
+
+    def _say(self, text, language, rate, generation):
+        """Say one utterance and wait until it has been said (or skipped).
+
+        :return: False if the recitation was cancelled
+        """
+
+        with self._condition:
+            while True:
+                while self._paused and not self._skip and generation == self._generation:
+                    self._condition.wait()
+                if generation != self._generation:
+                    return False
+                if self._skip:
+                    self._skip = False
+                    return True
+                self.speaking = text
+                self.backend.say(text, language, rate)
+                while generation == self._generation and not (self._skip or self._paused):
+                    if not self.backend.is_speaking():
+                        return True
+                    self._condition.wait(POLL_INTERVAL)
+                # cancelled, skipped or paused: the loop above sorts out which
@@ -0,0 +1,93 @@
+#------------------------------------------
+# Name:     saver
+# Purpose:  Save task files on a background thread
+#
+# Author:   Robin Siebler
+# Created:  10/18/26
+#------------------------------------------
+__author__ = 'Robin Siebler'
+__date__ = '10/18/26'
+
+import collections, threading
+import util
+from tasklist import Task
+
+
+class AsyncSaver(object):
+    """Runs save jobs one at a time on a worker thread.
+
+    A job queued for a file replaces any job for the same file that hasn't started yet,
+    so saving repeatedly while a large file is being written only writes it once more.
+    """
+
+    def __init__(self, callback=None):
+        """Initialize the saver.
+
+        :param callback: called (on the worker thread) as callback(filename, error) after
+            each job; error is None if the file was saved, otherwise the exception
+        """
+
+        self.callback = callback
+        self._jobs = collections.OrderedDict()  # filename -> function
+        self._condition = threading.Condition()
+        self._busy = False
+        self._worker = None
+
+    def submit(self, filename, write):
+        """Queue write(), a function that writes filename, to run on the worker thread."""
+
+        with self._condition:
+            self._jobs.pop(filename, None)
+            self._jobs[filename] = write
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name='task file saver')
+                self._worker.daemon = True
+                self._worker.start()
+            self._condition.notify_all()
+
+    def save(self, tasks, filename):
+        """Save a snapshot of tasks to a pickled task file in the background.
+
+        The snapshot is taken before returning, so the tasks can be changed right away.
+
+        :param tasks: the tasks to save (e.g. a TaskList)
+        :param filename: the task file
+        """
+
+        filename = util.valid_filename(filename)
+        states = [task.__getstate__() for task in tasks]
+        self.submit(filename, lambda: util.write([Task.from_state(state) for state in states],
+                                                 filename))
+
+    def busy(self):
+        """Return True if a save is queued or running."""
+
+        with self._condition:
+            return self._busy or bool(self._jobs)
+
+    def wait(self):
+        """Wait until every queued save has finished."""
+
+        with self._condition:
+            while self._busy or self._jobs:
+                self._condition.wait()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._jobs:
+                    self._condition.wait()
+                filename, write = self._jobs.popitem(last=False)
+                self._busy = True
+            error = None
+            try:
+                write()
+            except Exception as e:
+                error = e
+            try:
+                if self.callback:
+                    self.callback(filename, error)
+            finally:
+                with self._condition:
+                    self._busy = False
+                    self._condition.notify_all()
@@ -0,0 +1,274 @@
+#------------------------------------------
+# Name:     snapshot
+# Purpose:  A read-only copy of a task list that many processes share without copying
+#
+# Author:   Robin Siebler
+# Created:  10/18/26
+#------------------------------------------
+__author__ = 'Robin Siebler'
+__date__ = '10/18/26'
+
+# A snapshot is a directory that one writer publishes a task list into and any number of
+# reader processes attach to.  Each generation is two files, both memory-mapped by the
+# readers, so the operating system keeps a single copy of them in its page cache however
+# many processes read them:
+#
+#   <generation>.tsk    an uncompressed binary task file (see taskfile.py): ids,
+#                       priorities and creation dates are read from it in place and a
+#                       task is only decoded when it is returned
+#   <generation>.text   the lower case text that Task.match() searches (all numbers
+#                       little-endian):
+#                         header    TEXT_HEADER: magic, version, flags, number of tasks
+#                         offsets   (2 * count + 1) x uint32; the note of row r is
+#                                   heap[offsets[2r]:offsets[2r+1]] and its tags are
+#                                   heap[offsets[2r+1]:offsets[2r+2]]
+#                         heap      the UTF-8 encoded notes (in lower case) and tags
+#   current             the number of the current generation
+#
+# publish() writes the next generation beside the current one and then replaces
+# "current", so a reader sees either the old generation or the new one, never part of
+# either.  The oldest generations are removed, but a reader that is still attached to
+# one keeps its mapping (on Windows the files stay until it lets go).  A Snapshot stays
+# on the generation it attached to until refresh() is called:
+#
+#   snapshot.publish(tasklist, 'reports.snap')              # in the writer
+#   with snapshot.Snapshot('reports.snap') as tasks:        # in each reader
+#       tasks.find(42), tasks.tasks_by_priority('high'), tasks.search('disk')
+#       tasks.refresh()                                     # move to the newest generation
+
+import bisect, os, re, struct, sys
+import stats, taskfile, util
+from tasklist import normalize_tags, priority_code
+
+CURRENT = 'current'  # the file holding the number of the current generation
+TASKS_EXT = '.tsk'
+TEXT_EXT = '.text'
+TEXT_MAGIC = b'TSKT'
+TEXT_VERSION = 1
+TEXT_HEADER = struct.Struct('<4sHHI')  # magic, version, flags, count
+KEEP = 3  # generations left in place for the readers still attached to them
+ATTACH_RETRIES = 10  # times a reader looks for the current generation again
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def current_generation(directory):
+    """Return the number of the current generation in a snapshot directory (or None if
+    nothing has been published there)."""
+
+    try:
+        with open(os.path.join(directory, CURRENT)) as fh:
+            return int(fh.read())
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def _names(directory, generation):
+    base = os.path.join(directory, str(generation))
+    return base + TASKS_EXT, base + TEXT_EXT
+
+
+def _write_text(tasks, filename):
+    """Write the lower case notes and the tags of tasks (in id order) to a text file."""
+
+    strings = []
+    for task in tasks:
+        strings.append(task.note.lower())
+        strings.append(normalize_tags(task.tags))
+    offsets, heap = taskfile._heap(strings)
+    with util.atomic_open(filename) as fh:
+        fh.write(TEXT_HEADER.pack(TEXT_MAGIC, TEXT_VERSION, 0, len(strings) // 2))
+        fh.write(offsets.tobytes())
+        fh.write(heap)
+
+
+def publish(tasks, directory, keep=KEEP):
+    """Publish tasks as the next generation of the snapshot in directory.
+
+    The directory is created if need be.  Only one writer publishes at a time (under
+    util.file_lock on "current").
+
+    :param tasks: an iterable of Task-like objects (e.g. a TaskList or a TaskFile)
+    :param keep: how many generations to leave in place, counting the new one
+    :return: the number of the new generation
+    """
+
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    pointer = os.path.join(directory, CURRENT)
+    with util.file_lock(pointer):
+        generation = current_generation(directory)
+        generation = 0 if generation is None else generation + 1
+        tasks = sorted(tasks, key=lambda task: task.id)
+        tasks_name, text_name = _names(directory, generation)
+        taskfile.write(tasks, tasks_name)  # uncompressed, so the readers can map it
+        _write_text(tasks, text_name)
+        with util.atomic_open(pointer) as fh:
+            fh.write(str(generation).encode('ascii'))
+        for name in os.listdir(directory):
+            stem, ext = os.path.splitext(name)
+            if ext in (TASKS_EXT, TEXT_EXT) and stem.isdigit() and \
+                    int(stem) <= generation - max(keep, 1):
+                try:
+                    os.remove(os.path.join(directory, name))
+                except OSError:
+                    pass  # still mapped by a reader (Windows); removed by a later publish
+    return generation
+
+
+class _Text(object):
+    """The mapped text file of a generation."""
+
+    def __init__(self, filename, count):
+        import mmap
+        with open(filename, 'rb') as fh:
+            self._mmap = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, flags, text_count = TEXT_HEADER.unpack_from(self._mmap)
+        except struct.error:
+            magic, version, text_count = None, None, None
+        if magic != TEXT_MAGIC or version != TEXT_VERSION or text_count != count:
+            self._mmap.close()
+            raise SnapshotError('{} does not belong to its task file'.format(filename))
+        self.base = TEXT_HEADER.size + 4 * (2 * count + 1)  # where the heap starts
+        self.offsets = memoryview(self._mmap)[TEXT_HEADER.size:self.base].cast('I')
+
+    def rows(self, search_string):
+        """Return the rows whose note (in lower case) or tags contain search_string.
+
+        mmap.find() looks for it in the mapped heap, so nothing is copied or decoded and
+        the rows that don't match aren't looked at one by one.
+        """
+
+        needle = search_string.encode('utf-8')
+        count = (len(self.offsets) - 1) // 2
+        if not needle:
+            return list(range(count))
+        find, offsets, base, rows = self._mmap.find, self.offsets, self.base, []
+        position = find(needle, base)
+        while position != -1:
+            start = position - base
+            field = bisect.bisect_right(offsets, start) - 1
+            if start + len(needle) <= offsets[field + 1]:
+                rows.append(field // 2)
+                position = find(needle, base + offsets[field - field % 2 + 2])  # next task
+            else:
+                position = find(needle, position + 1)  # runs on into the next field
+        return rows
+
+    def close(self):
+        self.offsets.release()
+        self._mmap.close()
+
+
+class Snapshot(object):
+    """A read-only view of the current generation of a snapshot directory.
+
+    Nothing is read into memory when it attaches: ids, priorities and text are used
+    where they are mapped, and only the tasks returned are decoded (as Task objects,
+    which belong to the caller).
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.generation = None
+        self.tasks = None  # the taskfile.TaskFile of the generation attached to
+        self._text = None
+        if not self.refresh():
+            raise SnapshotError('nothing has been published in {}'.format(directory))
+
+    def refresh(self):
+        """Attach to the current generation, if it is newer than the one attached to.
+
+        :return: True if a (new) generation was attached to
+        """
+
+        for _ in range(ATTACH_RETRIES):
+            generation = current_generation(self.directory)
+            if generation is None or generation == self.generation:
+                return False
+            tasks_name, text_name = _names(self.directory, generation)
+            try:
+                tasks = taskfile.TaskFile(tasks_name)
+            except (IOError, OSError):
+                continue  # removed by the writer since "current" was read; look again
+            try:
+                text = _Text(text_name, len(tasks))
+            except (IOError, OSError):
+                tasks.close()
+                continue
+            self.close()
+            self.generation, self.tasks, self._text = generation, tasks, text
+            return True
+        raise SnapshotError('{} keeps changing; no generation could be attached to'.format(
+            self.directory))
+
+    def close(self):
+        if self.tasks is not None:
+            self._text.close()
+            self.tasks.close()
+            self.tasks = self._text = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self.tasks)
+
+    def __iter__(self):
+        return iter(self.tasks)
+
+    def find(self, task_id):
+        """Return the task with the given id (or None), found by bisecting the mapped ids.
+
+        :param task_id: the id of the task to find (int or str)
+        """
+
+        try:
+            task_id = int(task_id)
+        except (TypeError, ValueError):
+            return None
+        return self.tasks.find(task_id)
+
+    _find_task = find  # as TaskList names it
+
+    def _priority_rows(self, priority):
+        # the priorities are one byte per task, so re scans the mapped column in C
+        code = re.escape(bytes([priority_code(priority)]))
+        return [match.start() for match in re.finditer(code, self.tasks.priorities)]
+
+    def tasks_by_priority(self, priority):
+        """Return the tasks with the given priority, in id order."""
+
+        return self.tasks.rows(self._priority_rows(priority))
+
+    def count_by_priority(self, priority):
+        """Return the number of tasks with the given priority (none are decoded)."""
+
+        return len(self._priority_rows(priority))
+
+    def search(self, search_string):
+        """Return the tasks that match the given search string (see Task.match()), in id
+        order."""
+
+        return self.tasks.rows(self._text.rows(search_string))
+
+stats.register(Snapshot, {'refresh': 'snapshot_attach', 'search': 'snapshot_search',
+                          'find': 'snapshot_find'})
+
+if __name__ == '__main__':
+    if len(sys.argv) == 3:
+        import journal
+        name = util.validate_file(sys.argv[1])
+        if not name:
+            util.handle_error(sys.argv[1])
+        else:
+            print('{} -> {} generation {}'.format(name, sys.argv[2], publish(
+                journal.load(name)[0], sys.argv[2])))
+    else:
+        print('usage: python snapshot.py <task file> <snapshot directory>')
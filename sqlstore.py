@@ -0,0 +1,574 @@
+#------------------------------------------
+# Name:     sqlstore
+# Purpose:  Task lists kept in a SQLite database rather than in memory
+#
+# Author:   Robin Siebler
+# Created:  10/18/26
+#------------------------------------------
+__author__ = 'Robin Siebler'
+__date__ = '10/18/26'
+
+# A task file can be a SQLite database instead of a pickle or a binary task file;
+# util.load, journal.load and the menu recognize it by its first bytes.  SQLiteTaskList
+# has the TaskList API (ids are stable and the numbers shown are positions, as with
+# TaskList(stable_ids=True)), but only the tasks being looked at are in memory, and every
+# change is committed to the database as it is made, so there is nothing to save.
+#
+#   python sqlstore.py work.tsk [new.tsk]    # copy any task file into a database
+#
+# The database is opened in WAL mode.  Each call that changes tasks is one transaction;
+# use batch() to make several calls one transaction.  Text search uses an FTS5 table
+# with the trigram tokenizer (substring matches, like Task.match) where the sqlite3
+# library has it, and otherwise scans the table.
+
+import collections, contextlib, sqlite3, sys, threading
+import stats
+from tasklist import (Task, TaskList, normalize_tags, priority_code, tag_set, task_fields,
+                      to_ordinal)
+
+MAGIC = b'SQLite format 3\0'
+SCHEMA_VERSION = 1
+CHUNK_SIZE = 1000  # tasks fetched at a time when iterating
+COLUMNS = 'id, note, priority, tags, created, version'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    note TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    tags TEXT NOT NULL,
+    created INTEGER NOT NULL,
+    version INTEGER NOT NULL DEFAULT 0);
+CREATE INDEX IF NOT EXISTS tasks_priority ON tasks (priority, id);
+CREATE INDEX IF NOT EXISTS tasks_created ON tasks (created, id);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+    note, tags, content='tasks', content_rowid='id', tokenize='trigram');
+CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN
+    INSERT INTO tasks_fts (rowid, note, tags) VALUES (new.id, new.note, new.tags);
+END;
+CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN
+    INSERT INTO tasks_fts (tasks_fts, rowid, note, tags) VALUES ('delete', old.id, old.note, old.tags);
+END;
+CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF note, tags ON tasks BEGIN
+    INSERT INTO tasks_fts (tasks_fts, rowid, note, tags) VALUES ('delete', old.id, old.note, old.tags);
+    INSERT INTO tasks_fts (rowid, note, tags) VALUES (new.id, new.note, new.tags);
+END;
+"""
+
+FTS_MIN_LENGTH = 3  # the trigram tokenizer can't find anything shorter
+
+
+def is_sqlite_file(filename):
+    """Return True if filename is a SQLite database."""
+
+    with open(filename, 'rb') as fh:
+        return fh.read(len(MAGIC)) == MAGIC
+
+
+def _task(row):
+    task = Task.from_state(row[:5])
+    task.version = row[5]
+    return task
+
+
+def _phrase(text):
+    """Quote text as an FTS5 phrase."""
+
+    return '"{}"'.format(text.replace('"', '""'))
+
+
+def _contains(search_string, note, tags):
+    return search_string in note.lower() or search_string in tags.lower()
+
+
+class Selection(object):
+    """An ordered selection of the tasks in a database, fetched a page at a time when it
+    is indexed or sliced (like tasklist.TaskSequence)."""
+
+    def __init__(self, store, where='', params=(), order='id', length=None):
+        self._store = store
+        self._where = where
+        self._params = tuple(params)
+        self._order = order
+        self._len = length
+
+    def __len__(self):
+        if self._len is None:
+            self._len = self._store._count(self._where, self._params)
+        return self._len
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            start, stop, step = i.indices(len(self))
+            if step != 1:
+                return self[start:stop][::step]
+            return self._store._select(self._where, self._params, self._order,
+                                       max(stop - start, 0), start)
+        if i < 0:
+            i += len(self)
+        tasks = self._store._select(self._where, self._params, self._order, 1, i) if i >= 0 else []
+        if not tasks:
+            raise IndexError('task index out of range')
+        return tasks[0]
+
+    def __iter__(self):
+        for start in range(0, len(self), CHUNK_SIZE):
+            for task in self[start:start + CHUNK_SIZE]:
+                yield task
+
+
+class SQLiteTaskList(object):
+    """A task list kept in a SQLite database, with the same API as TaskList."""
+
+    stable_ids = True
+
+    def __init__(self, filename):
+        """Open (or create) a task database.
+
+        :param filename: the task file
+        """
+
+        self.filename = filename
+        self.db = sqlite3.connect(filename, isolation_level=None, check_same_thread=False)
+        self.db.create_function('contains', 3, _contains, deterministic=True)
+        self._lock = threading.RLock()  # the reciter reads the tasks on its own thread
+        self._depth = 0  # nesting of batch()
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SCHEMA)
+        try:
+            self.db.executescript(FTS_SCHEMA)
+            self.fts = True
+        except sqlite3.OperationalError:
+            self.fts = False  # no FTS5 (or no trigram tokenizer): search scans the table
+        self.db.execute('PRAGMA user_version={}'.format(SCHEMA_VERSION))
+        self._len = self._count()
+        self._rendered = {}  # used by render(), as in TaskList
+        self._spoken = {}  # used by utterance()
+        self.version = 0  # incremented by every change
+
+    def close(self):
+        with self._lock:
+            self.db.close()
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Make every change in the with block one transaction."""
+
+        with self._lock:
+            if not self._depth:
+                self.db.execute('BEGIN IMMEDIATE')
+            self._depth += 1
+            try:
+                yield
+            except BaseException:
+                self._depth -= 1
+                if not self._depth:
+                    self.db.execute('ROLLBACK')
+                    self._len = self._count()
+                raise
+            self._depth -= 1
+            if not self._depth:
+                self.db.execute('COMMIT')
+
+    def _select(self, where='', params=(), order='id', limit=None, offset=0):
+        sql = 'SELECT {} FROM tasks{} ORDER BY {}'.format(
+            COLUMNS, ' WHERE ' + where if where else '', order)
+        if limit is not None:
+            sql += ' LIMIT {:d} OFFSET {:d}'.format(limit, offset)
+        with self._lock:
+            rows = self.db.execute(sql, params).fetchall()
+        return [_task(row) for row in rows]
+
+    def _last_id(self):
+        row = self.db.execute("SELECT seq FROM sqlite_sequence WHERE name = 'tasks'").fetchone()
+        return row[0] if row else 0
+
+    def _count(self, where='', params=()):
+        with self._lock:
+            return self.db.execute('SELECT count(*) FROM tasks' + (' WHERE ' + where if where else ''),
+                                   params).fetchone()[0]
+
+    # reading
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        last_id = 0
+        while True:
+            tasks = self._select('id > ?', (last_id,), limit=CHUNK_SIZE)
+            for task in tasks:
+                yield task
+            if len(tasks) < CHUNK_SIZE:
+                return
+            last_id = tasks[-1].id
+
+    def __getitem__(self, i):
+        return Selection(self, length=self._len)[i]
+
+    @property
+    def tasks(self):
+        """The tasks in id order (fetched as they are accessed)."""
+
+        return self
+
+    def find(self, task_id):
+        """Return the task with the given id, or None."""
+
+        tasks = self._select('id = ?', (task_id,))
+        return tasks[0] if tasks else None
+
+    def _find_task(self, task_id):
+        """Find a task by task.id
+
+        :param task_id: The task.id for the task to find (int or str).
+        :return: a task object if found, otherwise None
+        """
+
+        try:
+            return self.find(int(task_id))
+        except (TypeError, ValueError):
+            return None
+
+    def to_tasks(self):
+        return list(self)
+
+    def numbered(self, tasks=None):
+        """Yield (number, task) pairs; the number is the task's position in the list."""
+
+        if tasks is None:
+            for number, task in enumerate(self, 1):
+                yield number, task
+            return
+        tasks = list(tasks)
+        if not tasks:
+            return
+        ids = sorted(set(task.id for task in tasks))
+        with self._lock:
+            # one pass over the ids up to the largest one, rather than a count per task
+            rows = dict(self.db.execute(
+                'SELECT id, number FROM (SELECT id, row_number() OVER (ORDER BY id) AS number '
+                'FROM tasks WHERE id <= ?) WHERE id IN ({})'.format(','.join('?' * len(ids))),
+                [ids[-1]] + ids).fetchall())
+        for task in tasks:
+            if task.id in rows:
+                yield rows[task.id], task
+
+    def task_at(self, number):
+        """Return the task shown with the given number, or None."""
+
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            return None
+        return self[number - 1] if 0 < number <= len(self) else None
+
+    def iter_range(self, offset, limit, tasks=None):
+        """Yield (number, task) pairs for one page of tasks (see TaskList.iter_range())."""
+
+        if tasks is None:
+            return enumerate(self[offset:offset + limit], offset + 1)
+        return self.numbered(tasks[offset:offset + limit])
+
+    render = TaskList.render
+    utterance = TaskList.utterance
+    lines = TaskList.lines
+    export = TaskList.export
+    __str__ = TaskList.__str__
+
+    def search(self, search_string):
+        """Return all task that match the given search string
+
+        :param search_string: search string (in lower case)
+        :return: task list
+        """
+
+        if self.fts and len(search_string) >= FTS_MIN_LENGTH:
+            tasks = self._select('id IN (SELECT rowid FROM tasks_fts WHERE tasks_fts MATCH ?)',
+                                 (_phrase(search_string),))
+            # the tokenizer folds case a little differently from str.lower()
+            return [task for task in tasks if task.match(search_string)]
+        return self._select('contains(?, note, tags)', (search_string,))
+
+    def search_prefix(self, search_string):
+        """Return the tasks in which every word of search_string starts a word of the
+        note or tags, in id order (see TaskList.search_prefix())."""
+
+        fragments = search_string.lower().split()
+        if not fragments:
+            return []
+        phrases = [_phrase(fragment) for fragment in fragments
+                   if len(fragment) >= FTS_MIN_LENGTH]
+        if self.fts and phrases:
+            tasks = self._select('id IN (SELECT rowid FROM tasks_fts WHERE tasks_fts MATCH ?)',
+                                 (' AND '.join(phrases),))
+        else:
+            tasks = self._select('contains(?, note, tags)', (fragments[0],))
+        return [task for task in tasks
+                if all(any(word.startswith(fragment)
+                           for word in (task.note.lower() + ' ' + task.tags.lower()).split())
+                       for fragment in fragments)]
+
+    def _where(self, terms):
+        """Return the SQL condition (and its parameters) that narrows the rows which could
+        match a query: the priority and date terms and the text in the FTS table."""
+
+        from query import Created, Priority, Tag, Text
+        where, params, phrases = [], [], []
+        for term in terms:
+            if isinstance(term, Priority):
+                where.append('priority IN ({})'.format(','.join('?' * len(term.codes))))
+                params.extend(term.codes)
+            elif isinstance(term, Created):
+                if term.start is not None:
+                    where.append('created >= ?')
+                    params.append(term.start)
+                if term.end is not None:
+                    where.append('created <= ?')
+                    params.append(term.end)
+            elif isinstance(term, Text) and len(term.text) >= FTS_MIN_LENGTH:
+                column = 'note : ' if term.field == 'note' else ''
+                phrases.append(column + _phrase(term.text))
+            elif isinstance(term, Tag) and min(map(len, term.tags)) >= FTS_MIN_LENGTH:
+                phrases.append('tags : ({})'.format(' OR '.join(map(_phrase, term.tags))))
+        if phrases and self.fts:
+            where.append('id IN (SELECT rowid FROM tasks_fts WHERE tasks_fts MATCH ?)')
+            params.append(' AND '.join(phrases))
+        return ' AND '.join(where), params
+
+    def query(self, query_string):
+        """Return the tasks matching a structured query (see query.py), in id order.
+
+        SQLite returns the rows that could match (see _where()); every term is then
+        checked on those rows.
+        """
+
+        from query import parse
+        terms = parse(query_string)
+        where, params = self._where(terms)
+        tasks = self._select(where, params) if where else self
+        return [task for task in tasks if all(term.matches(task) for term in terms)]
+
+    def explain(self, query_string):
+        """Return how SQLite will run a structured query (like query.Plan.explain())."""
+
+        from query import parse
+        terms = parse(query_string)
+        where, params = self._where(terms)
+        lines = ['Query: {}'.format(query_string)]
+        sql = 'SELECT id FROM tasks{} ORDER BY id'.format(' WHERE ' + where if where else '')
+        with self._lock:
+            for row in self.db.execute('EXPLAIN QUERY PLAN ' + sql, params):
+                lines.append('  ' + row[-1])
+        for term in terms:
+            lines.append('  check {}'.format(term))
+        return '\n'.join(lines)
+
+    def tasks_tagged(self, tags, match_any=False):
+        """Return the tasks with all of the given tags (or any of them), in id order
+        (see TaskList.tasks_tagged())."""
+
+        from query import Tag
+        if isinstance(tags, str):
+            tags = tag_set(tags)
+        else:
+            tags = set().union(*map(tag_set, tags))
+        if not tags:
+            return []
+        terms = [Tag(','.join(tags))] if match_any else [Tag(tag) for tag in tags]
+        where, params = self._where(terms)
+        tasks = self._select(where, params) if where else self
+        return [task for task in tasks if all(term.matches(task) for term in terms)]
+
+    def tag_counts(self):
+        """Return a tag -> number of tasks dict of every tag in use, counted from the
+        distinct tags strings."""
+
+        counts = collections.Counter()
+        with self._lock:
+            rows = self.db.execute('SELECT tags, COUNT(*) FROM tasks GROUP BY tags').fetchall()
+        for tags, count in rows:
+            for tag in tag_set(tags):
+                counts[tag] += count
+        return dict(counts)
+
+    def count_by_tag(self, tag):
+        return self.tag_counts().get(normalize_tags(tag), 0)
+
+    def tasks_by_priority(self, priority):
+        """Return the tasks with the given priority, in id order (fetched as they are
+        accessed)."""
+
+        return Selection(self, 'priority = ?', (priority_code(priority),))
+
+    def count_by_priority(self, priority):
+        return self._count('priority = ?', (priority_code(priority),))
+
+    def tasks_by_date(self, newest_first=False):
+        """Return all of the tasks ordered by creation date (and by id within a day)."""
+
+        return Selection(self, order='created DESC, id DESC' if newest_first else 'created, id')
+
+    def created_between(self, start=None, end=None):
+        """Return the tasks created from start to end (inclusive), oldest first."""
+
+        where, params = [], []
+        if start is not None:
+            where.append('created >= ?')
+            params.append(to_ordinal(start))
+        if end is not None:
+            where.append('created <= ?')
+            params.append(to_ordinal(end))
+        return Selection(self, ' AND '.join(where), params, 'created, id')
+
+    def newest(self, count):
+        """Return the count most recently created tasks, newest first."""
+
+        return self._select(order='created DESC, id DESC', limit=max(count, 0))
+
+    # changing
+
+    def add_task(self, note, priority, tags):
+        """Add a new task to the task list.
+
+        :param note: a string containing the task
+        :param priority: the priority of the task (low, medium, high)
+        :param tags: any desired tags for the task
+        """
+
+        self.add_tasks([(note, priority, tags)])
+
+    def add_tasks(self, tasks):
+        """Add many tasks in one transaction (see TaskList.add_tasks()).
+
+        :return: the number of tasks added
+        """
+
+        with self.batch():
+            first_id = self._last_id()
+            self.db.executemany(
+                'INSERT INTO tasks (note, priority, tags, created) VALUES (?, ?, ?, ?)',
+                task_fields(tasks))
+            Task.last_id = self._last_id()
+            count = Task.last_id - first_id
+            self._len += count
+        if count:
+            self.version += 1
+        return count
+
+    def modify_task(self, task_id, note, priority, tags):
+        """Change the fields of the given task."""
+
+        self.update_tasks({task_id: {'note': note, 'priority': priority, 'tags': tags}})
+
+    def update_tasks(self, changes):
+        """Change the fields of many tasks in one transaction (see TaskList.update_tasks()).
+
+        :return: the number of tasks changed
+        """
+
+        if hasattr(changes, 'items'):
+            changes = changes.items()
+        changed = []
+        with self.batch():
+            for task_id, fields in changes:
+                columns, params = [], []
+                for field in ('note', 'priority', 'tags'):
+                    if field in fields:
+                        value = fields[field]
+                        columns.append('{} = ?'.format(field))
+                        if field == 'priority':
+                            value = priority_code(value)
+                        elif field == 'tags':
+                            value = normalize_tags(value)
+                        params.append(value)
+                params.append(task_id)
+                if self.db.execute(
+                        'UPDATE tasks SET {} version = version + 1 WHERE id = ?'.format(
+                            ''.join(column + ', ' for column in columns)), params).rowcount:
+                    changed.append(task_id)
+        if changed:
+            self.version += 1
+        return len(changed)
+
+    def delete_task(self, task_id):
+        """Delete the given task."""
+
+        self.delete_tasks([task_id])
+
+    def delete_tasks(self, task_ids):
+        """Delete several tasks in one transaction.
+
+        :return: the number of tasks deleted
+        """
+
+        deleted = []
+        with self.batch():
+            for task_id in set(task_ids):
+                if self.db.execute('DELETE FROM tasks WHERE id = ?', (task_id,)).rowcount:
+                    deleted.append(task_id)
+                    self._rendered.pop(task_id, None)
+                    self._spoken.pop(task_id, None)
+            self._len -= len(deleted)
+        if deleted:
+            self.version += 1
+        return len(deleted)
+
+    def backup(self, filename):
+        """Copy the database to another task file."""
+
+        target = sqlite3.connect(filename)
+        try:
+            with self._lock:
+                self.db.backup(target)
+        finally:
+            target.close()
+
+stats.register(SQLiteTaskList, {'add_tasks': 'add', 'update_tasks': 'modify',
+                                'search': 'search', 'search_prefix': 'search_prefix',
+                                'query': 'query', '_find_task': 'find',
+                                'delete_tasks': 'delete', 'render': 'render'})
+
+
+def convert(filename, new_name=None):
+    """Copy a task file (in any format) into a new task database.
+
+    :param filename: the task file
+    :param new_name: the database to create (default: replace filename)
+    :return: the name of the database
+    """
+
+    import os, journal, util
+    filename = util.validate_file(filename)
+    if not filename:
+        return None
+    tasks = journal.load(filename)[0]
+    new_name = util.valid_filename(new_name or filename)
+    temp_name = new_name + '.tmp'
+    if os.path.exists(temp_name):
+        os.remove(temp_name)
+    store = SQLiteTaskList(temp_name)
+    try:
+        with store.batch():
+            store.db.executemany(
+                'INSERT INTO tasks (id, note, priority, tags, created) VALUES (?, ?, ?, ?, ?)',
+                (task.__getstate__() for task in tasks))
+    finally:
+        store.db.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        store.close()
+    for journal_file in journal.journal_files(new_name):
+        if os.path.exists(journal_file):
+            os.remove(journal_file)  # the database has every change
+    os.replace(temp_name, new_name)
+    for suffix in ('-wal', '-shm'):
+        if os.path.exists(temp_name + suffix):
+            os.remove(temp_name + suffix)
+    return new_name
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        print('{} -> {}'.format(sys.argv[1], convert(*sys.argv[1:3])))
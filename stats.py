@@ -0,0 +1,194 @@
+#------------------------------------------
+# Name:     stats
+# Purpose:  Operation counters, latency histograms and profiling hooks
+#
+# Author:   Robin Siebler
+# Created:  10/18/26
+#------------------------------------------
+__author__ = 'Robin Siebler'
+__date__ = '10/18/26'
+
+# Modules register the functions worth timing with register().  Nothing is wrapped
+# until enable() is called, so instrumentation costs nothing while it is off.
+#
+#   import stats
+#   stats.enable()
+#   stats.profile('search')        # run a cProfile.Profile around every search
+#   stats.add_sink(my_callback)    # called as my_callback(operation, seconds)
+#   print(stats.report())
+
+import functools, threading, timeit
+
+enabled = False
+_registry = []  # (owner, attribute name, operation)
+_originals = {}  # (owner, attribute name) -> the unwrapped function
+_timings = {}  # operation -> Timing
+_counters = {}  # name -> count
+_sinks = []
+_profilers = {}  # operation -> cProfile.Profile
+_lock = threading.Lock()
+
+
+class Timing(object):
+    """Call count, total/min/max time and a log2 histogram (in microseconds) of an operation."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = 0.0
+        self.histogram = {}  # bucket -> count; bucket b holds times < 2**b microseconds
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = max(self.max, seconds)
+        bucket = int(seconds * 1e6).bit_length()
+        self.histogram[bucket] = self.histogram.get(bucket, 0) + 1
+
+    def as_dict(self):
+        return {'count': self.count, 'total': self.total, 'min': self.min or 0.0,
+                'max': self.max, 'mean': self.total / self.count if self.count else 0.0,
+                'histogram': dict(('<{}us'.format(2 ** bucket), count)
+                                  for bucket, count in sorted(self.histogram.items()))}
+
+
+def register(owner, operations):
+    """Make functions of a class or module available for instrumentation.
+
+    :param owner: the class or module the functions are attributes of
+    :param operations: a dict of attribute name -> operation name
+    """
+
+    for name, operation in operations.items():
+        _registry.append((owner, name, operation))
+        if enabled:
+            _wrap(owner, name, operation)
+
+
+def _wrap(owner, name, operation):
+    function = owner.__dict__[name]
+    _originals[(owner, name)] = function
+    kind = type(function) if isinstance(function, (classmethod, staticmethod)) else None
+    if kind:
+        function = function.__func__
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        profiler = _profilers.get(operation)
+        if profiler:
+            profiler.enable()
+        start = timeit.default_timer()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            elapsed = timeit.default_timer() - start
+            if profiler:
+                profiler.disable()
+            record(operation, elapsed)
+    setattr(owner, name, kind(wrapper) if kind else wrapper)
+
+
+def enable():
+    """Start timing every registered operation."""
+
+    global enabled
+    if not enabled:
+        enabled = True
+        for owner, name, operation in _registry:
+            _wrap(owner, name, operation)
+
+
+def disable():
+    """Stop timing and restore the original functions (the statistics are kept)."""
+
+    global enabled
+    if enabled:
+        enabled = False
+        for (owner, name), function in _originals.items():
+            setattr(owner, name, function)
+        _originals.clear()
+
+
+def record(operation, seconds):
+    """Record one timed call of an operation."""
+
+    with _lock:
+        timing = _timings.get(operation)
+        if timing is None:
+            timing = _timings[operation] = Timing()
+        timing.add(seconds)
+    for sink in _sinks:
+        sink(operation, seconds)
+
+
+def count(name, amount=1):
+    """Add to a counter (e.g. 'bytes_read').  Callers check stats.enabled first."""
+
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def add_sink(sink):
+    """Call sink(operation, seconds) for every timed call."""
+
+    _sinks.append(sink)
+
+
+def remove_sink(sink):
+    _sinks.remove(sink)
+
+
+def profile(operation):
+    """Run a cProfile.Profile around every call of operation and return it.
+
+    Use pstats.Stats(profiler) to look at the results.
+    """
+
+    import cProfile
+    profiler = _profilers.get(operation)
+    if profiler is None:
+        profiler = _profilers[operation] = cProfile.Profile()
+    return profiler
+
+
+def stop_profiling(operation):
+    return _profilers.pop(operation, None)
+
+
+def reset():
+    """Clear all timings and counters."""
+
+    with _lock:
+        _timings.clear()
+        _counters.clear()
+
+
+def snapshot():
+    """Return the timings and counters as a dict (suitable for JSON)."""
+
+    with _lock:
+        return {'enabled': enabled,
+                'operations': dict((op, timing.as_dict()) for op, timing in _timings.items()),
+                'counters': dict(_counters)}
+
+
+def report():
+    """Return the timings and counters as text."""
+
+    data = snapshot()
+    if not data['operations'] and not data['counters']:
+        if enabled:
+            return 'No operations have been timed yet.'
+        return 'Statistics are not being collected.'
+    width = max([10] + [len(operation) + 2 for operation in data['operations']])
+    lines = ['{:<{}}{:>8}{:>12}{:>12}{:>12}'.format('Operation', width, 'Calls', 'Mean ms',
+                                                   'Max ms', 'Total s')]
+    for operation, timing in sorted(data['operations'].items()):
+        lines.append('{:<{}}{:>8}{:>12.3f}{:>12.3f}{:>12.3f}'.format(
+            operation, width, timing['count'], timing['mean'] * 1000, timing['max'] * 1000,
+            timing['total']))
+    for name, value in sorted(data['counters'].items()):
+        lines.append('{}: {}'.format(name, value))
+    return '\n'.join(lines)
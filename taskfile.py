@@ -0,0 +1,292 @@
+#------------------------------------------
+# Name:     taskfile
+# Purpose:  Binary, memory-mapped task file format
+#
+# Author:   Robin Siebler
+# Created:  10/18/26
+#------------------------------------------
+__author__ = 'Robin Siebler'
+__date__ = '10/18/26'
+
+# All numbers are little-endian.  Every version starts with HEADER: the magic number,
+# the format version, flags, the number of tasks and the journal sequence number.
+#
+# Version 1:
+#   ids         count x uint32, ascending
+#   priorities  count x uint8 (index into tasklist.PRIORITIES), padded to 4 bytes
+#   created     count x int32 (date ordinals)
+#   offsets     (2 * count + 1) x uint32; the note of row r is heap[offsets[2r]:offsets[2r+1]]
+#               and its tags are heap[offsets[2r+1]:offsets[2r+2]]
+#   heap        the UTF-8 encoded notes and tags
+#
+# Version 2 (what write() creates) keeps each distinct tags string once, in a string
+# table, and can compress everything after the header with zlib (FLAG_ZLIB):
+#   ids, priorities, created    as in version 1
+#   tags        count x uint32, index into the string table
+#   notes       (count + 1) x uint32; the note of row r is notes heap[notes[r]:notes[r+1]]
+#   strings     uint32 number of strings, then (strings + 1) x uint32 offsets
+#   string heap the UTF-8 encoded tags strings
+#   notes heap  the UTF-8 encoded notes
+#
+# See README.md for how the format compares with pickle.
+
+import bisect, mmap, struct, sys, zlib
+from array import array
+import stats, util
+from tasklist import Task, normalize_tags, priority_code
+
+MAGIC = b'TSKB'
+VERSION = 2  # the version write() creates
+VERSIONS = (1, 2)  # the versions TaskFile can read
+HEADER = struct.Struct('<4sHHIQ')  # magic, version, flags, count, seq
+FLAG_ZLIB = 1
+
+
+class TaskFileError(Exception):
+    pass
+
+
+def is_task_file(filename):
+    """Return True if filename is in the binary format (rather than a pickle)."""
+
+    with open(filename, 'rb') as fh:
+        return fh.read(len(MAGIC)) == MAGIC
+
+
+def _padded(size):
+    return (size + 3) & ~3
+
+
+def _decode(heap, offsets, rows):
+    """Decode the strings at the given (ascending) rows of a heap.
+
+    Decoding the whole range at once is much faster than decoding string by string.
+    """
+
+    if not rows:
+        return []
+    start, end = offsets[rows[0]], offsets[rows[-1] + 1]
+    if end - start > 64 * len(rows) + 4096:
+        # the rows are scattered over the heap; don't decode everything in between
+        return [heap[offsets[row]:offsets[row + 1]].tobytes().decode('utf-8') for row in rows]
+    data = heap[start:end].tobytes()
+    text = data.decode('utf-8')
+    if len(text) == len(data):
+        # plain ASCII, so the byte offsets are character offsets too
+        return [text[offsets[row] - start:offsets[row + 1] - start] for row in rows]
+    return [data[offsets[row] - start:offsets[row + 1] - start].decode('utf-8') for row in rows]
+
+
+class TaskFile(object):
+    """A read-only task file.  Opening it only maps the file into memory (or, if it is
+    compressed, decompresses it); each task is decoded when it is accessed."""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._views = []  # every view into the file, released by close()
+        with open(filename, 'rb') as fh:
+            try:
+                self._mmap = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # an empty file can't be mapped
+                raise TaskFileError('{} is too short to be a task file'.format(filename))
+        try:
+            self._map()
+        except TaskFileError:
+            self.close()
+            raise
+
+    def _section(self, view, start, size, format=None):
+        """Return size bytes of view from start (cast to format), checking they are there.
+
+        :raise TaskFileError: if the file ends before the section does
+        """
+
+        if size < 0 or start + size > len(view):
+            raise TaskFileError('{} is damaged or incomplete'.format(self.filename))
+        section = view[start:start + size]
+        if format:
+            section = section.cast(format)
+        self._views.append(section)
+        return section
+
+    def _map(self):
+        """Read the header and map each section of the file.
+
+        :raise TaskFileError: if the file is damaged, truncated or not a task file
+        """
+
+        try:
+            magic, self.version, self.flags, count, self.seq = HEADER.unpack_from(self._mmap)
+        except struct.error:
+            raise TaskFileError('{} is too short to be a task file'.format(self.filename))
+        if magic != MAGIC or self.version not in VERSIONS:
+            raise TaskFileError('{} is not a task file this version can read'.format(
+                self.filename))
+        self._count = count
+        if self.flags & FLAG_ZLIB:
+            try:
+                data = zlib.decompress(self._mmap[HEADER.size:])
+            except zlib.error as e:
+                raise TaskFileError('{} is damaged: {}'.format(self.filename, e))
+        else:
+            data = self._mmap
+        with memoryview(data) as whole:
+            view = whole[HEADER.size:] if data is self._mmap else whole[:]
+            self._views.append(view)
+            self.ids = self._section(view, 0, 4 * count, 'I')
+            start = 4 * count
+            self.priorities = self._section(view, start, count)
+            start += _padded(count)
+            self.created = self._section(view, start, 4 * count, 'i')
+            start += 4 * count
+            if self.version == 1:
+                self.offsets = self._section(view, start, 4 * (2 * count + 1), 'I')
+                start += 4 * (2 * count + 1)
+            else:
+                self.tags = self._section(view, start, 4 * count, 'I')
+                start += 4 * count
+                self.offsets = self._section(view, start, 4 * (count + 1), 'I')
+                start += 4 * (count + 1)
+                strings = self._section(view, start, 4, 'I')[0]
+                start += 4
+                string_offsets = self._section(view, start, 4 * (strings + 1), 'I')
+                start += 4 * (strings + 1)
+                heap = self._section(view, start, string_offsets[-1])
+                try:
+                    self.strings = [sys.intern(string) for string in
+                                    _decode(heap, string_offsets, range(strings))]
+                except UnicodeDecodeError as e:
+                    raise TaskFileError('{} is damaged: {}'.format(self.filename, e))
+                start += string_offsets[-1]
+            self.heap = self._section(view, start, len(view) - start)
+        if self.offsets[0] != 0 or self.offsets[-1] > len(self.heap):
+            raise TaskFileError('{} is damaged or incomplete'.format(self.filename))
+
+    def close(self):
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._mmap.close()
+
+    def __len__(self):
+        return self._count
+
+    def rows(self, rows):
+        """Decode the tasks at the given (ascending) rows.
+
+        Decoding many rows at once is much faster than indexing them one by one.
+        """
+
+        ids, priorities, created = self.ids, self.priorities, self.created
+        if self.version == 1:
+            strings = _decode(self.heap, self.offsets, [2 * row + i for row in rows for i in (0, 1)])
+            notes, tags = strings[0::2], strings[1::2]
+        else:
+            notes = _decode(self.heap, self.offsets, rows)
+            tags = [self.strings[self.tags[row]] for row in rows]
+        new_task = Task.__new__
+        tasks = []
+        for row, note, tag in zip(rows, notes, tags):
+            task = new_task(Task)
+            task.id, task.note, task._priority = ids[row], note, priorities[row]
+            task.tags = normalize_tags(tag)  # a file written before tags were normalized
+            task.created, task.version = created[row], 0
+            tasks.append(task)
+        return tasks
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return self.rows(range(*row.indices(len(self))))
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError('task index out of range')
+        return self.rows([row])[0]
+
+    def __iter__(self):
+        for start in range(0, len(self), 4096):
+            for task in self[start:start + 4096]:
+                yield task
+
+    def find(self, task_id):
+        """Return the task with the given id (or None) without decoding any other task."""
+
+        row = bisect.bisect_left(self.ids, task_id)
+        if row < len(self) and self.ids[row] == task_id:
+            return self[row]
+        return None
+
+    def to_tasks(self):
+        """Decode every task in the file."""
+
+        return self[:]
+
+stats.register(TaskFile, {'__init__': 'taskfile_open', 'rows': 'taskfile_decode'})
+
+
+def _heap(strings):
+    """Return the offsets and the UTF-8 encoded heap of a list of strings."""
+
+    data = [string.encode('utf-8') for string in strings]
+    offsets, size = array('I', [0]), 0
+    for item in data:
+        size += len(item)
+        offsets.append(size)
+    return offsets, b''.join(data)
+
+
+def write(tasks, filename, seq=0, compress=False):
+    """Write tasks (in id order) to a binary task file.
+
+    The file is replaced atomically (see util.atomic_open).
+
+    :param tasks: an iterable of Task-like objects
+    :param filename: the task file to create
+    :param seq: the journal sequence number the file is up to date with
+    :param compress: compress the file with zlib (smaller, but it can't be mapped)
+    """
+
+    if sys.byteorder != 'little':
+        raise TaskFileError('the binary task file format is only supported on little-endian machines')
+    tasks = sorted(tasks, key=lambda task: task.id)
+    count = len(tasks)
+    codes = {}  # tags string -> index into the string table
+    tags = array('I', [codes.setdefault(task.tags, len(codes)) for task in tasks])
+    note_offsets, note_heap = _heap([task.note for task in tasks])
+    string_offsets, string_heap = _heap(list(codes))  # in code order
+    payload = b''.join((array('I', [task.id for task in tasks]).tobytes(),
+                        array('B', [priority_code(task.priority) for task in tasks]).tobytes(),
+                        b'\0' * (_padded(count) - count),
+                        array('i', [task.created for task in tasks]).tobytes(),
+                        tags.tobytes(), note_offsets.tobytes(),
+                        struct.pack('<I', len(codes)), string_offsets.tobytes(),
+                        string_heap, note_heap))
+    flags = 0
+    if compress:
+        payload, flags = zlib.compress(payload, 6), FLAG_ZLIB
+    with util.atomic_open(filename) as fh:
+        fh.write(HEADER.pack(MAGIC, VERSION, flags, count, seq))
+        fh.write(payload)
+
+
+def convert(filename, new_name=None, compress=False):
+    """Convert a task file (e.g. a pickled one) to the current binary format.
+
+    :param filename: the task file
+    :param new_name: the file to create (default: replace filename)
+    :param compress: compress the new file with zlib
+    :return: the name of the binary task file
+    """
+
+    from journal import load
+    filename = util.validate_file(filename)
+    if not filename:
+        return None
+    tasks, seq = load(filename)
+    new_name = util.valid_filename(new_name or filename)
+    write(tasks, new_name, seq, compress)
+    return new_name
+
+if __name__ == '__main__':
+    for name in sys.argv[1:]:
+        print('{} -> {}'.format(name, convert(name)))
@@ -8,12 +8,118 @@
 __author__ = 'Robin Siebler'
 __date__ = '7/14/13'
 
-import datetime
+import bisect, collections, datetime, re, sys, threading
+import stats
+from history import History
+from index import DateIndex, PriorityIndex, TagIndex, TextIndex
 
-# TODO: add option to sort by date
+DATE_FORMAT = '%m/%d/%Y'
+RENDER_CACHE_SIZE = 10000  # most task descriptions TaskList.render() keeps around
+PREFIX_CACHE_SIZE = 64  # most results TaskList.search_prefix() keeps around
+PRIORITIES = ('Low', 'Medium', 'High')  # a task stores the index into this tuple
+PRIORITY_CODES = dict((p.lower(), code) for code, p in enumerate(PRIORITIES))
+TAG_SEPARATOR = re.compile(r'[\s,]+')  # tags are typed separated by spaces or commas
+TAG_CACHE_SIZE = 10000  # most distinct tags strings normalize_tags() and tag_set() remember
+_ordinals = {}  # tasks created on the same day share one int object
+_tag_strings = {}  # tags string -> its normalized form
+_tag_sets = {}  # tags string -> frozenset of its tags, shared by the tasks with those tags
 
-class Task:
-    last_id = 0
+
+def date_ordinal(date):
+    """Return the (shared) proleptic Gregorian ordinal of a date (see to_ordinal())."""
+
+    ordinal = to_ordinal(date)
+    return _ordinals.setdefault(ordinal, ordinal)
+
+
+def to_ordinal(date):
+    """Return the ordinal of a date given as a datetime.date, an ordinal or a string in
+    DATE_FORMAT."""
+
+    if isinstance(date, int):
+        return date
+    if not isinstance(date, datetime.date):
+        date = datetime.datetime.strptime(date, DATE_FORMAT)
+    return date.toordinal()
+
+
+def normalize_tags(tags):
+    """Return the stored form of a tags string: each tag once, in lower case, separated by
+    single spaces (in the order typed).  The result is interned, so tasks with the same
+    tags share one string.
+
+    :param tags: the tags as typed, separated by spaces and/or commas
+    """
+
+    normalized = _tag_strings.get(tags)
+    if normalized is None:
+        if len(_tag_strings) >= TAG_CACHE_SIZE:
+            _tag_strings.clear()
+        unique = []
+        for tag in TAG_SEPARATOR.split(tags.lower()):
+            if tag and tag not in unique:
+                unique.append(tag)
+        normalized = _tag_strings[tags] = sys.intern(' '.join(unique))
+    return normalized
+
+
+def tag_set(tags):
+    """Return the frozenset of the (interned) tags in a tags string.
+
+    The set is made once for each distinct tags string, so it costs nothing per task.
+    """
+
+    tags_set = _tag_sets.get(tags)
+    if tags_set is None:
+        if len(_tag_sets) >= TAG_CACHE_SIZE:
+            _tag_sets.clear()
+        tags_set = _tag_sets[tags] = frozenset(
+            sys.intern(tag) for tag in normalize_tags(tags).split())
+    return tags_set
+
+
+def priority_code(priority):
+    """Return the small integer used to store a priority.
+
+    :param priority: a priority name (low, medium, high) or its code
+    """
+
+    if isinstance(priority, int):
+        PRIORITIES[priority]  # raise IndexError for an unknown code
+        return priority
+    return PRIORITY_CODES[priority.lower()]
+
+
+def task_fields(tasks):
+    """Yield the (note, priority code, normalized tags, created ordinal) of new tasks.
+
+    :param tasks: an iterable of (note, priority, tags) tuples or of dicts with those keys
+        and, optionally, a creation_date (see TaskList.add_tasks())
+    """
+
+    today = date_ordinal(datetime.date.today())
+    dates = {}  # creation_date -> ordinal; imports repeat the same few dates
+    for item in tasks:
+        if isinstance(item, dict):
+            note, priority, tags = item['note'], item['priority'], item.get('tags', '')
+            created = item.get('creation_date')
+            if not created:
+                created = today
+            elif created in dates:
+                created = dates[created]
+            else:
+                created = dates[created] = date_ordinal(created)
+        else:
+            (note, priority, tags), created = item, today
+        yield note, priority_code(priority), normalize_tags(tags), created
+
+
+_id_lock = threading.Lock()  # guards Task.last_id
+
+
+class Task(object):
+    __slots__ = ('id', 'note', 'tags', 'created', 'version', '_priority')
+    last_id = 0  # the last id allocated in this process (see allocate_ids())
 
     def __init__(self, note, priority, tags=''):
         """Initialize a Task object.
@@ -25,10 +131,74 @@ class Task:
 
         self.note = note
         self.priority = priority
-        self.tags = tags
-        self.creation_date = datetime.date.today().strftime("%m/%d/%Y")
-        Task.last_id += 1
-        self.id = Task.last_id
+        self.tags = normalize_tags(tags)
+        self.created = date_ordinal(datetime.date.today())
+        self.version = 0  # incremented each time the task is modified
+        self.id = Task.allocate_ids(1)
+
+    @staticmethod
+    def allocate_ids(count, after=0):
+        """Reserve count consecutive ids (atomically, so threads never share one).
+
+        :param after: the ids are greater than this too, e.g. the largest id in the
+            task list they are for (Task.last_id is shared by every list)
+        :return: the first id
+        """
+
+        with _id_lock:
+            first_id = max(Task.last_id, after) + 1
+            Task.last_id = first_id + count - 1
+        return first_id
+
+    @property
+    def priority(self):
+        return PRIORITIES[self._priority]
+
+    @priority.setter
+    def priority(self, priority):
+        self._priority = priority_code(priority)
+
+    @property
+    def tag_set(self):
+        """The task's tags as a frozenset (shared with every task that has the same tags)."""
+
+        return tag_set(self.tags)
+
+    @property
+    def creation_date(self):
+        return datetime.date.fromordinal(self.created).strftime(DATE_FORMAT)
+
+    @creation_date.setter
+    def creation_date(self, creation_date):
+        self.created = date_ordinal(creation_date)
+
+    def __getstate__(self):
+        return self.id, self.note, self._priority, self.tags, self.created
+
+    def __setstate__(self, state):
+        """Restore a pickled task.  Task files written before Task used __slots__
+        hold a dict with a priority name and a formatted creation date; the tags of
+        older task files are normalized (see normalize_tags()) as they are loaded."""
+
+        self.version = getattr(self, 'version', -1) + 1
+        if isinstance(state, dict):
+            self.id = state['id']
+            self.note = state['note']
+            self.priority = state['priority']
+            self.tags = normalize_tags(state['tags'])
+            self.creation_date = state['creation_date']
+        else:
+            self.id, self.note, self._priority, tags, created = state
+            self.tags = normalize_tags(tags)
+            self.created = _ordinals.setdefault(created, created)
+
+    @classmethod
+    def from_state(cls, state):
+        """Create a task from a __getstate__() tuple without allocating a new id."""
+
+        task = cls.__new__(cls)
+        task.__setstate__(state)
+        return task
 
     def __str__(self):
         fmt = '{}: {}\n\tPriority: {}\n\tTags: {}'
@@ -40,14 +210,258 @@ class Task:
         :return: a list of matches
         """
 
-        return search_string in self.note.lower() or search_string in self.tags.lower()
+        return search_string in self.note.lower() or search_string in self.tags
+
+class TaskSequence(object):
+    """A read-only sequence of the tasks with the given ids; each task is looked up when
+    it is accessed, so a page of a large ordering costs only the tasks on the page."""
+
+    def __init__(self, ids, find):
+        self.ids = ids
+        self._find = find
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._find(task_id) for task_id in self.ids[i]]
+        return self._find(self.ids[i])
+
+    def __iter__(self):
+        for task_id in self.ids:
+            yield self._find(task_id)
+
+
+class _Deleted(object):
+    """Marks the place of a deleted task in a TaskList with stable ids."""
+
+    __slots__ = ('id',)
+
+    def __init__(self, task_id):
+        self.id = task_id
+
+
+class TaskList(object):
+    def __init__(self, stable_ids=False):
+        """Initialize the task list.
+
+        :param stable_ids: if True, a task keeps its id when other tasks are deleted.
+            Deleted tasks leave a marker behind which is cleaned up once there are
+            enough of them, and the numbers shown to the user come from numbered().
+        """
+
+        self.stable_ids = stable_ids
+        self._tasks = []
+        self._deleted = []  # the rows of the _Deleted markers in self._tasks, ascending
+        self._index = {}  # task.id -> task
+        self._text_index = None  # built on the first search
+        self._priority_index = None  # built on the first query by priority
+        self._date_index = None  # built on the first query by date
+        self._tag_index = None  # built on the first query by tag
+        self._rendered = {}  # task.id -> (task.version, description)
+        self._spoken = {}  # task.id -> (task.version, text recited)
+        self._prefix_results = collections.OrderedDict()  # (query, version) -> tasks
+        self.version = 0  # incremented by every change to the list
+        self.dirty = {}  # id -> state before the first change since mark_clean() (None for a
+                         # task added since); None after renumbering (every task changed)
+        self.history = History()
+        self._replaying = False  # True while undo() or redo() changes the list
+
+    def _remember(self, ids, states):
+        """Note a change: the ids of the tasks added and the states of the tasks changed
+        or deleted, as they were before.
+
+        They mark the tasks dirty and (unless it is an undo or redo) are how the change
+        is reversed (see history.py).
+        """
+
+        if self.dirty is not None:
+            for task_id in ids:
+                self.dirty.setdefault(task_id, None)
+            for state in states:
+                self.dirty.setdefault(state[0], state)
+        if not self._replaying:
+            self.history.record(ids, states)
+
+    def delta(self):
+        """Return the changes since mark_clean() as ([states of the changed tasks],
+        [ids of the deleted tasks]), or None if every task changed (they were renumbered).
+
+        A task changed several times appears once, with its current state; its state
+        before the changes is in self.dirty.
+        """
+
+        if self.dirty is None:
+            return None
+        states, deleted = [], []
+        for task_id in sorted(self.dirty):
+            task = self._find_task(task_id)
+            if task:
+                states.append(task.__getstate__())
+            else:
+                deleted.append(task_id)
+        return states, deleted
+
+    def mark_clean(self):
+        """Forget the changes made so far (e.g. once they have been saved)."""
+
+        self.dirty = {}
+
+    def mark_dirty(self, dirty):
+        """Put back changes forgotten by mark_clean() that weren't saved after all.
+
+        :param dirty: self.dirty as it was before mark_clean()
+        """
+
+        if dirty is None or self.dirty is None:
+            self.dirty = None
+        else:
+            self.dirty.update(dirty)  # their states are older than any noted since
+
+    @property
+    def tasks(self):
+        """The list of tasks, without deleted markers (which are dropped first, so
+        handing out the whole list costs a pass over it; paging doesn't need to)."""
+
+        if self._deleted:
+            self._compact_deleted()
+        return self._tasks
+
+    @tasks.setter
+    def tasks(self, tasks):
+        """Replace the whole task list (e.g. when a task file is loaded).
+
+        :param tasks: a list of tasks, or a read-only task store (e.g. a
+            columnar.ColumnStore) which is only turned into Task objects when the list
+            is first modified.
+        """
+
+        self._tasks = tasks if tasks is not None else []
+        self._deleted = []
+        if isinstance(self._tasks, list):
+            if self.stable_ids:
+                self._tasks.sort(key=lambda task: task.id)
+            self._rebuild_index()
+        else:
+            self._index = None  # the store does its own lookups
+        self._text_index = None
+        self._priority_index = None
+        self._date_index = None
+        self._tag_index = None
+        self._rendered = {}
+        self._spoken = {}
+        self.dirty = {}
+        self.history.clear()
+        self.version += 1
+
+    def __len__(self):
+        return len(self._tasks) - len(self._deleted)
+
+    def __iter__(self):
+        for task in self._tasks:
+            if task.__class__ is not _Deleted:
+                yield task
+
+    def compact(self):
+        """Switch to a columnar store, which uses far less memory per task.
+
+        The store is read-only; the first change to the list turns it back into Tasks.
+        """
+
+        from columnar import ColumnStore
+        self.tasks = ColumnStore(self.tasks)
+
+    def _materialize(self):
+        """Replace a read-only task store with a list of Task objects."""
 
-class TaskList:
-    def __init__(self):
-        self.tasks = []
+        if self._index is None:
+            self.tasks = self._tasks.to_tasks()
 
     def __str__(self):
-        return '\n'.join([str(task) for task in self.tasks])
+        return '\n'.join(self.lines())
+
+    def lines(self):
+        """Yield the description of each task, one at a time."""
+
+        for task in self:
+            yield str(task)
+
+    def export(self, fh):
+        """Write the description of every task to a file without building it in memory.
+
+        :param fh: a file opened for writing text
+        """
+
+        for line in self.lines():
+            fh.write(line)
+            fh.write('\n')
+
+    def iter_range(self, offset, limit, tasks=None):
+        """Yield (number, task) pairs for one page of tasks (see numbered()).
+
+        :param offset: the position of the first task on the page
+        :param limit: the most tasks to return
+        :param tasks: a list of tasks to page through (default: all of them)
+        """
+
+        if tasks is None:
+            if self.stable_ids:
+                return self._page(offset, limit)
+            tasks = self._tasks
+        return self.numbered(tasks[offset:offset + limit])
+
+    def _page(self, offset, limit):
+        """Yield (number, task) for limit tasks from position offset, stepping over the
+        deleted markers rather than dropping them all first."""
+
+        tasks, number = self._tasks, offset + 1
+        if not self._deleted:
+            for task in tasks[offset:offset + limit]:  # a task store decodes a slice at once
+                yield number, task
+                number += 1
+            return
+        for row in range(self._row_at(offset), len(tasks)):
+            if number > offset + limit:
+                break
+            task = tasks[row]
+            if task.__class__ is not _Deleted:
+                yield number, task
+                number += 1
+
+    def render(self, number, task):
+        """Return the description of a task as shown in the task list.
+
+        The description is cached until the task is modified, so redisplaying a page
+        only formats the tasks that changed.
+        """
+
+        cached = self._rendered.get(task.id)
+        if cached is None or cached[0] != task.version:
+            if len(self._rendered) >= RENDER_CACHE_SIZE:
+                self._rendered.clear()
+            cached = self._rendered[task.id] = (
+                task.version, '{}\n\tPriority: {}\n\tTags: {}\n'.format(task.note, task.priority, task.tags))
+        return '{}: {}'.format(number, cached[1])
+
+    def utterance(self, number, task):
+        """Return the text recited for a task.
+
+        Like render(), the text is cached until the task is modified.
+        """
+
+        cached = self._spoken.get(task.id)
+        if cached is None or cached[0] != task.version:
+            if len(self._spoken) >= RENDER_CACHE_SIZE:
+                self._spoken.clear()
+            if task.tags:
+                fmt = 'priority: {}, {}, This task has the following tags: {}'
+                text = fmt.format(task.priority, task.note, ' and '.join(task.tags.split()))
+            else:
+                fmt = 'priority: {}, {}, This task does not have any tags.'
+                text = fmt.format(task.priority, task.note)
+            cached = self._spoken[task.id] = (task.version, text)
+        return 'Task number {}, {}'.format(number, cached[1])
 
     def add_task(self, note, priority, tags):
         """Add a new task to the task list.
@@ -57,7 +471,101 @@ class TaskList:
         :param tags: any desired tags for the task
         """
 
-        self.tasks.append(Task(note, priority, tags))
+        self.add_tasks([(note, priority, tags)])
+
+    def add_tasks(self, tasks):
+        """Add many tasks at once.
+
+        Ids are allocated as one block and every index is updated once for the batch.
+
+        :param tasks: an iterable (e.g. a generator) of (note, priority, tags) tuples or
+            of dicts with those keys and, optionally, a creation_date
+        :return: the number of tasks added
+        """
+
+        self._materialize()
+        new_tasks = [Task.from_state((0, note, priority, tags, created))
+                     for note, priority, tags, created in task_fields(tasks)]
+        if not new_tasks:
+            return 0
+        task_id = Task.allocate_ids(len(new_tasks), self._tasks[-1].id if self._tasks else 0)
+        for task in new_tasks:
+            task.id = task_id
+            task_id += 1
+        self._tasks.extend(new_tasks)
+        self._index.update((task.id, task) for task in new_tasks)
+        if len(new_tasks) > len(self._tasks) // 2:
+            # cheaper to rebuild the indexes when (if) they are next needed
+            self._text_index = self._priority_index = self._date_index = self._tag_index = None
+        for index in self._indexes():
+            for task in new_tasks:
+                index.add(task)
+        self._remember([task.id for task in new_tasks], [])
+        self.version += 1
+        return len(new_tasks)
+
+    def modify_task(self, task_id, note, priority, tags):
+        """Change the fields of the given task.
+
+        :param task_id: id of the task to modify
+        :param note: a string containing the task
+        :param priority: the priority of the task (low, medium, high)
+        :param tags: any desired tags for the task
+        """
+
+        self.update_tasks({task_id: {'note': note, 'priority': priority, 'tags': tags}})
+
+    def update_tasks(self, changes):
+        """Change the fields of many tasks at once.
+
+        :param changes: a mapping (or an iterable of pairs) of task id -> dict holding the
+            new note, priority and/or tags
+        :return: the number of tasks changed
+        """
+
+        self._materialize()
+        if hasattr(changes, 'items'):
+            changes = changes.items()
+        # check and convert every value first, so a bad one changes nothing at all
+        pending = []
+        for task_id, fields in changes:
+            task = self._find_task(task_id)
+            if not task:
+                continue
+            pending.append((task, (
+                fields['note'] if 'note' in fields else task.note,
+                priority_code(fields['priority']) if 'priority' in fields else task._priority,
+                normalize_tags(fields['tags']) if 'tags' in fields else task.tags)))
+        indexes = self._indexes(dates=False)
+        before = []  # the states of the tasks changed so far
+        try:
+            for task, values in pending:
+                state = task.__getstate__()
+                for index in indexes:
+                    index.discard(task)
+                try:
+                    task.note, task._priority, task.tags = values
+                    task.version += 1
+                finally:
+                    for index in indexes:  # indexed as it is now, whatever happened
+                        index.add(task)
+                before.append(state)
+        finally:
+            if before:
+                self._remember([], before)
+                self.version += 1
+        return len(before)
+
+    def _indexes(self, dates=True):
+        """Return the secondary indexes that have been built.
+
+        :param dates: include the date index (which a change to a task never affects)
+        """
+
+        indexes = [self._text_index, self._priority_index, self._tag_index]
+        if dates:
+            indexes.append(self._date_index)
+        return [index for index in indexes if index is not None]
 
     def delete_task(self, task_id):
         """Delete the given task.
@@ -65,9 +573,108 @@ class TaskList:
         :param task_id: id of the task to delete
         """
 
-        task = self._find_task(task_id)
-        if task:
-            self.tasks.remove(task)
+        self.delete_tasks([task_id])
+
+    def delete_tasks(self, task_ids):
+        """Delete several tasks in a single pass over the task list.
+
+        :param task_ids: ids of the tasks to delete
+        :return: the number of tasks deleted
+        """
+
+        self._materialize()
+        # ids can name the same task twice (3 and '3'), so the tasks found are deduplicated
+        tasks = list(dict((task.id, task) for task in map(self._find_task, task_ids)
+                          if task).values())
+        if not tasks:
+            return 0
+        if self.stable_ids:
+            for task in tasks:
+                row = self._row(task.id)
+                self._tasks[row] = _Deleted(task.id)
+                bisect.insort(self._deleted, row)
+            if len(self._deleted) * 2 > len(self._tasks):
+                self._compact_deleted()
+        else:
+            deleted = set(task.id for task in tasks)
+            self._tasks[:] = [task for task in self._tasks if task.id not in deleted]
+        indexes = self._indexes()
+        for task in tasks:
+            del self._index[task.id]
+            self._rendered.pop(task.id, None)
+            self._spoken.pop(task.id, None)
+            for index in indexes:
+                index.discard(task)
+        self._remember([], [task.__getstate__() for task in tasks])
+        self.version += 1
+        return len(tasks)
+
+    def _row(self, task_id):
+        """Return the position of the task (or its _Deleted marker) with the given id.
+
+        Only valid with stable ids, where self._tasks is kept in id order.
+        """
+
+        tasks, low, high = self._tasks, 0, len(self._tasks)
+        while low < high:
+            middle = (low + high) // 2
+            if tasks[middle].id < task_id:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _row_at(self, position):
+        """Return the row of the task at the given position (from 0) among the tasks
+        that aren't deleted.  The markers in the rows before it are counted by bisecting
+        their rows, so this doesn't depend on the size of the list.
+        """
+
+        markers, low, high = self._deleted, 0, len(self._deleted)
+        while low < high:  # count the markers with at most position tasks before them
+            middle = (low + high) // 2
+            if markers[middle] - middle <= position:
+                low = middle + 1
+            else:
+                high = middle
+        return position + low
+
+    def _compact_deleted(self):
+        """Drop the markers left by deleted tasks."""
+
+        self._tasks[:] = [task for task in self._tasks if task.__class__ is not _Deleted]
+        self._deleted = []
+
+    def numbered(self, tasks=None):
+        """Yield (number, task) pairs for the tasks being displayed.
+
+        The number is the one shown to (and typed by) the user: the task id, or with stable
+        ids the task's position in the whole list.
+
+        :param tasks: the tasks to display (default: all of them)
+        """
+
+        if not self.stable_ids:
+            for task in self if tasks is None else tasks:
+                yield task.id, task
+        elif tasks is None:
+            for number, task in enumerate(self, 1):
+                yield number, task
+        else:
+            for task in tasks:
+                row = self._row(task.id)
+                yield row - bisect.bisect_left(self._deleted, row) + 1, task
+
+    def task_at(self, number):
+        """Return the task with the given display number (see numbered()), or None."""
+
+        if not self.stable_ids:
+            return self._find_task(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            return None
+        return self._tasks[self._row_at(number - 1)] if 0 < number <= len(self) else None
 
     def search(self, search_string):
         """Return all task that match the given search string
@@ -76,27 +683,296 @@ class TaskList:
         :return: task list
         """
 
-        return [task for task in self.tasks if task.match(search_string)]
+        candidates = self._text().candidates(search_string, len(self) // 4)
+        if candidates is None:
+            return [task for task in self if task.match(search_string)]
+        # the tasks are kept in id order
+        return sorted((task for task in candidates if task.match(search_string)),
+                      key=lambda task: task.id)
+
+    def search_prefix(self, search_string):
+        """Return the tasks in which every word of search_string starts a word of the
+        note or tags, in id order.  Meant to be called as the user types.
+
+        Results are cached by (search string, list version).  When a search string extends
+        one whose result is cached, only the tasks in that result are checked; otherwise
+        the candidates come from the prefix trie of the text index.  Either way the work
+        done is proportional to the number of candidates, not to the size of the list.
+
+        :param search_string: search string
+        :return: task list
+        """
+
+        search_string = search_string.lower()
+        fragments = search_string.split()
+        if not fragments:
+            return []
+        results = self._prefix_results
+        if results and next(reversed(results))[1] != self.version:
+            results.clear()  # the list has changed since
+        key = (search_string, self.version)
+        tasks = results.get(key)
+        if tasks is not None:
+            results.move_to_end(key)
+            return tasks
+        index = self._text()
+        for end in range(len(search_string) - 1, 0, -1):
+            base = results.get((search_string[:end], self.version))
+            if base is not None:
+                # a longer search string can only narrow the result; the tasks in it
+                # already start words with the fragments the shorter string had
+                tasks = base
+                for fragment in set(fragments) - set(search_string[:end].split()):
+                    words = index.prefixed(fragment)
+                    postings = [index.postings[word] for word in words]
+                    if sum(len(posting) for posting in postings) < len(tasks) * len(words):
+                        matches = set().union(*postings)
+                        tasks = [task for task in tasks if task in matches]
+                    else:
+                        tasks = [task for task in tasks
+                                 if any(task in posting for posting in postings)]
+                break
+        else:
+            tasks = sorted(index.prefix_candidates(search_string), key=lambda task: task.id)
+        results[key] = tasks
+        if len(results) > PREFIX_CACHE_SIZE:
+            results.popitem(last=False)
+        return tasks
+
+    def _text(self):
+        if self._text_index is None:
+            self._text_index = TextIndex(self)
+        return self._text_index
+
+    def query(self, query_string):
+        """Return the tasks matching a structured query, in id order (see query.py), e.g.
+        priority:high tag:ops created:>2026-01-01 "disk full"
+
+        :raise query.QueryError: if the query can't be parsed
+        """
+
+        from query import plan
+        return plan(self, query_string).run()
+
+    def _priorities(self):
+        if self._priority_index is None:
+            tasks = self if isinstance(self._tasks, list) else self._tasks
+            self._priority_index = PriorityIndex(tasks, len(PRIORITIES))
+        return self._priority_index
+
+    def tasks_by_priority(self, priority):
+        """Return the tasks with the given priority, in id order.
+
+        :param priority: the priority (low, medium, high)
+        """
+
+        return [self._find_task(task_id)
+                for task_id in self._priorities().ids(priority_code(priority))]
+
+    def count_by_priority(self, priority):
+        """Return the number of tasks with the given priority.
+
+        :param priority: the priority (low, medium, high)
+        """
+
+        return self._priorities().count(priority_code(priority))
+
+    def _tags(self):
+        if self._tag_index is None:
+            self._tag_index = TagIndex(self if isinstance(self._tasks, list) else self._tasks)
+        return self._tag_index
+
+    def tasks_tagged(self, tags, match_any=False):
+        """Return the tasks with all of the given tags (or any of them), in id order.
+
+        :param tags: the tags, as a string (separated like a task's tags) or a list
+        :param match_any: return the tasks with at least one of the tags instead
+        """
+
+        if isinstance(tags, str):
+            tags = tag_set(tags)
+        else:
+            tags = set().union(*map(tag_set, tags))
+        ids = self._tags().ids(tags, match_any)
+        return [self._find_task(task_id) for task_id in sorted(ids)]
+
+    def count_by_tag(self, tag):
+        """Return the number of tasks with the given tag."""
+
+        return self._tags().count(normalize_tags(tag))
+
+    def tag_counts(self):
+        """Return a tag -> number of tasks dict of every tag in use (the tag facets)."""
+
+        return self._tags().counts()
+
+    def _dates(self):
+        if self._date_index is None:
+            self._date_index = DateIndex(self if isinstance(self._tasks, list) else self._tasks)
+        return self._date_index
+
+    def tasks_by_date(self, newest_first=False):
+        """Return all of the tasks ordered by creation date (and by id within a day).
+
+        :return: a TaskSequence, which only looks up the tasks that are accessed
+        """
+
+        ids = self._dates().ids()
+        if newest_first:
+            ids.reverse()
+        return TaskSequence(ids, self._find_task)
+
+    def created_between(self, start=None, end=None):
+        """Return the tasks created from start to end (inclusive), oldest first.
+
+        :param start: the first date (a datetime.date, an ordinal or a 'mm/dd/yyyy'
+            string); None for no limit
+        :param end: the last date; None for no limit
+        """
+
+        ids = self._dates().ids(None if start is None else to_ordinal(start),
+                                None if end is None else to_ordinal(end))
+        return TaskSequence(ids, self._find_task)
+
+    def newest(self, count):
+        """Return the count most recently created tasks, newest first."""
+
+        return TaskSequence(self._dates().newest(count), self._find_task)
 
     def _find_task(self, task_id):
         """Find a task by task.id
 
-        :param task_id: The task.id for the task to find.
+        :param task_id: The task.id for the task to find (int or str).
         :return: a task object if found, otherwise None
         """
 
-        for task in self.tasks:
-            if str(task.id) == str(task_id):
-                return task
-        return None
+        try:
+            task_id = int(task_id)
+        except (TypeError, ValueError):
+            return None
+        if self._index is None:
+            return self._tasks.find(task_id)
+        return self._index.get(task_id)
+
+    def _rebuild_index(self):
+        """Rebuild the task.id -> task index from scratch."""
+
+        self._index = dict((task.id, task) for task in self.tasks)
 
     def _renumber_tasks(self):
-        """Renumber all of the tasks. Useful when a task is deleted."""
+        """Renumber all of the tasks. Useful when a task is deleted (without stable ids)."""
 
+        self._materialize()
+        self._compact_deleted()  # the markers would keep their old ids
         Task.last_id = 0
-        for task in self.tasks:
+        for task in self._tasks:
             Task.last_id += 1
             task.id = Task.last_id
+        self._rebuild_index()
+        self._rendered = {}
+        self._spoken = {}
+        self._priority_index = None
+        self._date_index = None
+        self._tag_index = None
+        self.history.clear()  # the ids in it are stale
+        self.dirty = None
+        self.version += 1
+
+    def undo(self):
+        """Reverse the latest change.
+
+        :return: False if there was nothing to undo
+        """
+
+        entry = self.history.pop_undo()
+        if entry is None:
+            return False
+        self.history.push_redo(self._reverse(entry))
+        return True
+
+    def redo(self):
+        """Make the latest change undone again.
+
+        :return: False if there was nothing to redo
+        """
+
+        entry = self.history.pop_redo()
+        if entry is None:
+            return False
+        self.history.push_undo(self._reverse(entry))
+        return True
+
+    def _reverse(self, entry):
+        """Apply a history entry: delete the tasks with its ids and put its states back.
+
+        The change goes through the same paths as any other (the indexes and caches
+        only see the tasks it touches).
+
+        :return: the entry that reverses this one
+        """
+
+        ids, states = entry
+        self._materialize()
+        inverse_ids, inverse_states, replaced, restored = [], [], [], []
+        for task_id in ids:
+            task = self._find_task(task_id)
+            if task:
+                inverse_states.append(task.__getstate__())
+        for state in states:
+            task = self._find_task(state[0])
+            if task:
+                inverse_states.append(task.__getstate__())
+                replaced.append((task, state))
+            else:
+                inverse_ids.append(state[0])
+                restored.append(state)
+        self._replaying = True
+        try:
+            self.delete_tasks(ids)
+            if replaced:
+                indexes = self._indexes()
+                self._remember([], [task.__getstate__() for task, _ in replaced])
+                for task, state in replaced:
+                    for index in indexes:
+                        index.discard(task)
+                    task.__setstate__(state)  # bumps task.version
+                    for index in indexes:
+                        index.add(task)
+                self.version += 1
+            if restored:
+                self._restore(restored)
+        finally:
+            self._replaying = False
+        return inverse_ids, inverse_states
+
+    def _restore(self, states):
+        """Put deleted tasks back in their places (the list is in id order)."""
+
+        indexes = self._indexes()
+        self._remember([state[0] for state in states], [])
+        for state in sorted(states):
+            task = Task.from_state(state)
+            row = self._row(task.id)
+            markers = self._deleted
+            marker = bisect.bisect_left(markers, row)
+            if row < len(self._tasks) and self._tasks[row].id == task.id:
+                self._tasks[row] = task  # the _Deleted marker it left
+                del markers[marker]
+            else:
+                self._tasks.insert(row, task)
+                markers[marker:] = [rest + 1 for rest in markers[marker:]]  # moved down
+            self._index[task.id] = task
+            for index in indexes:
+                index.add(task)
+        Task.allocate_ids(0, max(state[0] for state in states))  # never hand them out again
+        self.version += 1
+
+stats.register(TaskList, {'add_tasks': 'add', 'update_tasks': 'modify', 'search': 'search',
+                          'search_prefix': 'search_prefix', 'query': 'query',
+                          'tasks_tagged': 'tagged',
+                          '_find_task': 'find', 'delete_tasks': 'delete',
+                          '_renumber_tasks': 'renumber', 'render': 'render',
+                          'undo': 'undo', 'redo': 'redo'})
 
 if __name__ == '__main__':
     from menu import Menu
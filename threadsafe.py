@@ -0,0 +1,174 @@
+#------------------------------------------
+# Name:     threadsafe
+# Purpose:  A task list that several threads can use at once
+#
+# Author:   Robin Siebler
+# Created:  10/18/26
+#------------------------------------------
+__author__ = 'Robin Siebler'
+__date__ = '10/18/26'
+
+# A ThreadSafeTaskList takes a reader/writer lock around each TaskList method: any
+# number of threads can look tasks up, search and render at once, while a change waits
+# for them to finish and keeps them out until it's done.  The methods that return an
+# iterator (iterating the list, numbered(), iter_range(), lines()) copy what they yield
+# while they hold the lock, so a recitation on another thread can walk the list while
+# it's being changed; called by a thread that already holds the lock (e.g. from within
+# another method) they don't need to, and don't.  The indexes and caches a reader
+# builds on the way are guarded by a separate mutex; the list itself is only changed by
+# writers (a reader asking for .tasks while deleted markers remain gets a copy).
+#
+# The Task objects themselves are shared: a thread holding one sees a change made to it
+# afterwards.
+#
+#   tasklist = ThreadSafeTaskList(stable_ids=True)
+#   with tasklist.lock.write():    # several changes that others must see all at once
+#       tasklist.delete_task(3)
+#       tasklist.add_task('Call the plumber', 'high', 'home')
+
+import contextlib, threading
+from tasklist import TaskList, _Deleted
+
+READERS = ('__len__', '__str__', 'export', 'render', 'utterance', 'task_at', 'search',
+           'query', 'tasks_by_priority', 'count_by_priority', 'tasks_by_date',
+           'created_between', 'newest', 'tasks_tagged', 'count_by_tag', 'tag_counts',
+           '_find_task', 'delta')
+SNAPSHOTS = ('__iter__', 'lines', 'numbered', 'iter_range')  # return iterators
+WRITERS = ('add_tasks', 'update_tasks', 'delete_tasks', 'compact', 'mark_clean',
+           'mark_dirty', 'undo', 'redo', '_renumber_tasks')
+BUILDERS = ('_text', '_priorities', '_dates', '_tags',  # fill in what readers share
+            'search_prefix')
+
+
+class RWLock(object):
+    """A reader/writer lock: any number of readers at once, or a single writer.
+
+    Once a writer is waiting, new readers wait too, so a steady stream of readers can't
+    keep it out forever.  Both locks can be taken again by the thread holding them, and
+    the writer can read, but a reader can't start writing (two readers doing that at
+    once would wait for each other forever).
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0  # threads holding the read lock
+        self._writer = None  # the ident of the thread holding the write lock
+        self._writes = 0  # how many times the writer has taken it
+        self._waiting = 0  # writers waiting for the readers to finish
+        self._local = threading.local()  # .reads: how many times this thread has read
+
+    def held(self):
+        """Return True if this thread holds the read or the write lock."""
+
+        return bool(getattr(self._local, 'reads', 0)) or self._writer == threading.get_ident()
+
+    def acquire_read(self):
+        reads = getattr(self._local, 'reads', 0)
+        if not reads and self._writer != threading.get_ident():
+            with self._condition:
+                while self._writer is not None or self._waiting:
+                    self._condition.wait()
+                self._readers += 1
+        self._local.reads = reads + 1
+
+    def release_read(self):
+        self._local.reads -= 1
+        if not self._local.reads and self._writer != threading.get_ident():
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+
+    def acquire_write(self):
+        if self._writer == threading.get_ident():
+            self._writes += 1
+            return
+        if getattr(self._local, 'reads', 0):
+            raise RuntimeError('the read lock is held by this thread')
+        with self._condition:
+            self._waiting += 1
+            while self._writer is not None or self._readers:
+                self._condition.wait()
+            self._waiting -= 1
+            self._writer = threading.get_ident()
+            self._writes = 1
+
+    def release_write(self):
+        self._writes -= 1
+        if not self._writes:
+            with self._condition:
+                self._writer = None
+                self._condition.notify_all()
+
+    @contextlib.contextmanager
+    def read(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextlib.contextmanager
+    def write(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+def _locked(name, kind):
+    """Return TaskList's method called name, wrapped in the lock for its kind (one of
+    'read', 'snapshot', 'write' or 'build')."""
+
+    def method(self, *args, **kwargs):
+        function, lock = getattr(TaskList, name), self.lock
+        if kind == 'snapshot' and lock.held():
+            return function(self, *args, **kwargs)
+        if kind == 'write':
+            lock.acquire_write()
+            try:
+                return function(self, *args, **kwargs)
+            finally:
+                lock.release_write()
+        lock.acquire_read()  # not "with lock.read()", which costs as much again
+        try:
+            if kind == 'build':
+                with self._mutex:
+                    return function(self, *args, **kwargs)
+            if kind == 'snapshot':
+                return iter(list(function(self, *args, **kwargs)))
+            return function(self, *args, **kwargs)
+        finally:
+            lock.release_read()
+
+    method.__name__ = name
+    method.__doc__ = getattr(TaskList, name).__doc__
+    return method
+
+
+class ThreadSafeTaskList(TaskList):
+    """A TaskList whose methods can be called from several threads at once."""
+
+    def __init__(self, stable_ids=False):
+        self.lock = RWLock()
+        self._mutex = threading.RLock()  # the indexes and caches readers build
+        TaskList.__init__(self, stable_ids)
+
+    @property
+    def tasks(self):
+        with self.lock.read():
+            if self._deleted:
+                # readers leave the list alone: hand out a copy without the markers
+                return [task for task in self._tasks if task.__class__ is not _Deleted]
+            return self._tasks
+
+    @tasks.setter
+    def tasks(self, tasks):
+        with self.lock.write():
+            TaskList.tasks.fset(self, tasks)
+
+for _kind, _names in (('read', READERS), ('snapshot', SNAPSHOTS), ('write', WRITERS),
+                      ('build', BUILDERS)):
+    for _name in _names:
+        setattr(ThreadSafeTaskList, _name, _locked(_name, _kind))
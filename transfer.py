@@ -0,0 +1,159 @@
+#------------------------------------------
+# Name:     transfer
+# Purpose:  Stream tasks to and from CSV and JSON Lines files
+#
+# Author:   Robin Siebler
+# Created:  10/18/26
+#------------------------------------------
+__author__ = 'Robin Siebler'
+__date__ = '10/18/26'
+
+import csv, datetime, json
+from tasklist import DATE_FORMAT, priority_code
+
+FIELDS = ('id', 'note', 'priority', 'tags', 'creation_date')
+BATCH_SIZE = 10000  # tasks handed to TaskList.add_tasks at a time
+
+
+class TransferError(ValueError):
+    """A line of an imported file can't be made into a task."""
+
+
+def _task(line, row):
+    """Return the task dict of a row read from the given line of a file.
+
+    :raise TransferError: naming the line and the field at fault
+    """
+
+    if not isinstance(row, dict):
+        raise TransferError('line {}: not an object with the fields of a task'.format(line))
+    for field in ('note', 'priority'):
+        if row.get(field) is None:
+            raise TransferError('line {}: no {}'.format(line, field))
+    for field in ('note', 'priority', 'tags'):
+        if not isinstance(row.get(field) or '', str):
+            raise TransferError('line {}: the {} is not text'.format(line, field))
+    try:
+        priority_code(row['priority'])
+    except KeyError:
+        raise TransferError('line {}: unknown priority "{}" (use low, medium or high)'.format(
+            line, row['priority']))
+    created = row.get('creation_date') or None
+    if created is not None:
+        try:
+            datetime.datetime.strptime(created, DATE_FORMAT)
+        except (TypeError, ValueError):
+            raise TransferError('line {}: creation_date "{}" is not a mm/dd/yyyy date'.format(
+                line, created))
+    return {'note': row['note'], 'priority': row['priority'], 'tags': row.get('tags') or '',
+            'creation_date': created}
+
+
+def _batches(items, size=BATCH_SIZE):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _import(tasklist, rows):
+    count = 0
+    for batch in _batches(rows):
+        count += tasklist.add_tasks(batch)
+    return count
+
+
+_dates = {}  # date ordinal -> formatted date; an export repeats the same few dates
+
+
+def _creation_date(task):
+    date = _dates.get(task.created)
+    if date is None:
+        date = _dates[task.created] = datetime.date.fromordinal(task.created).strftime(DATE_FORMAT)
+    return date
+
+
+def _as_dict(task):
+    return {'id': task.id, 'note': task.note, 'priority': task.priority, 'tags': task.tags,
+            'creation_date': _creation_date(task)}
+
+
+def read_csv(fh):
+    """Yield a dict for each task in a CSV file with (at least) a note and a priority
+    column; tags and creation_date columns are optional and any id column is ignored.
+
+    :raise TransferError: for a row that isn't a valid task
+    """
+
+    reader = csv.DictReader(fh)
+    for row in reader:
+        yield _task(reader.line_num, row)
+
+
+def read_jsonl(fh):
+    """Yield a dict for each task in a JSON Lines file (one object per line).
+
+    :raise TransferError: for a line that isn't a valid task
+    """
+
+    for number, line in enumerate(fh, 1):
+        if line.strip():
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                raise TransferError('line {}: not JSON ({})'.format(number, e))
+            yield _task(number, row)
+
+
+def import_csv(tasklist, fh):
+    """Add the tasks in a CSV file to a TaskList (they get new ids).
+
+    :param fh: a file opened for reading text (with newline='')
+    :return: the number of tasks added
+    """
+
+    return _import(tasklist, read_csv(fh))
+
+
+def import_jsonl(tasklist, fh):
+    """Add the tasks in a JSON Lines file to a TaskList (they get new ids).
+
+    :return: the number of tasks added
+    """
+
+    return _import(tasklist, read_jsonl(fh))
+
+
+def export_csv(tasks, fh):
+    """Write tasks to a CSV file, one row at a time.
+
+    :param tasks: an iterable of tasks (e.g. a TaskList)
+    :param fh: a file opened for writing text (with newline='')
+    :return: the number of tasks written
+    """
+
+    writer = csv.writer(fh)
+    writer.writerow(FIELDS)
+    count = 0
+    for task in tasks:
+        writer.writerow((task.id, task.note, task.priority, task.tags, _creation_date(task)))
+        count += 1
+    return count
+
+
+def export_jsonl(tasks, fh):
+    """Write tasks to a JSON Lines file, one line at a time.
+
+    :return: the number of tasks written
+    """
+
+    count = 0
+    for task in tasks:
+        fh.write(json.dumps(_as_dict(task)))
+        fh.write('\n')
+        count += 1
+    return count
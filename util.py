@@ -8,9 +8,18 @@
 __author__ = 'Robin Siebler'
 __date__ = '7/17/13'
 
-import os, pickle
+import contextlib, os
+import stats
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # no advisory locks (e.g. on Windows); file_lock() doesn't lock
 
 FILE_EXT = '.tsk'  # save, load, and delete only files with this suffix
+LOCK_EXT = '.lock'
+
+class ConflictError(IOError):
+    """A task file was changed by another program since it was loaded."""
 
 def valid_filename(filename):
     if not filename:
@@ -38,6 +47,11 @@ def delete(filename):
     new_name = validate_file(filename)
     if new_name:
         os.remove(new_name)
+        from journal import journal_files
+        for journal in journal_files(new_name) + (new_name + '-wal', new_name + '-shm',
+                                                   new_name + LOCK_EXT):
+            if os.path.exists(journal):
+                os.remove(journal)
     else:
         handle_error(filename)
 
@@ -50,27 +64,126 @@ def load(filename):
 
     new_name = validate_file(filename)
     if new_name:
+        import pickle
         try:
+            from journal import journal_files, load as load_journaled
+            from taskfile import TaskFile, TaskFileError, is_task_file
+            from sqlstore import SQLiteTaskList, is_sqlite_file
+            if is_sqlite_file(new_name):
+                return SQLiteTaskList(new_name)
+            if any(os.path.exists(journal) for journal in journal_files(new_name)):
+                return load_journaled(new_name)[0]  # under a shared lock
+            if is_task_file(new_name):
+                return TaskFile(new_name)  # tasks are decoded as they are accessed
             with open(new_name, 'rb') as fh:
                 return pickle.load(fh)
-        except (IOError, pickle.PickleError) as e:
+        except (IOError, EOFError, pickle.PickleError, TaskFileError) as e:
             print(e)
             return None
     else:
         handle_error(filename)
 
-def save(obj, filename):
+@contextlib.contextmanager
+def atomic_open(filename):
+    """Open a temporary file for writing which replaces filename once it is complete.
+
+    The data is flushed to disk before the rename, so filename always holds either the
+    old or the new contents, even if the app is killed part way through.
+    """
+
+    temp_name = filename + '.tmp'
+    try:
+        with open(temp_name, 'wb') as fh:
+            yield fh
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(temp_name, filename)
+    finally:
+        if os.path.exists(temp_name):
+            os.remove(temp_name)
+
+@contextlib.contextmanager
+def file_lock(filename, shared=False):
+    """Hold an advisory lock on a task file while the block runs.
+
+    The lock is taken on "<file>.lock" (the task file itself is replaced by each
+    snapshot), so every program that uses it sees the same lock.  Any number of shared
+    (reading) locks can be held at once, but an exclusive (writing) lock waits for them
+    all and keeps out the others.  Each open of the lock file is a separate lock, so it
+    also works between threads; a thread must not take it again while holding it.
+
+    :param shared: take a shared lock, for reading, instead of an exclusive one
+    """
+
+    if fcntl is None:
+        yield
+        return
+    try:
+        fh = open(filename + LOCK_EXT, 'ab')
+    except (IOError, OSError):
+        if not shared:
+            raise
+        yield  # e.g. a read-only folder; nobody can be writing the file there
+        return
+    with fh:
+        fcntl.flock(fh.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+def stamp(filename):
+    """Return what identifies the current contents of a task file: the identity,
+    modification time and size of the file and of its journal files (appending a change
+    to the journal doesn't touch the task file itself; nor does a change to a task
+    database, until it is checkpointed from the write-ahead log)."""
+
+    from journal import journal_files
+    return tuple(map(file_stamp, (filename, filename + '-wal') + journal_files(filename)))
+
+def file_stamp(filename):
+    """Return (inode, modification time, size) of a file, or None if it doesn't exist."""
+
+    try:
+        info = os.stat(filename)
+    except OSError:
+        return None
+    return info.st_ino, info.st_mtime_ns, info.st_size
+
+def write(obj, filename, expected=None):
+    """Save an object into a pickle file, raising an exception if it can't be saved.
+
+    :param obj: The object to pickle
+    :param filename: The name of the file to create (or replace).
+    :param expected: the stamp() the file had when it was loaded; if it has been saved
+        by another program since, ConflictError is raised and the file is left alone
+    :return: the stamp() of the file written
+    """
+
+    import pickle
+    with file_lock(filename):
+        if expected is not None and stamp(filename) != expected:
+            raise ConflictError('"{}" was changed by another program'.format(filename))
+        with atomic_open(filename) as fh:
+            pickle.dump(obj, fh, pickle.HIGHEST_PROTOCOL)
+            if stats.enabled:
+                stats.count('bytes_written', fh.tell())
+        return stamp(filename)
+
+def save(obj, filename, expected=None):
     """Save an object into a pickle file.
 
     :param obj: The object to pickle
     :param pickle_file: The name of the file to create.
+    :param expected: the stamp() of the file when it was loaded (see write())
+    :return: the stamp() of the file saved, or None if it couldn't be saved
     """
 
+    import pickle
     filename = valid_filename(filename)
     if filename:
         try:
-            with open(filename, 'wb') as fh:
-                pickle.dump(obj, fh)
+            return write(obj, filename, expected)
         except (IOError, pickle.PickleError) as e:
             print(e)
     else:
@@ -105,6 +218,25 @@ def tests():
         save(test_payload, filename)
         load(filename)
         delete(filename)
+    print('  Testing: damaged task files: Should print 3 errors...')
+    import taskfile
+    from tasklist import Task
+    tasks = [Task(test_payload, 'high', 'test') for _ in range(10)]
+    taskfile.write(tasks, test_file_with_ext)
+    with open(test_file_with_ext, 'rb') as fh:
+        data = fh.read()
+    flipped = bytearray(data)
+    flipped[11] ^= 0x80  # the top bit of the number of tasks in the header
+    taskfile.write(tasks, test_file_with_ext, compress=True)
+    with open(test_file_with_ext, 'rb') as fh:
+        compressed = bytearray(fh.read())
+    compressed[(taskfile.HEADER.size + len(compressed)) // 2] ^= 0x01
+    for damaged in (data[:len(data) // 3], flipped, compressed):
+        with open(test_file_with_ext, 'wb') as fh:
+            fh.write(damaged)
+        assert load(test_file) is None
+    delete(test_file)
+    assert not os.path.exists(test_file_with_ext)
     print('Test run complete.')
 
 if __name__ == '__main__':
@@ -0,0 +1,116 @@
+#------------------------------------------
+# Name:     views
+# Purpose:  Parse each dialog once and reuse it
+#
+# Author:   Robin Siebler
+# Created:  10/18/26
+#------------------------------------------
+__author__ = 'Robin Siebler'
+__date__ = '10/18/26'
+
+# ui.load_view() parses a .pyui file and builds every control in it, which is most of
+# the time it takes a dialog to open.  A ViewCache builds each dialog once and hands out
+# the same view again once it has been closed, with its controls put back the way the
+# .pyui file had them (text, selection, enabled and hidden).  If a dialog is asked for
+# while it is still on screen (e.g. a second message), another copy is built.
+#
+#   views = ViewCache({'self': menu})
+#   dialog = views.get('dialogs/add_task')
+#   views.prewarm(['dialogs/add_task', 'dialogs/message'])   # build them while idle
+
+import stats
+
+POOL_SIZE = 2  # most views of each dialog kept for reuse
+RESET_ATTRIBUTES = ('text', 'title', 'enabled', 'hidden', 'selected_index', 'value')
+PREWARM_DELAY = 0.05  # seconds between the dialogs built by prewarm()
+
+
+def _controls(view):
+    """Yield every view inside a view (depth first)."""
+
+    for subview in view.subviews:
+        yield subview
+        for control in _controls(subview):
+            yield control
+
+
+def save_state(view):
+    """Return the resettable attributes of the controls in a view."""
+
+    return [(control, dict((name, getattr(control, name)) for name in RESET_ATTRIBUTES
+                           if hasattr(control, name)))
+            for control in _controls(view)]
+
+
+def restore_state(state):
+    """Put the controls back the way save_state() found them."""
+
+    for control, attributes in state:
+        for name, value in attributes.items():
+            if getattr(control, name) != value:
+                setattr(control, name, value)
+
+
+class ViewCache(object):
+    """Builds views from .pyui files with ui.load_view() and reuses them."""
+
+    def __init__(self, bindings, pool_size=POOL_SIZE):
+        """Initialize the cache.
+
+        :param bindings: the names the actions in the .pyui files refer to, e.g.
+            {'self': menu}
+        :param pool_size: the most views of each file kept for reuse (0 builds a new view
+            every time, as ui.load_view() does)
+        """
+
+        self.bindings = bindings
+        self.pool_size = pool_size
+        self._pools = {}  # pyui name -> [(view, state)]
+        self.built = 0  # the number of views built
+
+    def _build(self, name):
+        import ui
+        view = ui.load_view(name, self.bindings)
+        self.built += 1
+        return view, save_state(view)
+
+    def get(self, name):
+        """Return a view of the given .pyui file that isn't on screen.
+
+        :param name: the file name, without the .pyui extension
+        """
+
+        pool = self._pools.setdefault(name, [])
+        for view, state in pool:
+            if not view.on_screen:
+                restore_state(state)
+                return view
+        view, state = self._build(name)
+        if len(pool) < self.pool_size:
+            pool.append((view, state))
+        return view
+
+    def prewarm(self, names, delay=PREWARM_DELAY):
+        """Build the views that aren't cached yet, one at a time, while the app is idle.
+
+        Views belong to the main thread, so each one is built by a ui.delay() callback
+        rather than on a background thread.
+        """
+
+        import ui
+        names = [name for name in names if not self._pools.get(name)]
+
+        def build_next():
+            while names:
+                name = names.pop(0)
+                pool = self._pools.setdefault(name, [])
+                if not pool and self.pool_size:
+                    pool.append(self._build(name))
+                    break
+            if names:
+                ui.delay(build_next, delay)
+
+        if names:
+            ui.delay(build_next, delay)
+
+stats.register(ViewCache, {'get': 'dialog', '_build': 'dialog_build'})
@@ -0,0 +1,230 @@
+#------------------------------------------
+# Name:     workspace
+# Purpose:  Search every task file in a directory at once
+#
+# Author:   Robin Siebler
+# Created:  10/18/26
+#------------------------------------------
+__author__ = 'Robin Siebler'
+__date__ = '10/18/26'
+
+# Each task file belongs to one worker process, which keeps the file loaded (and its
+# search index built) until the file changes.  Only the search results travel between
+# the processes.  Where there are no worker processes (e.g. Pythonista, which has no
+# multiprocessing) the same code runs in this process.
+#
+#   with Workspace('~/Documents') as workspace:
+#       for filename, task in workspace.search('disk'):
+#           print(filename, task)
+
+import glob, os, pickle, sqlite3, sys
+import journal, sqlstore, stats, util
+from tasklist import Task, TaskList
+from taskfile import TaskFileError
+
+_cache = {}  # filename -> (stamp, TaskList or error message); each process has its own
+# what loading or searching a damaged task file raises; the file is skipped
+FILE_ERRORS = (IOError, EOFError, ValueError, IndexError, pickle.PickleError,
+               sqlite3.DatabaseError, TaskFileError)
+
+
+def _drop(filename):
+    """Remove a file from the cache, closing it if it is a task database."""
+
+    cached = _cache.pop(filename, None)
+    if cached and isinstance(cached[1], sqlstore.SQLiteTaskList):
+        cached[1].close()
+
+
+def _sync(files):
+    """Make the cache hold exactly the given files, (re)loading those that changed.
+
+    :param files: a list of (filename, stamp) tuples
+    :return: a filename -> error message dict of the files that couldn't be loaded
+    """
+
+    wanted = dict(files)
+    for filename in list(_cache):
+        if filename not in wanted:
+            _drop(filename)
+    for filename, file_stamp in files:
+        cached = _cache.get(filename)
+        if cached and cached[0] == file_stamp:
+            continue
+        _drop(filename)
+        try:
+            tasks = journal.load(filename)[0]
+        except FILE_ERRORS as e:
+            _cache[filename] = (file_stamp, str(e))  # not retried until the file changes
+            continue
+        if isinstance(tasks, sqlstore.SQLiteTaskList):
+            tasklist = tasks  # searched in the database, not loaded
+        else:
+            tasklist = TaskList()
+            tasklist.tasks = tasks
+        _cache[filename] = (file_stamp, tasklist)
+    return dict((filename, _cache[filename][1]) for filename, _ in files
+                if isinstance(_cache[filename][1], str))
+
+
+def _load(files):
+    """Load the given files; return (filename -> number of tasks, errors)."""
+
+    errors = _sync(files)
+    return dict((filename, len(_cache[filename][1])) for filename, _ in files
+                if filename not in errors), errors
+
+
+def _search(files, search_string):
+    """Search the given files; return ([(filename, [task states])], errors)."""
+
+    errors = _sync(files)
+    results = []
+    for filename, file_stamp in files:
+        if filename not in errors:
+            try:
+                found = _cache[filename][1].search(search_string)
+                states = [task.__getstate__() for task in found]
+            except FILE_ERRORS as e:  # e.g. a task in a damaged binary file
+                _drop(filename)
+                _cache[filename] = (file_stamp, str(e))
+                errors[filename] = str(e)
+                continue
+            if states:
+                results.append((filename, states))
+    return results, errors
+
+
+def _executor():
+    """Return a single process executor, or None if this platform can't start one."""
+
+    try:
+        import multiprocessing.synchronize  # raises ImportError where there are no semaphores
+        from concurrent.futures import ProcessPoolExecutor
+        return ProcessPoolExecutor(max_workers=1)
+    except (ImportError, NotImplementedError, OSError):
+        return None
+
+
+class Workspace(object):
+    """Every task file in a directory, loaded and searched in parallel."""
+
+    def __init__(self, directory, processes=None):
+        """Initialize the workspace.  Nothing is loaded until it is first used.
+
+        :param directory: the directory holding the task files
+        :param processes: the number of worker processes (default: one per CPU); with 0
+            or 1 the files are loaded and searched in this process
+        """
+
+        self.directory = os.path.expanduser(directory)
+        if processes is None:
+            processes = os.cpu_count() or 1
+        self._workers = []  # one single process executor per worker
+        if processes > 1:
+            for _ in range(processes):
+                executor = _executor()
+                if executor is None:
+                    break
+                self._workers.append(executor)
+        self._owner = {}  # filename -> (index into self._workers, file size)
+        self._load = [0] * max(len(self._workers), 1)  # bytes of task files per worker
+        self.counts = {}  # filename -> number of tasks, as of the last refresh()
+        self.errors = {}  # filename -> why it couldn't be loaded
+
+    def close(self):
+        """Stop the worker processes."""
+
+        for worker in self._workers:
+            worker.shutdown()
+        self._workers = []
+        for filename in list(_cache):
+            _drop(filename)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def files(self):
+        """Return the task files in the directory, sorted by name."""
+
+        return sorted(glob.glob(os.path.join(glob.escape(self.directory), '*' + util.FILE_EXT)))
+
+    def _assign(self, filename):
+        """Give a new file to the worker with the least to do."""
+
+        worker = self._load.index(min(self._load))
+        try:
+            size = os.path.getsize(filename)
+        except OSError:
+            size = 0
+        self._owner[filename] = worker, size
+        self._load[worker] += size
+        return worker
+
+    def _run(self, function, *args):
+        """Run function(files, *args) for the files of each worker and return the results.
+
+        The errors every call reports are collected in self.errors.
+        """
+
+        files = self.files()
+        for filename in list(self._owner):
+            if filename not in files:
+                worker, size = self._owner.pop(filename)
+                self._load[worker] -= size
+                self.counts.pop(filename, None)
+        shares = [[] for _ in self._load]
+        for filename in files:
+            if filename in self._owner:
+                worker = self._owner[filename][0]
+            else:
+                worker = self._assign(filename)
+            shares[worker].append((filename, util.stamp(filename)))
+        if self._workers:
+            futures = [worker.submit(function, share, *args)
+                       for worker, share in zip(self._workers, shares)]
+            results = [future.result() for future in futures]
+        else:
+            results = [function(share, *args) for share in shares]
+        self.errors = {}
+        for _, errors in results:
+            self.errors.update(errors)
+        return [result for result, _ in results]
+
+    def refresh(self):
+        """Load the task files that are new or changed since they were last loaded.
+
+        :return: a filename -> number of tasks dict
+        """
+
+        self.counts = {}
+        for counts in self._run(_load):
+            self.counts.update(counts)
+        return self.counts
+
+    def search(self, search_string):
+        """Search every task file (loading the new or changed ones first).
+
+        :param search_string: search string
+        :return: a list of (filename, task) tuples, sorted by file name, then task id
+        """
+
+        results = []
+        for found in self._run(_search, search_string):
+            results.extend(found)
+        results.sort(key=lambda result: result[0])
+        return [(filename, Task.from_state(state)) for filename, states in results
+                for state in states]
+
+    def __len__(self):
+        return sum(self.counts.values())
+
+stats.register(Workspace, {'refresh': 'workspace_load', 'search': 'workspace_search'})
+
+if __name__ == '__main__':
+    with Workspace(sys.argv[1] if len(sys.argv) > 1 else '.') as workspace:
+        for filename, task in workspace.search(' '.join(sys.argv[2:])):
+            print('{}: {}'.format(os.path.basename(filename), task))